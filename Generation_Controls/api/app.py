@@ -1,9 +1,95 @@
-from fastapi import FastAPI
-from gen_controls.service import generate_text
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from pydantic import BaseModel, Field
+from gen_controls import client as client_module
+from gen_controls.cache import configure_cache, disable_cache
+from gen_controls.service import agenerate_text, aiter_generate_many, astream_text
 from gen_controls.config import GenerationConfig
+from gen_controls.observability import log_batch, setup_logging, shutdown_logging
+from gen_controls.transport import aclose_transport, get_transport
+
+
+def _configure_cache():
+    """Opt-in response cache for deterministic requests, from GEN_CONTROLS_CACHE_* (read after .env)."""
+    max_entries = int(os.getenv("GEN_CONTROLS_CACHE_MAX_ENTRIES") or 0)
+    if max_entries <= 0:
+        disable_cache()
+        return
+    configure_cache(
+        max_entries=max_entries,
+        ttl_s=float(os.getenv("GEN_CONTROLS_CACHE_TTL_S", 3600)),
+        path=os.getenv("GEN_CONTROLS_CACHE_PATH") or None,
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_logging()
+    # All cheap, so they run before the port opens; /readyz reports it.
+    client_module.settings()
+    get_transport()
+    _configure_cache()
+    app.state.ready = True
+    yield
+    await aclose_transport()
+    disable_cache()
+    shutdown_logging()
+
+
+app = FastAPI(lifespan=lifespan)
+
 
-app = FastAPI()
+class BatchRequest(BaseModel):
+    prompts: List[str] = Field(..., min_length=1, max_length=10000)
+    config: GenerationConfig = GenerationConfig()
+    concurrency: int = Field(8, ge=1, le=64)
+
+
+@app.get("/healthz")
+def health():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def ready(request: Request):
+    if not getattr(request.app.state, "ready", False):
+        return JSONResponse({"status": "warming_up"}, status_code=503)
+    return {"status": "ready"}
+
+@app.get("/metrics")
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 @app.post("/generate")
-def generate(req: GenerationConfig, prompt: str):
-    return generate_text(prompt, req)
\ No newline at end of file
+async def generate(req: GenerationConfig, prompt: str, bypass_cache: bool = False):
+    return await agenerate_text(prompt, req, bypass_cache=bypass_cache)
+
+@app.post("/generate/batch")
+async def generate_batch(req: BatchRequest):
+    async def ndjson():
+        start = time.time()
+        results = [None] * len(req.prompts)
+        async for index, result in aiter_generate_many(req.prompts, req.config, req.concurrency):
+            results[index] = result
+            yield json.dumps({"index": index, **result}) + "\n"
+        yield json.dumps({"summary": log_batch(start, req.config, results)}) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+@app.post("/generate/stream")
+async def generate_stream(req: GenerationConfig, prompt: str):
+    async def sse():
+        try:
+            async for chunk in astream_text(prompt, req):
+                yield f"data: {json.dumps(chunk)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(sse(), media_type="text/event-stream")
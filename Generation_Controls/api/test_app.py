@@ -1,6 +1,8 @@
+import json
 from fastapi.testclient import TestClient
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 from api.app import app
+from gen_controls.cache import get_cache
 
 client = TestClient(app)
 
@@ -17,7 +19,7 @@ MOCK_RESPONSE = {
 }
 
 
-@patch("gen_controls.client.OpenRouterClient.generate")
+@patch("gen_controls.client.AsyncOpenRouterClient.generate", new_callable=AsyncMock)
 def test_generate_endpoint(mock_generate):
     mock_generate.return_value = MOCK_RESPONSE
 
@@ -39,4 +41,81 @@ def test_generate_endpoint(mock_generate):
     data = response.json()
 
     assert data["text"] == "API test response"
-    assert data["finish_reason"] == "stop"
\ No newline at end of file
+    assert data["finish_reason"] == "stop"
+
+
+@patch("gen_controls.client.AsyncOpenRouterClient.generate", new_callable=AsyncMock)
+def test_generate_batch_streams_ndjson(mock_generate):
+    mock_generate.return_value = MOCK_RESPONSE
+
+    response = client.post(
+        "/generate/batch",
+        json={"prompts": ["a", "b", "c"], "concurrency": 2}
+    )
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    assert sorted(line["index"] for line in lines[:-1]) == [0, 1, 2]
+    summary = lines[-1]["summary"]
+    assert summary["succeeded"] == 3
+    assert summary["total_tokens"] == 60
+
+
+
+async def _fake_stream(self, messages, **params):
+    yield {"choices": [{"delta": {"content": "Hel"}, "finish_reason": None}]}
+    yield {"choices": [{"delta": {"content": "lo"}, "finish_reason": "stop"}]}
+    yield {"choices": [], "usage": {"total_tokens": 7}}
+
+
+@patch("gen_controls.client.AsyncOpenRouterClient.stream", _fake_stream)
+def test_generate_stream_sse():
+    response = client.post("/generate/stream?prompt=Hello", json={})
+
+    assert response.status_code == 200
+    events = [line[len("data: "):] for line in response.text.splitlines() if line.startswith("data: ")]
+
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(e) for e in events[:-1]]
+    assert "".join(c["delta"] for c in chunks) == "Hello"
+    assert chunks[-1]["finish_reason"] == "stop"
+    assert chunks[-1]["usage"]["total_tokens"] == 7
+
+
+
+@patch("gen_controls.client.AsyncOpenRouterClient.generate", new_callable=AsyncMock)
+def test_metrics_endpoint_exposes_generation_metrics(mock_generate):
+    mock_generate.return_value = MOCK_RESPONSE
+    client.post("/generate?prompt=Hello", json={"temperature": 0.1})
+    mock_generate.side_effect = RuntimeError("API failure")
+    TestClient(app, raise_server_exceptions=False).post("/generate?prompt=Bye", json={"temperature": 0.1})
+
+    body = client.get("/metrics").text
+
+    assert "gen_controls_request_latency_seconds_bucket" in body
+    assert 'gen_controls_upstream_errors_total{error="RuntimeError"' in body
+    # Resilience, coalescing and cache metrics share the same registry.
+    assert 'gen_controls_circuit_breaker_state{policy="default",state="closed"} 1.0' in body
+    for name in ("retries", "hedges", "hedge_wins", "coalesced_calls", "cache_misses"):
+        assert f"# TYPE gen_controls_{name}_total counter" in body
+
+
+def test_probes():
+    assert client.get("/healthz").json() == {"status": "ok"}
+    # The module-level client never runs the lifespan.
+    assert client.get("/readyz").status_code == 503
+    with TestClient(app) as started:
+        assert started.get("/readyz").json() == {"status": "ready"}
+
+
+def test_response_cache_is_opt_in(monkeypatch):
+    monkeypatch.delenv("GEN_CONTROLS_CACHE_MAX_ENTRIES", raising=False)
+    with TestClient(app) as started:
+        assert get_cache() is None
+        assert "gen_controls_cache_misses_total" in started.get("/metrics").text
+
+    monkeypatch.setenv("GEN_CONTROLS_CACHE_MAX_ENTRIES", "16")
+    with TestClient(app):
+        assert get_cache().max_entries == 16
+    assert get_cache() is None
@@ -0,0 +1,129 @@
+"""Per-call `requests.post` vs the pooled keep-alive transport.
+
+    python benchmarks/bench_transport.py --concurrency 64 --requests 2000 --tls
+
+With --tls a throwaway self-signed certificate is generated with `openssl`, so the
+numbers include the TLS handshake the pool avoids (the dominant cost against
+openrouter.ai). Without it only the TCP handshake is measured.
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from gen_controls.client import OpenRouterClient
+from gen_controls.config import TransportConfig
+from gen_controls.transport import PooledTransport
+from stub_server import StubServer
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+def make_cert(workdir):
+    cert = os.path.join(workdir, "cert.pem")
+    key = os.path.join(workdir, "key.pem")
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+            "-keyout", key, "-out", cert, "-days", "1",
+            "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+def serve(port, latency_s, certfile, keyfile, connections, ready):
+    server = StubServer(port=port, latency_s=latency_s, certfile=certfile, keyfile=keyfile)
+    server.process_request = _counting(server.process_request, connections)
+    ready.set()
+    server.serve_forever()
+
+
+def _counting(process_request, connections):
+    def wrapper(request, client_address):
+        with connections.get_lock():
+            connections.value += 1
+        process_request(request, client_address)
+    return wrapper
+
+
+def run(call, total, concurrency):
+    latencies = []
+
+    def timed(_):
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--tls", action="store_true")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        certfile, keyfile = make_cert(workdir) if args.tls else (None, None)
+        verify = certfile or True
+
+        # The stub runs in its own process so it does not compete for the GIL.
+        connections = multiprocessing.Value("i", 0)
+        ready = multiprocessing.Event()
+        server = multiprocessing.Process(
+            target=serve,
+            args=(args.port, args.latency_ms / 1000, certfile, keyfile, connections, ready),
+            daemon=True,
+        )
+        server.start()
+        ready.wait()
+        scheme = "https" if args.tls else "http"
+        url = f"{scheme}://127.0.0.1:{args.port}/api/v1/chat/completions"
+
+        def per_call():
+            requests.post(url, json={"messages": MESSAGES}, timeout=60, verify=verify).json()
+
+        before = connections.value
+        baseline = run(per_call, args.requests, args.concurrency)
+        baseline["connections"] = connections.value - before
+
+        transport = PooledTransport(
+            TransportConfig(pool_size=args.concurrency, max_keepalive=args.concurrency, ca_bundle=certfile)
+        )
+        client = OpenRouterClient(transport=transport, base_url=url)
+
+        before = connections.value
+        pooled = run(lambda: client.generate(MESSAGES), args.requests, args.concurrency)
+        pooled["connections"] = connections.value - before
+        transport.close()
+        server.terminate()
+
+    print(f"requests={args.requests} concurrency={args.concurrency} tls={args.tls}")
+    print("per-call requests.post:", baseline)
+    print("pooled transport:      ", pooled)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Local stand-in for the OpenRouter chat completions endpoint.
+
+Used by the benchmarks so they measure the client, not the network or the model.
+"""
+import json
+import random
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COMPLETION = {
+    "choices": [
+        {
+            "message": {"content": "stub response"},
+            "finish_reason": "stop",
+        }
+    ],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, delayed ACKs
+    # add ~40ms to every keep-alive response.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+
+        delay, error_status = self.server.plan_request()
+        if delay:
+            time.sleep(delay)
+
+        if error_status:
+            body = json.dumps({"error": {"code": error_status, "message": "injected"}}).encode()
+            self.send_response(error_status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            if self.server.retry_after is not None:
+                self.send_header("Retry-After", str(self.server.retry_after))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        if payload.get("stream"):
+            return self._stream()
+
+        body = json.dumps(COMPLETION).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        words = COMPLETION["choices"][0]["message"]["content"].split(" ")
+        events = [": OPENROUTER PROCESSING\n\n"]
+        for i, word in enumerate(words):
+            delta = {"content": word if i == 0 else " " + word}
+            events.append({"choices": [{"delta": delta, "finish_reason": None}]})
+        events.append({"choices": [{"delta": {}, "finish_reason": "stop"}]})
+        events.append({"choices": [], "usage": COMPLETION["usage"]})
+        events.append("data: [DONE]\n\n")
+
+        for event in events:
+            if isinstance(event, dict):
+                event = f"data: {json.dumps(event)}\n\n"
+            data = event.encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+            if self.server.chunk_delay_s:
+                time.sleep(self.server.chunk_delay_s)
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(
+        self,
+        port=0,
+        latency_s=0.0,
+        chunk_delay_s=0.0,
+        spike_rate=0.0,
+        spike_s=0.0,
+        fail_first=0,
+        error_status=503,
+        retry_after=None,
+        seed=0,
+        certfile=None,
+        keyfile=None,
+    ):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency_s = latency_s
+        self.chunk_delay_s = chunk_delay_s
+        # Fault injection: a `spike_rate` fraction of requests take `spike_s`
+        # instead of `latency_s`, and the first `fail_first` return `error_status`.
+        self.spike_rate = spike_rate
+        self.spike_s = spike_s
+        self.failures_left = fail_first
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.requests = 0
+        self._random = random.Random(seed)
+        self.connections = 0
+        self._counter_lock = threading.Lock()
+        self.scheme = "http"
+        if certfile:
+            ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            ctx.load_cert_chain(certfile, keyfile)
+            # Handshake lazily in the handler thread, like a real TLS terminator.
+            self.socket = ctx.wrap_socket(
+                self.socket, server_side=True, do_handshake_on_connect=False
+            )
+            self.scheme = "https"
+
+    def plan_request(self):
+        with self._counter_lock:
+            self.requests += 1
+            if self.failures_left > 0:
+                self.failures_left -= 1
+                return self.latency_s, self.error_status
+            spiked = self._random.random() < self.spike_rate
+        return (self.spike_s if spiked else self.latency_s), None
+
+    def process_request(self, request, client_address):
+        with self._counter_lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return f"{self.scheme}://{host}:{port}/api/v1/chat/completions"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
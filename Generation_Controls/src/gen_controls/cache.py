@@ -0,0 +1,156 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from .metrics import CACHE_EVICTIONS, CACHE_EXPIRATIONS, CACHE_HITS, CACHE_MISSES
+
+
+def is_deterministic(cfg):
+    # With temperature 0 the provider decodes greedily; anything else samples,
+    # and replaying a cached sample would silently change the semantics.
+    return cfg.temperature == 0.0
+
+
+def cache_key(model, messages, cfg):
+    canonical = json.dumps(
+        {"model": model, "messages": messages, "config": cfg.model_dump()},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SQLiteTier:
+    """Persistent second tier so cached responses survive restarts."""
+
+    def __init__(self, path, ttl_s):
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self.prune()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + self.ttl_s),
+            )
+            self._conn.commit()
+
+    def prune(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """Bounded LRU with TTL in front of an optional SQLiteTier. Thread-safe."""
+
+    def __init__(self, max_entries=1024, ttl_s=3600.0, path=None):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.disk = SQLiteTier(path, ttl_s) if path else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at >= time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    CACHE_HITS.labels(tier="memory").inc()
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+                CACHE_EXPIRATIONS.inc()
+
+        value = self.disk.get(key) if self.disk else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                CACHE_MISSES.inc()
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            CACHE_HITS.labels(tier="disk").inc()
+            self._put(key, value)
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._put(key, value)
+        if self.disk:
+            self.disk.set(key, value)
+
+    def _put(self, key, value):
+        self._entries[key] = (value, time.time() + self.ttl_s)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+            CACHE_EVICTIONS.inc()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def close(self):
+        if self.disk:
+            self.disk.close()
+
+
+_cache = None
+
+
+def configure_cache(max_entries=1024, ttl_s=3600.0, path=None) -> ResponseCache:
+    global _cache
+    disable_cache()
+    _cache = ResponseCache(max_entries=max_entries, ttl_s=ttl_s, path=path)
+    return _cache
+
+
+def disable_cache():
+    global _cache
+    if _cache is not None:
+        _cache.close()
+    _cache = None
+
+
+def get_cache():
+    return _cache
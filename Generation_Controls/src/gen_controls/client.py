@@ -1,30 +1,160 @@
+import json
 import os
-import requests
-from dotenv import load_dotenv
+import time
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import NamedTuple, Optional
 
-load_dotenv()
+from .transport import get_transport
+
+BASE_URL = "https://openrouter.ai/api/v1/chat/completions"
+_env_loaded = False
+
+
+class Settings(NamedTuple):
+    api_key: Optional[str]
+    model: Optional[str]
+    base_url: str
+
+
+def load_env():
+    """Load .env into os.environ once; called on first use or by a warm-up hook."""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        _env_loaded = True
+
+
+@lru_cache(maxsize=None)
+def settings() -> Settings:
+    """OpenRouter settings from the environment and .env, read on first use rather than at import."""
+    load_env()
+    return Settings(
+        api_key=os.getenv("OPENROUTER_API_KEY"),
+        model=os.getenv("OPENROUTER_MODEL"),
+        base_url=os.getenv("OPENROUTER_BASE_URL", BASE_URL),
+    )
+
+
+class UpstreamError(RuntimeError):
+    def __init__(self, message, status_code=None, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_sse_line(line):
+    """Return the JSON payload of an SSE `data:` line, None to skip, or "[DONE]"."""
+    # OpenRouter interleaves ": OPENROUTER PROCESSING" keep-alive comments.
+    if not line or not line.startswith("data:"):
+        return None
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        return data
+    return json.loads(data)
+
+
+STREAM_PARAMS = {"stream": True, "stream_options": {"include_usage": True}}
 
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-MODEL = os.getenv("OPENROUTER_MODEL")
 
 class OpenRouterClient:
-    BASE_URL = "https://openrouter.ai/api/v1/chat/completions"
+    BASE_URL = BASE_URL
 
-    def generate(self, messages, **params):
+    def __init__(self, transport=None, base_url=None):
+        # Both resolved lazily: a closed shared pool is transparently recreated,
+        # and the module-level clients are built before .env is loaded.
+        self.transport = transport
+        self._base_url = base_url
+
+    @property
+    def base_url(self):
+        return self._base_url or settings().base_url
+
+    def _request(self, messages, params):
+        config = settings()
         headers = {
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+            "Authorization": f"Bearer {config.api_key}",
             "Content-Type": "application/json",
         }
 
         payload = {
-            "model": MODEL,
+            "model": config.model,
             "messages": messages,
             **params,
         }
 
-        response = requests.post(self.BASE_URL, headers=headers, json=payload, timeout=60)
+        return headers, payload
 
+    def _parse(self, response):
         if response.status_code != 200:
-            raise RuntimeError(f"OpenRouter error: {response.text}")
+            raise UpstreamError(
+                f"OpenRouter error: {response.text}",
+                status_code=response.status_code,
+                retry_after=parse_retry_after(response.headers.get("Retry-After")),
+            )
+
+        return response.json()
+
+    def generate(self, messages, **params):
+        headers, payload = self._request(messages, params)
+        transport = self.transport or get_transport()
+        response = transport.post_json(self.base_url, headers, payload)
+        return self._parse(response)
+
+    def stream(self, messages, **params):
+        headers, payload = self._request(messages, {**params, **STREAM_PARAMS})
+        transport = self.transport or get_transport()
+        with transport.stream(self.base_url, headers, payload) as response:
+            if response.status_code != 200:
+                raise UpstreamError(
+                    f"OpenRouter error: {response.read().decode('utf-8', errors='replace')}",
+                    status_code=response.status_code,
+                )
+
+            for line in response.lines:
+                event = parse_sse_line(line)
+                if event == "[DONE]":
+                    return
+                if event is not None:
+                    yield event
+
+
+class AsyncOpenRouterClient(OpenRouterClient):
+    async def generate(self, messages, **params):
+        headers, payload = self._request(messages, params)
+        transport = self.transport or get_transport()
+        response = await transport.apost_json(self.base_url, headers, payload)
+        return self._parse(response)
+
+    async def stream(self, messages, **params):
+        headers, payload = self._request(messages, {**params, **STREAM_PARAMS})
+        transport = self.transport or get_transport()
+        async with transport.astream(self.base_url, headers, payload) as response:
+            if response.status_code != 200:
+                body = await response.read()
+                raise UpstreamError(
+                    f"OpenRouter error: {body.decode('utf-8', errors='replace')}",
+                    status_code=response.status_code,
+                )
 
-        return response.json()
\ No newline at end of file
+            async for line in response.lines:
+                event = parse_sse_line(line)
+                if event == "[DONE]":
+                    return
+                if event is not None:
+                    yield event
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 
 class GenerationConfig(BaseModel):
     temperature: float = Field(0.7, ge=0.0, le=2.0)
@@ -7,4 +7,27 @@ class GenerationConfig(BaseModel):
     max_tokens: int = Field(200, gt=1, le=2000)
     frequency_penalty: float = Field(0.0, ge=0.0, le=2.0)
     presence_penalty: float = Field(0.0, ge=0.0, le=2.0)
-    stop: List[str] = []
\ No newline at end of file
+    stop: List[str] = []
+
+
+class TransportConfig(BaseModel):
+    pool_size: int = Field(100, gt=0)
+    max_keepalive: int = Field(20, ge=0)
+    keepalive_expiry: float = Field(30.0, gt=0.0)
+    http2: bool = False
+    connect_timeout: float = Field(5.0, gt=0.0)
+    read_timeout: float = Field(60.0, gt=0.0)
+    total_timeout: float = Field(90.0, gt=0.0)
+    ca_bundle: Optional[str] = None
+
+
+class ResilienceConfig(BaseModel):
+    max_retries: int = Field(2, ge=0, le=10)
+    backoff_base_s: float = Field(0.2, gt=0.0)
+    backoff_max_s: float = Field(10.0, gt=0.0)
+    hedge: bool = False
+    hedge_quantile: float = Field(95.0, gt=0.0, lt=100.0)
+    hedge_min_delay_s: float = Field(0.05, ge=0.0)
+    hedge_min_samples: int = Field(20, ge=1)
+    breaker_failure_threshold: int = Field(5, ge=1)
+    breaker_reset_s: float = Field(30.0, gt=0.0)
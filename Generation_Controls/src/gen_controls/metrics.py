@@ -0,0 +1,114 @@
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+
+LABELS = ["preset", "model"]
+
+REQUEST_LATENCY = Histogram(
+    "gen_controls_request_latency_seconds",
+    "End-to-end generation latency in seconds",
+    LABELS,
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64),
+)
+
+TIME_TO_FIRST_TOKEN = Histogram(
+    "gen_controls_time_to_first_token_seconds",
+    "Time to the first streamed content chunk in seconds",
+    LABELS,
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8),
+)
+
+PROMPT_TOKENS = Histogram(
+    "gen_controls_prompt_tokens",
+    "Prompt tokens per request",
+    LABELS,
+    buckets=(16, 64, 256, 1024, 4096, 16384, 65536),
+)
+
+COMPLETION_TOKENS = Histogram(
+    "gen_controls_completion_tokens",
+    "Completion tokens per request",
+    LABELS,
+    buckets=(8, 32, 64, 128, 256, 512, 1024, 2048),
+)
+
+FINISH_REASONS = Counter(
+    "gen_controls_finish_reason_total",
+    "Completions by finish_reason",
+    LABELS + ["finish_reason"],
+)
+
+UPSTREAM_ERRORS = Counter(
+    "gen_controls_upstream_errors_total",
+    "Failed upstream calls by status code or exception type",
+    LABELS + ["error"],
+)
+
+COALESCED_CALLS = Counter(
+    "gen_controls_coalesced_calls_total",
+    "Calls that joined an identical call already in flight instead of going upstream",
+    LABELS,
+)
+
+CACHE_HITS = Counter(
+    "gen_controls_cache_hits_total",
+    "Response cache hits by tier (memory or disk)",
+    ["tier"],
+)
+
+CACHE_MISSES = Counter(
+    "gen_controls_cache_misses_total",
+    "Response cache lookups that found nothing",
+)
+
+CACHE_EVICTIONS = Counter(
+    "gen_controls_cache_evictions_total",
+    "Entries dropped from the in-memory tier to stay within max_entries",
+)
+
+CACHE_EXPIRATIONS = Counter(
+    "gen_controls_cache_expirations_total",
+    "Entries found past their TTL in the in-memory tier",
+)
+
+RETRIES = Counter(
+    "gen_controls_retries_total",
+    "Upstream calls retried, by resilience policy",
+    ["policy"],
+)
+
+HEDGES = Counter(
+    "gen_controls_hedges_total",
+    "Hedge requests sent, by resilience policy",
+    ["policy"],
+)
+
+HEDGE_WINS = Counter(
+    "gen_controls_hedge_wins_total",
+    "Hedged calls answered by the hedge rather than the primary, by resilience policy",
+    ["policy"],
+)
+
+
+class BreakerStateCollector:
+    """Circuit breaker state per resilience policy, read at scrape time.
+
+    A breaker turns half-open by time alone, so the state cannot be pushed into
+    a gauge when it changes. `callers` maps policy name to ResilientCaller.
+    """
+
+    STATES = ("closed", "open", "half_open")
+
+    def __init__(self, callers):
+        self.callers = callers
+
+    def collect(self):
+        family = GaugeMetricFamily(
+            "gen_controls_circuit_breaker_state",
+            "1 for the current circuit breaker state of each resilience policy",
+            labels=["policy", "state"],
+        )
+        for name, caller in list(self.callers.items()):
+            current = caller.breaker.state
+            for state in self.STATES:
+                family.add_metric([name, state], 1.0 if state == current else 0.0)
+        yield family
@@ -1,8 +1,104 @@
+import json
+import logging
+import os
+import queue
+import random
+import sys
 import time
+from logging.handlers import QueueHandler, QueueListener
 
-def log_request(start_time, cfg, usage, stop_reason):
+from .metrics import (
+    COALESCED_CALLS,
+    COMPLETION_TOKENS,
+    FINISH_REASONS,
+    PROMPT_TOKENS,
+    REQUEST_LATENCY,
+    TIME_TO_FIRST_TOKEN,
+    UPSTREAM_ERRORS,
+)
+from .presets import preset_name
+
+logger = logging.getLogger("gen_controls")
+
+LOG_SAMPLE_RATE = float(os.getenv("GEN_CONTROLS_LOG_SAMPLE_RATE", 1.0))
+LOG_QUEUE_SIZE = int(os.getenv("GEN_CONTROLS_LOG_QUEUE_SIZE", 10000))
+
+_listener = None
+
+
+class _JSONFormatter(logging.Formatter):
+    def format(self, record):
+        if isinstance(record.msg, dict):
+            return json.dumps(record.msg, default=str)
+        return super().format(record)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Never blocks the request path: records are dropped when the queue is full."""
+
+    dropped = 0
+
+    def prepare(self, record):
+        # Formatting happens on the listener thread, not the request thread.
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(stream=None):
+    global _listener
+    if _listener is not None:
+        return
+    target = logging.StreamHandler(stream or sys.stdout)
+    target.setFormatter(_JSONFormatter())
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    logger.addHandler(_DroppingQueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    _listener = QueueListener(log_queue, target)
+    _listener.start()
+
+
+def shutdown_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        _listener = None
+
+
+def _emit(record, sampled=True):
+    if sampled and LOG_SAMPLE_RATE < 1.0 and random.random() >= LOG_SAMPLE_RATE:
+        return
+    setup_logging()
+    logger.info(record)
+
+
+def _labels(cfg, model):
+    return {"preset": preset_name(cfg) or "custom", "model": model or "unknown"}
+
+
+def log_request(start_time, cfg, usage, stop_reason, ttft_ms=None, inter_token_ms=None, model=None):
     latency = round((time.time() - start_time) * 1000, 2)
-    print({
+    labels = _labels(cfg, model)
+    REQUEST_LATENCY.labels(**labels).observe(latency / 1000)
+    FINISH_REASONS.labels(**labels, finish_reason=str(stop_reason)).inc()
+    if usage:
+        if usage.get("prompt_tokens") is not None:
+            PROMPT_TOKENS.labels(**labels).observe(usage["prompt_tokens"])
+        if usage.get("completion_tokens") is not None:
+            COMPLETION_TOKENS.labels(**labels).observe(usage["completion_tokens"])
+    if ttft_ms is not None:
+        TIME_TO_FIRST_TOKEN.labels(**labels).observe(ttft_ms / 1000)
+
+    record = {
+        "event": "generation",
+        **labels,
         "latency_ms": latency,
         "temperature": cfg.temperature,
         "top_p": cfg.top_p,
@@ -11,4 +107,85 @@ def log_request(start_time, cfg, usage, stop_reason):
         "pres_penalty": cfg.presence_penalty,
         "stop_reason": stop_reason,
         "total_tokens": usage.get("total_tokens") if usage else None
-    })
\ No newline at end of file
+    }
+    if ttft_ms is not None:
+        record["ttft_ms"] = ttft_ms
+        record["inter_token_ms"] = inter_token_ms
+    _emit(record)
+
+
+def log_error(cfg, error, model=None):
+    labels = _labels(cfg, model)
+    code = getattr(error, "status_code", None)
+    UPSTREAM_ERRORS.labels(**labels, error=str(code) if code else type(error).__name__).inc()
+    # Errors are rare and the thing you go looking for, so they bypass sampling.
+    _emit({"event": "generation_error", **labels, "error": f"{type(error).__name__}: {error}"}, sampled=False)
+
+
+def count_coalesced(cfg, model=None):
+    COALESCED_CALLS.labels(**_labels(cfg, model)).inc()
+
+
+class StreamTimer:
+    """Time-to-first-token and mean gap between streamed content chunks."""
+
+    def __init__(self, start_time):
+        self.start_time = start_time
+        self.first = None
+        self.last = None
+        self.chunks = 0
+
+    def mark(self):
+        now = time.time()
+        if self.first is None:
+            self.first = now
+        self.last = now
+        self.chunks += 1
+
+    @property
+    def ttft_ms(self):
+        if self.first is None:
+            return None
+        return round((self.first - self.start_time) * 1000, 2)
+
+    @property
+    def inter_token_ms(self):
+        if self.chunks < 2:
+            return None
+        return round((self.last - self.first) * 1000 / (self.chunks - 1), 2)
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, int(round(pct / 100 * len(sorted_values))) - 1)
+    return sorted_values[index]
+
+
+def log_batch(start_time, cfg, results):
+    succeeded = [r for r in results if "error" not in r]
+    latencies = sorted(r["latency_ms"] for r in succeeded)
+    finish_reasons = {}
+    usage_totals = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+
+    for r in succeeded:
+        finish_reasons[r["finish_reason"]] = finish_reasons.get(r["finish_reason"], 0) + 1
+        for key in usage_totals:
+            usage_totals[key] += (r.get("usage") or {}).get(key) or 0
+
+    summary = {
+        "event": "batch",
+        "batch_size": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "wall_ms": round((time.time() - start_time) * 1000, 2),
+        "latency_p50_ms": _percentile(latencies, 50),
+        "latency_p95_ms": _percentile(latencies, 95),
+        "latency_max_ms": latencies[-1] if latencies else None,
+        "finish_reasons": finish_reasons,
+        "temperature": cfg.temperature,
+        "max_tokens": cfg.max_tokens,
+        **usage_totals,
+    }
+    _emit(summary, sampled=False)
+    return summary
@@ -1,4 +1,4 @@
-from .config import GenerationConfig
+from .config import GenerationConfig, ResilienceConfig
 
 PRESETS = {
     "deterministic_tool": GenerationConfig(
@@ -23,4 +23,23 @@ PRESETS = {
         frequency_penalty=0.3,
         presence_penalty=0.2
     ),
-}
\ No newline at end of file
+}
+
+# Short, cheap completions are worth hedging; long creative ones are not.
+RESILIENCE = {
+    "deterministic_tool": ResilienceConfig(max_retries=3, hedge=True),
+    "rag_qa": ResilienceConfig(max_retries=2, hedge=True, hedge_quantile=99.0),
+    "creative_writer": ResilienceConfig(max_retries=1),
+}
+
+DEFAULT_RESILIENCE = ResilienceConfig()
+
+
+def preset_name(cfg):
+    for name, preset in PRESETS.items():
+        if cfg is preset:
+            return name
+    for name, preset in PRESETS.items():
+        if cfg == preset:
+            return name
+    return None
@@ -0,0 +1,330 @@
+import asyncio
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import httpx
+import requests
+
+from .client import UpstreamError
+from .config import ResilienceConfig
+from .metrics import HEDGE_WINS, HEDGES, RETRIES
+
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout, httpx.TransportError, TimeoutError)
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+def is_retryable(error):
+    if isinstance(error, UpstreamError):
+        return error.status_code == 429 or (error.status_code or 0) >= 500
+    return isinstance(error, TRANSIENT_ERRORS)
+
+
+class RetryBudget:
+    """Token bucket that caps retries at `ratio` of recent requests process-wide.
+
+    Stops a struggling upstream from being hit by a retry storm on top of the
+    original traffic.
+    """
+
+    def __init__(self, ratio=0.2, min_tokens=10.0, max_tokens=100.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = min_tokens
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+
+class CircuitBreaker:
+    """Opens after consecutive upstream failures; lets one trial call through after reset_s."""
+
+    def __init__(self, failure_threshold=5, reset_s=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_s = reset_s
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_s:
+                return "half_open"
+            return "open"
+
+    def admit(self):
+        """None if the call must fail fast, else "closed" or "trial" (the one half-open call)."""
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at < self.reset_s or self._trial_in_flight:
+                return None
+            self._trial_in_flight = True
+            return "trial"
+
+    def allow(self):
+        return self.admit() is not None
+
+    def end_trial(self):
+        """Count a trial that ended without a recorded success or failure as a failure.
+
+        Covers errors the caller does not classify (a bad body, a KeyError)
+        and cancellation, which would otherwise leave the breaker half open
+        with its only trial slot taken forever.
+        """
+        with self._lock:
+            if self._trial_in_flight:
+                self._trial_in_flight = False
+                self._failures += 1
+                self._opened_at = time.monotonic()
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    def __init__(self, window=500):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, pct, min_samples):
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[max(0, math.ceil(len(ordered) * pct / 100) - 1)]
+
+
+_budget = RetryBudget()
+
+# A sync caller can only return the first success if both attempts run off its
+# thread, so a hedged call reserves a pair of workers before it starts and
+# never waits for one. Calls that find no free pair run inline on the calling
+# thread, unhedged: the pool never caps how many calls are in flight, and a
+# hedge never queues behind other calls' primaries.
+HEDGE_PAIRS = 16
+_hedge_pool = ThreadPoolExecutor(max_workers=2 * HEDGE_PAIRS, thread_name_prefix="gen-controls-hedge")
+_hedge_pairs = threading.BoundedSemaphore(HEDGE_PAIRS)
+
+
+def _release_pair_when_done(futures):
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        _hedge_pairs.release()
+
+    for future in futures:
+        future.add_done_callback(done)
+
+
+class ResilientCaller:
+    """Retries, hedging and circuit breaking around one upstream call.
+
+    `call` is used from request threads and `acall` from the event loop; both
+    share the breaker, latency window and the process-wide retry budget.
+    `name` labels its retry and hedge counters in /metrics.
+    """
+
+    def __init__(self, cfg: ResilienceConfig = None, budget: RetryBudget = None, name: str = "default"):
+        self.cfg = cfg or ResilienceConfig()
+        self.name = name
+        self.budget = budget or _budget
+        self.breaker = CircuitBreaker(self.cfg.breaker_failure_threshold, self.cfg.breaker_reset_s)
+        self.latency = LatencyTracker()
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _hedge_delay(self):
+        if not self.cfg.hedge:
+            return None
+        quantile = self.latency.quantile(self.cfg.hedge_quantile, self.cfg.hedge_min_samples)
+        if quantile is None:
+            return None
+        return max(self.cfg.hedge_min_delay_s, quantile)
+
+    def _winner(self, done, pending, hedge):
+        for future in done:
+            if future.exception() is None:
+                if future is hedge:
+                    self.hedge_wins += 1
+                    HEDGE_WINS.labels(policy=self.name).inc()
+                return future
+        return None if pending else next(iter(done))
+
+    def _backoff(self, attempt, error):
+        delay = random.uniform(0, min(self.cfg.backoff_max_s, self.cfg.backoff_base_s * 2 ** attempt))
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _should_retry(self, attempt, error):
+        # 4xx other than 429 are our fault: the upstream answered, so they count
+        # as healthy for the breaker and are never retried.
+        if not is_retryable(error):
+            if isinstance(error, UpstreamError):
+                self.breaker.record_success()
+            return None
+        self.breaker.record_failure()
+        if attempt >= self.cfg.max_retries:
+            return None
+        delay = self._backoff(attempt, error)
+        if delay > self.cfg.backoff_max_s or not self.budget.try_spend():
+            return None
+        self.retries += 1
+        RETRIES.labels(policy=self.name).inc()
+        return delay
+
+    def _check_breaker(self):
+        admitted = self.breaker.admit()
+        if admitted is None:
+            raise CircuitOpenError("OpenRouter circuit open; failing fast")
+        return admitted == "trial"
+
+    def call(self, fn):
+        self.budget.record_request()
+        attempt = 0
+        while True:
+            trial = self._check_breaker()
+            start = time.monotonic()
+            try:
+                result = self._hedged(fn)
+            except Exception as e:
+                delay = self._should_retry(attempt, e)
+                if delay is None:
+                    raise
+            else:
+                self.latency.record(time.monotonic() - start)
+                self.breaker.record_success()
+                return result
+            finally:
+                if trial:
+                    self.breaker.end_trial()
+            time.sleep(delay)
+            attempt += 1
+
+    def _hedged(self, fn):
+        delay = self._hedge_delay()
+        if delay is None or not _hedge_pairs.acquire(blocking=False):
+            return fn()
+
+        primary = _hedge_pool.submit(fn)
+        attempts = [primary]
+        try:
+            done, _ = wait([primary], timeout=delay)
+            if done:
+                return primary.result()
+
+            self.hedges += 1
+            HEDGES.labels(policy=self.name).inc()
+            hedge = _hedge_pool.submit(fn)
+            attempts.append(hedge)
+            pending = {primary, hedge}
+            while True:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                # Take the first success; only fail once both attempts have failed.
+                winner = self._winner(done, pending, hedge)
+                if winner is not None:
+                    return winner.result()
+        finally:
+            # The loser may still be running; the pair is free once it finishes.
+            _release_pair_when_done(attempts)
+
+    async def acall(self, coro_fn):
+        self.budget.record_request()
+        attempt = 0
+        while True:
+            trial = self._check_breaker()
+            start = time.monotonic()
+            try:
+                result = await self._ahedged(coro_fn)
+            except Exception as e:
+                delay = self._should_retry(attempt, e)
+                if delay is None:
+                    raise
+            else:
+                self.latency.record(time.monotonic() - start)
+                self.breaker.record_success()
+                return result
+            finally:
+                # Also runs on CancelledError, which `except Exception` lets through.
+                if trial:
+                    self.breaker.end_trial()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _ahedged(self, coro_fn):
+        delay = self._hedge_delay()
+        if delay is None:
+            return await coro_fn()
+
+        primary = asyncio.ensure_future(coro_fn())
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+        except BaseException:
+            # The caller was cancelled while the primary was still running.
+            primary.cancel()
+            raise
+        if done:
+            return primary.result()
+
+        self.hedges += 1
+        HEDGES.labels(policy=self.name).inc()
+        hedge = asyncio.ensure_future(coro_fn())
+        pending = {primary, hedge}
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = self._winner(done, pending, hedge)
+                if winner is not None:
+                    return winner.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self):
+        return {
+            "breaker": self.breaker.state,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
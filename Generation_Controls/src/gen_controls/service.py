@@ -1,35 +1,243 @@
+import asyncio
+import copy
 import time
-from .client import OpenRouterClient
-from .observability import log_request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from prometheus_client import REGISTRY
+from . import client as client_module
+from .cache import cache_key, get_cache, is_deterministic
+from .client import AsyncOpenRouterClient, OpenRouterClient
+from .metrics import BreakerStateCollector
+from .observability import StreamTimer, count_coalesced, log_batch, log_error, log_request
+from .presets import DEFAULT_RESILIENCE, RESILIENCE, preset_name
+from .resilience import ResilientCaller
+from .singleflight import AsyncSingleFlight, SingleFlight
 from .validation import enforce_bounds
 
 client = OpenRouterClient()
+async_client = AsyncOpenRouterClient()
 
-def generate_text(prompt: str, cfg):
-    start = time.time()
+# Identical (model, messages, config) calls already in flight share one upstream request.
+inflight = SingleFlight()
+async_inflight = AsyncSingleFlight()
+
+# One retry/hedge/breaker policy per preset; custom configs share "default".
+callers = {}
+REGISTRY.register(BreakerStateCollector(callers))
+
+def _caller(cfg):
+    name = preset_name(cfg) or "default"
+    if name not in callers:
+        callers.setdefault(name, ResilientCaller(RESILIENCE.get(name, DEFAULT_RESILIENCE), name=name))
+    return callers[name]
 
+def _prepare(prompt: str, cfg):
     cfg = enforce_bounds(cfg)
 
     messages = [{"role": "user", "content": prompt}]
+    params = {
+        "temperature": cfg.temperature,
+        "top_p": cfg.top_p,
+        "max_tokens": cfg.max_tokens,
+        "frequency_penalty": cfg.frequency_penalty,
+        "presence_penalty": cfg.presence_penalty,
+        "stop": cfg.stop,
+    }
 
-    response = client.generate(
-        messages=messages,
-        temperature=cfg.temperature,
-        top_p=cfg.top_p,
-        max_tokens=cfg.max_tokens,
-        frequency_penalty=cfg.frequency_penalty,
-        presence_penalty=cfg.presence_penalty,
-        stop=cfg.stop,
-    )
+    return cfg, messages, params
 
+def _finish(start, cfg, response):
     text = response["choices"][0]["message"]["content"]
     finish_reason = response["choices"][0]["finish_reason"]
     usage = response.get("usage")
 
-    log_request(start, cfg, usage, finish_reason)
+    log_request(start, cfg, usage, finish_reason, model=client_module.settings().model)
 
     return {
         "text": text,
         "finish_reason": finish_reason,
         "usage": usage,
-    }
\ No newline at end of file
+    }
+
+# Both tiers hand out the object they hold, so callers only ever see copies:
+# a caller editing its result must not change what the next caller is served.
+def _cache_lookup(key, cfg, bypass_cache):
+    cache = get_cache()
+    if cache is None or bypass_cache or not is_deterministic(cfg):
+        return None
+    return copy.deepcopy(cache.get(key))
+
+def _cache_store(key, cfg, bypass_cache, result):
+    cache = get_cache()
+    if cache is not None and not bypass_cache and is_deterministic(cfg):
+        cache.set(key, copy.deepcopy(result))
+    return result
+
+def coalescing_stats():
+    return {"collapsed": inflight.collapsed, "async_collapsed": async_inflight.collapsed}
+
+def resilience_stats():
+    return {name: caller.stats() for name, caller in callers.items()}
+
+def generate_text(prompt: str, cfg, bypass_cache: bool = False):
+    start = time.time()
+    cfg, messages, params = _prepare(prompt, cfg)
+    key = cache_key(client_module.settings().model, messages, cfg)
+
+    cached = _cache_lookup(key, cfg, bypass_cache)
+    if cached is not None:
+        return cached
+
+    caller = _caller(cfg)
+    try:
+        response = inflight.do(
+            key,
+            lambda: caller.call(lambda: client.generate(messages=messages, **params)),
+            on_join=lambda: count_coalesced(cfg, model=client_module.settings().model),
+        )
+    except Exception as e:
+        log_error(cfg, e, model=client_module.settings().model)
+        raise
+    return _cache_store(key, cfg, bypass_cache, _finish(start, cfg, response))
+
+async def agenerate_text(prompt: str, cfg, bypass_cache: bool = False):
+    start = time.time()
+    cfg, messages, params = _prepare(prompt, cfg)
+    key = cache_key(client_module.settings().model, messages, cfg)
+
+    cached = _cache_lookup(key, cfg, bypass_cache)
+    if cached is not None:
+        return cached
+
+    caller = _caller(cfg)
+    try:
+        response = await async_inflight.do(
+            key,
+            lambda: caller.acall(lambda: async_client.generate(messages=messages, **params)),
+            on_join=lambda: count_coalesced(cfg, model=client_module.settings().model),
+        )
+    except Exception as e:
+        log_error(cfg, e, model=client_module.settings().model)
+        raise
+    return _cache_store(key, cfg, bypass_cache, _finish(start, cfg, response))
+
+def _stream_event(event, state, timer):
+    """Fold one upstream chunk into `state`; return the content delta, if any."""
+    if event.get("usage"):
+        state["usage"] = event["usage"]
+    for choice in event.get("choices") or []:
+        if choice.get("finish_reason"):
+            state["finish_reason"] = choice["finish_reason"]
+        delta = (choice.get("delta") or {}).get("content")
+        if delta:
+            timer.mark()
+            return delta
+    return None
+
+def _stream_final(start, cfg, state, timer):
+    log_request(
+        start, cfg, state["usage"], state["finish_reason"],
+        ttft_ms=timer.ttft_ms, inter_token_ms=timer.inter_token_ms, model=client_module.settings().model,
+    )
+    return {"delta": "", "finish_reason": state["finish_reason"], "usage": state["usage"]}
+
+def stream_text(prompt: str, cfg):
+    """Yield {"delta": ...} chunks; the last one also carries finish_reason and usage."""
+    start = time.time()
+    cfg, messages, params = _prepare(prompt, cfg)
+    state = {"finish_reason": None, "usage": None}
+    timer = StreamTimer(start)
+
+    try:
+        for event in client.stream(messages=messages, **params):
+            delta = _stream_event(event, state, timer)
+            if delta:
+                yield {"delta": delta}
+    except Exception as e:
+        log_error(cfg, e, model=client_module.settings().model)
+        raise
+
+    yield _stream_final(start, cfg, state, timer)
+
+async def astream_text(prompt: str, cfg):
+    start = time.time()
+    cfg, messages, params = _prepare(prompt, cfg)
+    state = {"finish_reason": None, "usage": None}
+    timer = StreamTimer(start)
+
+    try:
+        async for event in async_client.stream(messages=messages, **params):
+            delta = _stream_event(event, state, timer)
+            if delta:
+                yield {"delta": delta}
+    except Exception as e:
+        log_error(cfg, e, model=client_module.settings().model)
+        raise
+
+    yield _stream_final(start, cfg, state, timer)
+
+def _batch_item(start, result=None, error=None):
+    latency_ms = round((time.time() - start) * 1000, 2)
+    if error is not None:
+        return {"error": f"{type(error).__name__}: {error}", "latency_ms": latency_ms}
+    return {**result, "latency_ms": latency_ms}
+
+def _generate_item(prompt, cfg):
+    start = time.time()
+    try:
+        return _batch_item(start, generate_text(prompt, cfg))
+    except Exception as e:
+        return _batch_item(start, error=e)
+
+async def _agenerate_item(prompt, cfg):
+    start = time.time()
+    try:
+        return _batch_item(start, await agenerate_text(prompt, cfg))
+    except Exception as e:
+        return _batch_item(start, error=e)
+
+def iter_generate_many(prompts, cfg, concurrency: int = 8):
+    """Yield (index, result) pairs in completion order; failures become {"error": ...} items."""
+    if concurrency < 1:
+        raise ValueError("concurrency must be >= 1")
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(_generate_item, prompt, cfg): i for i, prompt in enumerate(prompts)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+async def aiter_generate_many(prompts, cfg, concurrency: int = 8):
+    """Async counterpart of iter_generate_many, using `concurrency` worker tasks."""
+    if concurrency < 1:
+        raise ValueError("concurrency must be >= 1")
+    prompts = list(prompts)
+    pending = iter(enumerate(prompts))
+    done = asyncio.Queue()
+
+    async def worker():
+        for index, prompt in pending:
+            await done.put((index, await _agenerate_item(prompt, cfg)))
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(prompts)))]
+    try:
+        for _ in range(len(prompts)):
+            yield await done.get()
+    finally:
+        for task in workers:
+            task.cancel()
+
+def generate_many(prompts, cfg, concurrency: int = 8):
+    start = time.time()
+    prompts = list(prompts)
+    results = [None] * len(prompts)
+    for index, result in iter_generate_many(prompts, cfg, concurrency):
+        results[index] = result
+    log_batch(start, cfg, results)
+    return results
+
+async def agenerate_many(prompts, cfg, concurrency: int = 8):
+    start = time.time()
+    prompts = list(prompts)
+    results = [None] * len(prompts)
+    async for index, result in aiter_generate_many(prompts, cfg, concurrency):
+        results[index] = result
+    log_batch(start, cfg, results)
+    return results
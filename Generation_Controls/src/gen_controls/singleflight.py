@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import weakref
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key onto one execution (threads).
+
+    `on_join`, if given, is called each time a caller joins a call in flight.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.collapsed = 0
+
+    def do(self, key, fn, on_join=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.collapsed += 1
+
+        if not leader:
+            if on_join is not None:
+                on_join()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class _AsyncCall:
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncSingleFlight:
+    """asyncio counterpart of SingleFlight.
+
+    The shared call runs as its own task, which the leader and the followers
+    all await through asyncio.shield: cancelling any one caller, the leader
+    included, leaves it running for the others. It is cancelled once nobody
+    is waiting for it. Calls are kept per event loop, so a caller never
+    awaits a task that belongs to another loop.
+    """
+
+    def __init__(self):
+        self._calls = weakref.WeakKeyDictionary()  # loop -> {key: _AsyncCall}
+        self.collapsed = 0
+
+    async def do(self, key, coro_fn, on_join=None):
+        loop = asyncio.get_running_loop()
+        calls = self._calls.setdefault(loop, {})
+        call = calls.get(key)
+        if call is None:
+            call = calls[key] = _AsyncCall(loop.create_task(coro_fn()))
+            call.task.add_done_callback(lambda task: self._finished(calls, key, call))
+        else:
+            self.collapsed += 1
+            if on_join is not None:
+                on_join()
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if not call.waiters and not call.task.done():
+                # Forget it now, so a caller arriving before the task has unwound starts afresh.
+                self._forget(calls, key, call)
+                call.task.cancel()
+
+    def _finished(self, calls, key, call):
+        self._forget(calls, key, call)
+        # Mark the exception retrieved even when nobody was left waiting.
+        if not call.task.cancelled():
+            call.task.exception()
+
+    @staticmethod
+    def _forget(calls, key, call):
+        if calls.get(key) is call:
+            del calls[key]
@@ -0,0 +1,229 @@
+import asyncio
+import json
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import TransportConfig
+
+
+class TransportResponse:
+    def __init__(self, status_code, headers, content: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class StreamHandle:
+    def __init__(self, status_code, lines, read):
+        self.status_code = status_code
+        self.lines = lines
+        self.read = read
+
+
+class PooledTransport:
+    """Keep-alive HTTP transport shared by every OpenRouterClient in the process.
+
+    HTTP/1.1 goes through a pooled requests.Session; with `http2=True` an
+    httpx.Client is used instead (requires the `h2` package). Both are safe to
+    share across request threads.
+
+    The asyncio path uses an httpx.AsyncClient with the same limits. Its pool is
+    bound to the event loop that created it, so each loop gets its own client;
+    clients of loops that have since closed are dropped.
+    """
+
+    def __init__(self, cfg: TransportConfig = None):
+        self.cfg = cfg or TransportConfig()
+        self._session = None
+        self._async_clients = {}
+        self._lock = threading.Lock()
+
+    def _httpx_options(self):
+        return {
+            "http2": self.cfg.http2,
+            "verify": self.cfg.ca_bundle or True,
+            "limits": httpx.Limits(
+                max_connections=self.cfg.pool_size,
+                max_keepalive_connections=self.cfg.max_keepalive,
+                keepalive_expiry=self.cfg.keepalive_expiry,
+            ),
+            "timeout": httpx.Timeout(
+                connect=self.cfg.connect_timeout,
+                read=self.cfg.read_timeout,
+                write=self.cfg.read_timeout,
+                pool=self.cfg.connect_timeout,
+            ),
+        }
+
+    def _build_session(self):
+        if self.cfg.http2:
+            return httpx.Client(**self._httpx_options())
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.cfg.pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def post_json(self, url, headers, payload) -> TransportResponse:
+        # Both clients only bound individual phases. The total deadline is
+        # checked between body chunks so a slow-dripping upstream cannot hold a
+        # worker forever, and no single read may wait longer than total_timeout,
+        # so a stalled one overshoots the deadline by at most that much.
+        deadline = time.monotonic() + self.cfg.total_timeout
+        read_timeout = min(self.cfg.read_timeout, self.cfg.total_timeout)
+        if self.cfg.http2:
+            timeout = httpx.Timeout(
+                connect=self.cfg.connect_timeout,
+                read=read_timeout,
+                write=self.cfg.read_timeout,
+                pool=self.cfg.connect_timeout,
+            )
+            with self.session.stream("POST", url, headers=headers, json=payload, timeout=timeout) as response:
+                content = self._read(response.iter_bytes(), deadline)
+                return TransportResponse(response.status_code, response.headers, content)
+
+        with self.session.post(
+            url,
+            headers=headers,
+            json=payload,
+            timeout=(self.cfg.connect_timeout, read_timeout),
+            verify=self.cfg.ca_bundle or True,
+            stream=True,
+        ) as response:
+            content = self._read(response.iter_content(chunk_size=8192), deadline)
+            return TransportResponse(response.status_code, response.headers, content)
+
+    @contextmanager
+    def stream(self, url, headers, payload):
+        # Streams are bounded by the read timeout between chunks rather than
+        # by total_timeout: a long generation is fine as long as it keeps moving.
+        if self.cfg.http2:
+            with self.session.stream("POST", url, headers=headers, json=payload) as response:
+                yield StreamHandle(response.status_code, response.iter_lines(), response.read)
+            return
+
+        with self.session.post(
+            url,
+            headers=headers,
+            json=payload,
+            timeout=(self.cfg.connect_timeout, self.cfg.read_timeout),
+            verify=self.cfg.ca_bundle or True,
+            stream=True,
+        ) as response:
+            lines = (line.decode("utf-8") for line in response.iter_lines())
+            yield StreamHandle(response.status_code, lines, lambda: response.content)
+
+    def _read(self, chunks, deadline):
+        body = []
+        for chunk in chunks:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"total timeout of {self.cfg.total_timeout}s exceeded")
+            body.append(chunk)
+        return b"".join(body)
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                # A closed loop's client cannot be awaited any more; dropping it
+                # lets its sockets be collected with the loop.
+                for stale in [other for other in self._async_clients if other.is_closed()]:
+                    del self._async_clients[stale]
+                client = self._async_clients[loop] = httpx.AsyncClient(**self._httpx_options())
+        return client
+
+    async def apost_json(self, url, headers, payload) -> TransportResponse:
+        # The deadline covers sending, the headers and the whole body read.
+        try:
+            async with asyncio.timeout(self.cfg.total_timeout):
+                response = await self.async_client.post(url, headers=headers, json=payload)
+                return TransportResponse(response.status_code, response.headers, response.content)
+        except TimeoutError:
+            raise TimeoutError(f"total timeout of {self.cfg.total_timeout}s exceeded") from None
+
+    @asynccontextmanager
+    async def astream(self, url, headers, payload):
+        async with self.async_client.stream("POST", url, headers=headers, json=payload) as response:
+            yield StreamHandle(response.status_code, response.aiter_lines(), response.aread)
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    async def aclose(self):
+        # Clients of other running loops are closed on the loop that owns them;
+        # an idle loop keeps its client until it runs again or closes.
+        self.close()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.pop(loop, None)
+            running = [(other, c) for other, c in self._async_clients.items() if other.is_running()]
+            for other, _ in running:
+                del self._async_clients[other]
+        for other, other_client in running:
+            asyncio.run_coroutine_threadsafe(other_client.aclose(), other)
+        if client is not None:
+            await client.aclose()
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> PooledTransport:
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = PooledTransport()
+    return _transport
+
+
+def configure_transport(cfg: TransportConfig) -> PooledTransport:
+    global _transport
+    with _transport_lock:
+        if _transport is not None:
+            _transport.close()
+        _transport = PooledTransport(cfg)
+    return _transport
+
+
+def close_transport():
+    global _transport
+    with _transport_lock:
+        if _transport is not None:
+            _transport.close()
+            _transport = None
+
+
+async def aclose_transport():
+    global _transport
+    with _transport_lock:
+        transport, _transport = _transport, None
+    if transport is not None:
+        await transport.aclose()
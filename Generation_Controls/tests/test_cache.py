@@ -0,0 +1,114 @@
+from unittest.mock import patch
+
+import pytest
+from prometheus_client import REGISTRY
+
+from gen_controls.cache import ResponseCache, configure_cache, disable_cache, get_cache
+from gen_controls.config import GenerationConfig
+from gen_controls.service import generate_text
+
+
+MOCK_RESPONSE = {
+    "choices": [{"message": {"content": "cached"}, "finish_reason": "stop"}],
+    "usage": {"total_tokens": 15},
+}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = configure_cache(max_entries=2, path=str(tmp_path / "responses.sqlite"))
+    yield cache
+    disable_cache()
+
+
+@patch("gen_controls.client.OpenRouterClient.generate")
+def test_deterministic_requests_hit_cache(mock_generate, cache):
+    mock_generate.return_value = MOCK_RESPONSE
+    cfg = GenerationConfig(temperature=0.0)
+    hits_before = REGISTRY.get_sample_value("gen_controls_cache_hits_total", {"tier": "memory"}) or 0
+    misses_before = REGISTRY.get_sample_value("gen_controls_cache_misses_total")
+
+    first = generate_text("Extract JSON", cfg)
+    second = generate_text("Extract JSON", cfg)
+
+    assert first == second
+    assert mock_generate.call_count == 1
+    assert cache.stats()["hits"] == 1
+    assert REGISTRY.get_sample_value("gen_controls_cache_hits_total", {"tier": "memory"}) == hits_before + 1
+    assert REGISTRY.get_sample_value("gen_controls_cache_misses_total") == misses_before + 1
+
+
+@patch("gen_controls.client.OpenRouterClient.generate")
+def test_sampling_and_bypass_skip_cache(mock_generate, cache):
+    mock_generate.return_value = MOCK_RESPONSE
+
+    generate_text("Write a poem", GenerationConfig(temperature=0.9))
+    generate_text("Write a poem", GenerationConfig(temperature=0.9))
+    generate_text("Extract JSON", GenerationConfig(temperature=0.0), bypass_cache=True)
+
+    assert mock_generate.call_count == 3
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction_and_disk_tier(tmp_path):
+    path = str(tmp_path / "responses.sqlite")
+    cache = ResponseCache(max_entries=2, path=path)
+    for key in ("a", "b", "c"):
+        cache.set(key, {"text": key})
+
+    assert cache.stats()["evictions"] == 1
+    assert cache.get("a") == {"text": "a"}
+    assert cache.stats()["disk_hits"] == 1
+    cache.close()
+
+    restarted = ResponseCache(max_entries=2, path=path)
+    assert restarted.get("c") == {"text": "c"}
+    restarted.close()
+
+
+def test_ttl_expiry():
+    cache = ResponseCache(ttl_s=-1)
+    cache.set("a", {"text": "a"})
+
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+@patch("gen_controls.client.OpenRouterClient.generate")
+@pytest.mark.parametrize("tier", ["memory", "disk"])
+def test_cached_results_are_copies(mock_generate, cache, tier):
+    mock_generate.return_value = MOCK_RESPONSE
+    cfg = GenerationConfig(temperature=0.0)
+    first = generate_text("Extract JSON", cfg)
+    if tier == "disk":
+        # Push the entry out of the in-process tier; the next read comes from SQLite.
+        cache.set("x", {})
+        cache.set("y", {})
+
+    first["text"] = "edited by the first caller"
+    second = generate_text("Extract JSON", cfg)
+    second["usage"]["total_tokens"] = -1
+    third = generate_text("Extract JSON", cfg)
+
+    assert mock_generate.call_count == 1
+    assert second["text"] == third["text"] == "cached"
+    assert third["usage"]["total_tokens"] == 15
+    assert cache.stats()["disk_hits"] == (1 if tier == "disk" else 0)
+
+
+def test_api_lifespan_configures_cache_from_env(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from api.app import app
+
+    monkeypatch.setenv("GEN_CONTROLS_CACHE_MAX_ENTRIES", "10")
+    monkeypatch.setenv("GEN_CONTROLS_CACHE_TTL_S", "60")
+    monkeypatch.setenv("GEN_CONTROLS_CACHE_PATH", str(tmp_path / "responses.sqlite"))
+    with TestClient(app):
+        cache = get_cache()
+        assert (cache.max_entries, cache.ttl_s) == (10, 60.0)
+        assert cache.disk is not None
+    assert get_cache() is None
+
+    monkeypatch.setenv("GEN_CONTROLS_CACHE_MAX_ENTRIES", "0")
+    with TestClient(app):
+        assert get_cache() is None
@@ -0,0 +1,225 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from prometheus_client import REGISTRY
+
+from stub_server import StubServer
+from gen_controls.client import AsyncOpenRouterClient, OpenRouterClient, UpstreamError
+from gen_controls.config import ResilienceConfig, TransportConfig
+from gen_controls.resilience import HEDGE_PAIRS, CircuitOpenError, ResilientCaller, RetryBudget
+from gen_controls.transport import PooledTransport
+
+MESSAGES = [{"role": "user", "content": "Hi"}]
+
+
+def _client(server):
+    transport = PooledTransport(TransportConfig(pool_size=8))
+    return OpenRouterClient(transport=transport, base_url=server.url)
+
+
+def test_retries_5xx_honoring_retry_after():
+    with StubServer(fail_first=2, retry_after=0) as server:
+        client = _client(server)
+        caller = ResilientCaller(ResilienceConfig(max_retries=3, backoff_base_s=0.01), name="retry-test")
+
+        response = caller.call(lambda: client.generate(MESSAGES))
+
+    assert response["choices"][0]["message"]["content"] == "stub response"
+    assert server.requests == 3
+    assert caller.retries == 2
+    assert REGISTRY.get_sample_value("gen_controls_retries_total", {"policy": "retry-test"}) == 2
+
+
+def test_async_retries_5xx():
+    async def run(client, caller):
+        response = await caller.acall(lambda: client.generate(MESSAGES))
+        await client.transport.aclose()
+        return response
+
+    with StubServer(fail_first=1, error_status=429) as server:
+        client = AsyncOpenRouterClient(transport=PooledTransport(), base_url=server.url)
+        caller = ResilientCaller(ResilienceConfig(backoff_base_s=0.01))
+
+        response = asyncio.run(run(client, caller))
+
+    assert response["usage"]["total_tokens"] == 15
+    assert server.requests == 2
+
+
+def test_client_errors_are_not_retried():
+    with StubServer(fail_first=1, error_status=400) as server:
+        client = _client(server)
+        caller = ResilientCaller(ResilienceConfig(max_retries=3, backoff_base_s=0.01))
+
+        with pytest.raises(UpstreamError) as exc:
+            caller.call(lambda: client.generate(MESSAGES))
+
+    assert exc.value.status_code == 400
+    assert server.requests == 1
+
+
+def test_retry_budget_caps_retries():
+    with StubServer(fail_first=100) as server:
+        client = _client(server)
+        caller = ResilientCaller(
+            ResilienceConfig(max_retries=5, backoff_base_s=0.001, breaker_failure_threshold=100),
+            budget=RetryBudget(ratio=0.0, min_tokens=2),
+        )
+
+        with pytest.raises(UpstreamError):
+            caller.call(lambda: client.generate(MESSAGES))
+
+    assert server.requests == 3
+
+
+def test_circuit_breaker_fails_fast_then_recovers():
+    with StubServer(fail_first=3) as server:
+        client = _client(server)
+        caller = ResilientCaller(
+            ResilienceConfig(max_retries=0, breaker_failure_threshold=3, breaker_reset_s=0.2)
+        )
+
+        for _ in range(3):
+            with pytest.raises(UpstreamError):
+                caller.call(lambda: client.generate(MESSAGES))
+        with pytest.raises(CircuitOpenError):
+            caller.call(lambda: client.generate(MESSAGES))
+        assert server.requests == 3
+
+        time.sleep(0.25)
+        caller.call(lambda: client.generate(MESSAGES))
+
+    assert caller.breaker.state == "closed"
+
+
+def _open_breaker(caller):
+    def fail():
+        raise UpstreamError("down", status_code=503)
+    for _ in range(caller.cfg.breaker_failure_threshold):
+        with pytest.raises(UpstreamError):
+            caller.call(fail)
+    assert caller.breaker.state == "open"
+
+
+def test_unclassified_error_in_trial_does_not_wedge_breaker():
+    caller = ResilientCaller(ResilienceConfig(max_retries=0, breaker_failure_threshold=1, breaker_reset_s=0.05))
+    _open_breaker(caller)
+    time.sleep(0.06)
+
+    def bad_body():
+        raise KeyError("choices")
+    with pytest.raises(KeyError):
+        caller.call(bad_body)
+    # Counted as a failed trial: open again, then one more trial later.
+    with pytest.raises(CircuitOpenError):
+        caller.call(lambda: "ok")
+    time.sleep(0.06)
+    assert caller.call(lambda: "ok") == "ok"
+    assert caller.breaker.state == "closed"
+
+
+def test_cancelled_async_trial_does_not_wedge_breaker():
+    caller = ResilientCaller(ResilienceConfig(max_retries=0, breaker_failure_threshold=1, breaker_reset_s=0.05))
+    _open_breaker(caller)
+    time.sleep(0.06)
+
+    async def run():
+        trial = asyncio.ensure_future(caller.acall(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0.01)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        await asyncio.sleep(0.06)
+
+        async def ok():
+            return "ok"
+        return await caller.acall(ok)
+
+    assert asyncio.run(run()) == "ok"
+    assert caller.breaker.state == "closed"
+
+
+def _p99(caller, client, n):
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        caller.call(lambda: client.generate(MESSAGES))
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies[int(n * 0.99) - 1]
+
+
+def test_hedging_cuts_p99_under_latency_spikes():
+    spikes = dict(latency_s=0.005, spike_rate=0.02, spike_s=0.4)
+
+    with StubServer(seed=1, **spikes) as server:
+        plain = _p99(ResilientCaller(ResilienceConfig()), _client(server), 300)
+
+    with StubServer(seed=1, **spikes) as server:
+        hedged_caller = ResilientCaller(ResilienceConfig(hedge=True, hedge_min_delay_s=0.02))
+        hedged = _p99(hedged_caller, _client(server), 300)
+
+    assert hedged_caller.hedges > 0
+    assert hedged < plain / 2
+
+
+def _warm_hedged_caller(seconds=0.01):
+    caller = ResilientCaller(ResilienceConfig(hedge=True, hedge_min_delay_s=0.5))
+    for _ in range(caller.cfg.hedge_min_samples):
+        caller.latency.record(seconds)
+    return caller
+
+
+def test_hedged_calls_are_not_capped_by_the_hedge_pool():
+    caller = _warm_hedged_caller()
+    callers = 4 * HEDGE_PAIRS
+    lock = threading.Lock()
+    in_flight = peak = 0
+    all_started = threading.Barrier(callers, timeout=5)
+
+    def fn():
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        all_started.wait()  # only passes once every caller is in flight at once
+        with lock:
+            in_flight -= 1
+        return "ok"
+
+    threads = [threading.Thread(target=caller.call, args=(fn,)) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak == callers
+    assert not all_started.broken
+
+
+def test_cancelled_hedged_call_cancels_primary():
+    caller = _warm_hedged_caller()
+    primary_cancelled = False
+
+    async def slow():
+        nonlocal primary_cancelled
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            primary_cancelled = True
+            raise
+
+    async def run():
+        task = asyncio.ensure_future(caller.acall(slow))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0.01)
+        # Checked before asyncio.run cancels whatever tasks are left over.
+        assert primary_cancelled
+
+    asyncio.run(run())
+    assert caller.hedges == 0
@@ -1,6 +1,7 @@
+import asyncio
 import pytest
-from unittest.mock import patch
-from gen_controls.service import generate_text
+from unittest.mock import AsyncMock, patch
+from gen_controls.service import agenerate_many, agenerate_text, generate_many, generate_text
 from gen_controls.config import GenerationConfig
 
 
@@ -59,4 +60,56 @@ def test_handles_openrouter_error(mock_generate):
     cfg = GenerationConfig()
 
     with pytest.raises(RuntimeError):
-        generate_text("Hello world", cfg)
\ No newline at end of file
+        generate_text("Hello world", cfg)
+
+
+@patch("gen_controls.client.AsyncOpenRouterClient.generate", new_callable=AsyncMock)
+def test_agenerate_text_success(mock_generate):
+    mock_generate.return_value = MOCK_RESPONSE
+
+    result = asyncio.run(agenerate_text("Hello world", GenerationConfig()))
+
+    assert result["text"] == "Test response"
+    assert result["usage"]["total_tokens"] == 15
+    assert mock_generate.await_args.kwargs["messages"][0]["content"] == "Hello world"
+
+
+
+def _echo_or_fail(messages, **params):
+    prompt = messages[0]["content"]
+    if prompt == "bad":
+        raise RuntimeError("API failure")
+    return {
+        "choices": [{"message": {"content": prompt.upper()}, "finish_reason": "stop"}],
+        "usage": MOCK_RESPONSE["usage"],
+    }
+
+
+@patch("gen_controls.client.OpenRouterClient.generate")
+def test_generate_many_preserves_order_and_isolates_failures(mock_generate):
+    mock_generate.side_effect = _echo_or_fail
+    prompts = [f"p{i}" for i in range(20)] + ["bad"]
+
+    results = generate_many(prompts, GenerationConfig(), concurrency=4)
+
+    assert [r["text"] for r in results[:20]] == [p.upper() for p in prompts[:20]]
+    assert results[20]["error"] == "RuntimeError: API failure"
+
+
+@patch("gen_controls.client.AsyncOpenRouterClient.generate", new_callable=AsyncMock)
+def test_agenerate_many_preserves_order(mock_generate):
+    mock_generate.side_effect = _echo_or_fail
+
+    results = asyncio.run(agenerate_many(["a", "bad", "c"], GenerationConfig(), concurrency=2))
+
+    assert results[0]["text"] == "A"
+    assert "error" in results[1]
+    assert results[2]["text"] == "C"
+
+
+@pytest.mark.parametrize("concurrency", [0, -1])
+def test_generate_many_rejects_concurrency_below_one(concurrency):
+    with pytest.raises(ValueError, match="concurrency must be >= 1"):
+        generate_many(["a"], GenerationConfig(), concurrency=concurrency)
+    with pytest.raises(ValueError, match="concurrency must be >= 1"):
+        asyncio.run(asyncio.wait_for(agenerate_many(["a"], GenerationConfig(), concurrency=concurrency), 5))
@@ -0,0 +1,169 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+from gen_controls import service
+from gen_controls.config import GenerationConfig
+from gen_controls.singleflight import AsyncSingleFlight, SingleFlight
+from prometheus_client import REGISTRY
+
+
+MOCK_RESPONSE = {
+    "choices": [{"message": {"content": "shared"}, "finish_reason": "stop"}],
+    "usage": {"total_tokens": 15},
+}
+
+
+def _slow_generate(self, messages, **params):
+    time.sleep(0.2)
+    return MOCK_RESPONSE
+
+
+def test_100_concurrent_identical_calls_hit_upstream_once():
+    cfg = GenerationConfig(temperature=0.7)
+    barrier = threading.Barrier(100)
+    collapsed_before = service.inflight.collapsed
+    labels = {"preset": "custom", "model": service.client_module.settings().model or "unknown"}
+    metric = "gen_controls_coalesced_calls_total"
+    counted_before = REGISTRY.get_sample_value(metric, labels) or 0
+
+    def call(_):
+        barrier.wait()
+        return service.generate_text("Same prompt", cfg)
+
+    with patch("gen_controls.client.OpenRouterClient.generate", autospec=True, side_effect=_slow_generate) as mock_generate:
+        with ThreadPoolExecutor(max_workers=100) as pool:
+            results = list(pool.map(call, range(100)))
+
+    assert mock_generate.call_count == 1
+    assert all(r["text"] == "shared" for r in results)
+    assert service.inflight.collapsed - collapsed_before == 99
+    assert REGISTRY.get_sample_value(metric, labels) - counted_before == 99
+
+
+def test_async_identical_calls_hit_upstream_once():
+    async def slow(messages, **params):
+        await asyncio.sleep(0.1)
+        return MOCK_RESPONSE
+
+    async def fan_out():
+        return await asyncio.gather(*(service.agenerate_text("Same prompt", GenerationConfig()) for _ in range(100)))
+
+    with patch("gen_controls.client.AsyncOpenRouterClient.generate", side_effect=slow) as mock_generate:
+        results = asyncio.run(fan_out())
+
+    assert mock_generate.call_count == 1
+    assert len(results) == 100
+
+
+def test_errors_propagate_to_all_waiters():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.1)
+        raise RuntimeError("upstream down")
+
+    def follower():
+        started.wait()
+        return flight.do("k", fail)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, "k", fail)
+        waiter = pool.submit(follower)
+        for future in (leader, waiter):
+            with pytest.raises(RuntimeError, match="upstream down"):
+                future.result()
+
+    assert flight.collapsed == 1
+
+
+def test_async_errors_propagate_to_all_waiters():
+    flight = AsyncSingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.05)
+        raise RuntimeError("upstream down")
+
+    async def fan_out():
+        return await asyncio.gather(*(flight.do("k", fail) for _ in range(5)), return_exceptions=True)
+
+    results = asyncio.run(fan_out())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flight.collapsed == 4
+
+
+def test_async_cancelled_leader_does_not_cancel_followers():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "shared"
+
+    async def go():
+        leader = asyncio.ensure_future(flight.do("k", slow))
+        await asyncio.sleep(0)
+        followers = [asyncio.ensure_future(flight.do("k", slow)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        results = await asyncio.gather(*followers)
+        return leader.cancelled(), results
+
+    cancelled, results = asyncio.run(go())
+    assert cancelled
+    assert results == ["shared"] * 3
+    assert len(calls) == 1
+
+
+def test_async_shared_call_cancelled_when_nobody_waits():
+    flight = AsyncSingleFlight()
+    state = {}
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+
+    async def go():
+        callers = [asyncio.ensure_future(flight.do("k", slow)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        # A new caller starts a fresh call rather than joining the cancelled one.
+        state["after"] = await flight.do("k", lambda: asyncio.sleep(0, result="fresh"))
+
+    asyncio.run(go())
+    assert state == {"cancelled": True, "after": "fresh"}
+
+
+def test_async_calls_are_not_shared_across_event_loops():
+    flight = AsyncSingleFlight()
+    started = threading.Barrier(2)
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return threading.get_ident()
+
+    def run_loop():
+        async def go():
+            started.wait()
+            return await flight.do("k", slow)
+        return asyncio.run(go())
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = [f.result() for f in [pool.submit(run_loop) for _ in range(2)]]
+
+    assert len(set(results)) == 2
+    assert flight.collapsed == 0
@@ -0,0 +1,146 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+import dotenv
+import pytest
+import requests
+
+from stub_server import StubServer
+from gen_controls import client as client_module
+from gen_controls.client import AsyncOpenRouterClient, OpenRouterClient
+from gen_controls import service
+from gen_controls.config import GenerationConfig, TransportConfig
+from prometheus_client import REGISTRY
+from gen_controls.transport import PooledTransport, get_transport, close_transport
+
+
+def test_pooled_transport_reuses_connections():
+    with StubServer() as server:
+        transport = PooledTransport(TransportConfig(pool_size=4))
+        client = OpenRouterClient(transport=transport, base_url=server.url)
+
+        for _ in range(20):
+            response = client.generate([{"role": "user", "content": "Hi"}])
+
+        transport.close()
+
+    assert response["choices"][0]["message"]["content"] == "stub response"
+    assert server.connections == 1
+
+
+def test_close_transport_resets_shared_pool():
+    first = get_transport()
+    close_transport()
+    assert get_transport() is not first
+
+
+def test_async_client_runs_upstream_calls_concurrently():
+    async def fan_out(client):
+        messages = [{"role": "user", "content": "Hi"}]
+        responses = await asyncio.gather(*(client.generate(messages) for _ in range(200)))
+        await client.transport.aclose()
+        return responses
+
+    with StubServer(latency_s=0.2) as server:
+        transport = PooledTransport(TransportConfig(pool_size=200))
+        client = AsyncOpenRouterClient(transport=transport, base_url=server.url)
+
+        start = time.perf_counter()
+        responses = asyncio.run(fan_out(client))
+        elapsed = time.perf_counter() - start
+
+    assert len(responses) == 200
+    # Sequentially this would take 40s; a single event loop overlaps them.
+    assert elapsed < 5
+
+
+def test_stream_text_parses_sse_and_reports_ttft():
+    labels = {"preset": "custom", "model": service.client_module.settings().model or "unknown"}
+    metric = "gen_controls_time_to_first_token_seconds_count"
+    observed_before = REGISTRY.get_sample_value(metric, labels) or 0
+
+    with StubServer(chunk_delay_s=0.02) as server:
+        client = service.OpenRouterClient(transport=PooledTransport(), base_url=server.url)
+        with patch.object(service, "client", client):
+            chunks = list(service.stream_text("Hi", GenerationConfig()))
+
+    assert "".join(c["delta"] for c in chunks) == "stub response"
+    assert chunks[-1]["finish_reason"] == "stop"
+    assert chunks[-1]["usage"]["total_tokens"] == 15
+    assert REGISTRY.get_sample_value(metric, labels) == observed_before + 1
+
+
+def test_astream_text_yields_final_usage():
+    async def collect():
+        return [chunk async for chunk in service.astream_text("Hi", GenerationConfig())]
+
+    with StubServer() as server:
+        client = service.AsyncOpenRouterClient(transport=PooledTransport(), base_url=server.url)
+        with patch.object(service, "async_client", client):
+            chunks = asyncio.run(collect())
+
+    assert [c["delta"] for c in chunks[:-1]] == ["stub", " response"]
+    assert chunks[-1]["finish_reason"] == "stop"
+    assert chunks[-1]["usage"]["completion_tokens"] == 5
+
+
+def test_async_clients_are_kept_per_event_loop_and_closed():
+    async def call(client):
+        await client.generate([{"role": "user", "content": "Hi"}])
+        return client.transport.async_client
+
+    first, second = asyncio.new_event_loop(), asyncio.new_event_loop()
+    with StubServer() as server:
+        client = AsyncOpenRouterClient(transport=PooledTransport(), base_url=server.url)
+        try:
+            # Alternating loops must not replace (and leak) each other's client.
+            seen = [loop.run_until_complete(call(client)) for loop in (first, second) * 3]
+            assert seen[0::2] == [seen[0]] * 3 and seen[1::2] == [seen[1]] * 3
+            assert server.connections == 2
+
+            first.run_until_complete(client.transport.aclose())
+            assert seen[0].is_closed
+        finally:
+            first.close()
+            second.close()
+
+        # A client whose loop has closed is dropped for the new loop's own one.
+        third = asyncio.run(call(client))
+        assert third is not seen[1] and len(client.transport._async_clients) == 1
+
+
+def test_total_timeout_bounds_stalled_reads():
+    cfg = TransportConfig(total_timeout=0.3)
+    messages = [{"role": "user", "content": "Hi"}]
+    with StubServer(latency_s=2) as server:
+        start = time.perf_counter()
+        with pytest.raises(TimeoutError):
+            asyncio.run(AsyncOpenRouterClient(transport=PooledTransport(cfg), base_url=server.url).generate(messages))
+        assert time.perf_counter() - start < 1
+
+        start = time.perf_counter()
+        with pytest.raises(requests.Timeout):
+            OpenRouterClient(transport=PooledTransport(cfg), base_url=server.url).generate(messages)
+        assert time.perf_counter() - start < 1
+
+
+def test_client_built_before_env_loads_uses_env_file_base_url(tmp_path, monkeypatch):
+    client = OpenRouterClient(transport=PooledTransport())
+    with StubServer() as server:
+        (tmp_path / ".env").write_text(f"OPENROUTER_BASE_URL={server.url}\nOPENROUTER_MODEL=env-file-model\n")
+        load_dotenv = dotenv.load_dotenv
+        monkeypatch.setattr(dotenv, "load_dotenv", lambda: load_dotenv(tmp_path / ".env"))
+        for name in ("OPENROUTER_BASE_URL", "OPENROUTER_MODEL"):
+            monkeypatch.delenv(name, raising=False)
+        monkeypatch.setattr(client_module, "_env_loaded", False)
+        client_module.settings.cache_clear()
+        try:
+            response = client.generate([{"role": "user", "content": "Hi"}])
+            assert client_module.settings().model == "env-file-model"
+        finally:
+            client_module.settings.cache_clear()
+        client.transport.close()
+
+    assert response["choices"][0]["message"]["content"] == "stub response"
+    assert server.requests == 1
@@ -0,0 +1,87 @@
+"""Compression ratio, CPU time and content kept for every strategy in compress.STRATEGIES.
+
+Inputs are ~1 MB synthetic texts (a repeated phrase, a meeting transcript
+with repeated boilerplate, unbroken prose) plus any real files given. The
+synthetic ones end with a question; `last` says whether the output still has
+the input's last sentence.
+`vocab` is the share of the input's distinct words that survive.
+
+    python benchmarks/bench_compress.py --budget 200 ../Transcript_CE/sample_transcript.txt
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compress import STRATEGIES  # noqa: E402
+from main import SUMMARY_TOKENS  # noqa: E402
+from utils import get_tokenizer  # noqa: E402
+
+QUESTION = "So what did we decide about the Friday migration?"
+WORDS = ("migration schema rollback owner review budget latency deploy ticket customer outage "
+         "dashboard alert quarter roadmap vendor contract invoice staging cluster").split()
+
+
+def synthetic_inputs(chars: int) -> dict:
+    rng = random.Random(0)
+    lines, size, n = [], 0, 0
+    while size < chars:
+        if n % 7 == 0:
+            line = "Speaker 3: Sorry, you cut out there, can you repeat that?\n"
+        else:
+            words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 20)))
+            line = f"Speaker {rng.randint(1, 4)}: we should look at the {words} by {rng.randint(1, 28)} March.\n"
+        lines.append(line)
+        size += len(line)
+        n += 1
+    prose = " ".join(rng.choice(WORDS) for _ in range(chars // 8))
+    return {
+        "repeated phrase": "Very long text " * (chars // 15) + ". " + QUESTION,
+        "meeting": "".join(lines) + f"Speaker 1: {QUESTION}\n",
+        "prose": prose + ". " + QUESTION,
+    }
+
+
+def _vocab(text: str) -> set:
+    return set(re.findall(r"\w+", text.lower()))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="*", help="Real transcripts to add to the synthetic inputs")
+    parser.add_argument("--budget", type=int, default=SUMMARY_TOKENS)
+    parser.add_argument("--mb", type=float, default=1.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tokenizer = get_tokenizer()
+    inputs = synthetic_inputs(int(args.mb * 2**20))
+    for path in args.files:
+        with open(path, encoding="utf-8") as f:
+            inputs[os.path.basename(path)] = f.read()
+
+    print(f"budget {args.budget} tokens")
+    print(f"{'input':<24}{'strategy':<16}{'in tok':>9}{'out tok':>8}{'ratio':>8}{'cpu ms':>9}{'vocab':>7}  last")
+    for name, text in inputs.items():
+        in_tokens = tokenizer.count_tokens(text)
+        vocab = _vocab(text)
+        ending = re.split(r"(?<=[.!?])\s+|\n", text.strip())[-1].strip()
+        for strategy, fn in STRATEGIES.items():
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.process_time()
+                out = fn(text, args.budget, tokenizer)
+                best = min(best, time.process_time() - start)
+            out_tokens = tokenizer.count_tokens(out)
+            assert out_tokens <= args.budget, (strategy, out_tokens)
+            kept = len(_vocab(out) & vocab) / len(vocab)
+            print(f"{name[:23]:<24}{strategy:<16}{in_tokens:>9}{out_tokens:>8}{in_tokens / out_tokens:>8.0f}"
+                  f"{best * 1000:>9.1f}{kept:>7.0%}  {'yes' if ending in out else 'no'}")
+
+
+if __name__ == "__main__":
+    main()
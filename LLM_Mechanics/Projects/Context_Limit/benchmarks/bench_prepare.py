@@ -0,0 +1,81 @@
+"""prepare_prompt_or_fallback before and after early-exit budgeting.
+
+The old version encoded the whole prompt to count it, encoded the whole user
+text again to summarize it, then counted the fallback prompt: three full
+passes over an input that was already known to be too big after the first
+few thousand tokens. The new one stops counting at the budget.
+
+    python benchmarks/bench_prepare.py --mb 1 --repeat 5
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import MAX_COMPLETION_TOKENS, MODEL_CONTEXT_LIMIT, prepare_prompt_or_fallback  # noqa: E402
+from utils import get_tokenizer  # noqa: E402
+
+
+def old_prepare_prompt_or_fallback(user_prompt: str, instructions: str):
+    tokenizer = get_tokenizer()
+    full_prompt = instructions + "\n\nUser:\n" + user_prompt
+    prompt_tokens = tokenizer.count_tokens(full_prompt)
+    if prompt_tokens + MAX_COMPLETION_TOKENS <= MODEL_CONTEXT_LIMIT:
+        return {"mode": "direct", "prompt": full_prompt, "prompt_tokens": prompt_tokens}
+
+    tokens = tokenizer.encode(user_prompt)
+    summarized_text = user_prompt if len(tokens) <= 200 else tokenizer.decode(tokens[:200]) + " ... [TRUNCATED SUMMARY]"
+    fallback_prompt = instructions + "\n\nUser (summarized):\n" + summarized_text
+    fallback_tokens = tokenizer.count_tokens(fallback_prompt)
+    if fallback_tokens + MAX_COMPLETION_TOKENS > MODEL_CONTEXT_LIMIT:
+        raise ValueError("Input too large even after summarization fallback.")
+    return {"mode": "summarized", "prompt": fallback_prompt, "prompt_tokens": fallback_tokens}
+
+
+def _best_ms(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=float, default=1.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tokenizer = get_tokenizer()
+    instructions = "You are a helpful assistant that answers concisely."
+    line = "Speaker 2: we should ship the migration on Friday, after the 3pm review.\n"
+    inputs = {
+        "small (40 tokens)": "Summarize the action items from this morning's call, please.",
+        "near limit (3k tokens)": line * 180,
+        f"{args.mb:g} MB": line * int(args.mb * 2**20 / len(line)),
+    }
+
+    print(f"{'input':<24}{'old ms':>10}{'new ms':>10}{'speedup':>10}  mode")
+    for name, prompt in inputs.items():
+        old = old_prepare_prompt_or_fallback(prompt, instructions)
+        new = prepare_prompt_or_fallback(prompt, instructions)
+        assert (old["mode"], old["prompt_tokens"]) == (new["mode"], new["prompt_tokens"])
+        old_ms = _best_ms(lambda: old_prepare_prompt_or_fallback(prompt, instructions), args.repeat)
+        new_ms = _best_ms(lambda: prepare_prompt_or_fallback(prompt, instructions), args.repeat)
+        print(f"{name:<24}{old_ms:>10.2f}{new_ms:>10.2f}{old_ms / new_ms:>9.1f}x  {new['mode']}")
+
+    # Above limit * max_token_bytes characters the length alone settles it, so
+    # also time a text short enough that count_tokens_upto has to encode.
+    big = inputs[f"{args.mb:g} MB"]
+    print()
+    for text in (big, big[:MODEL_CONTEXT_LIMIT * tokenizer.max_token_bytes]):
+        full_ms = _best_ms(lambda: tokenizer.count_tokens(text), args.repeat)
+        upto_ms = _best_ms(lambda: tokenizer.count_tokens_upto(text, MODEL_CONTEXT_LIMIT), args.repeat)
+        print(f"{len(text) / 2**10:>6.0f} KB  count_tokens {full_ms:8.2f} ms   "
+              f"count_tokens_upto({MODEL_CONTEXT_LIMIT}) {upto_ms:6.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""Local, CPU-only strategies for shrinking oversized input to a token budget.
+
+Every strategy takes (text, max_tokens, tokenizer) and returns text of at most
+`max_tokens` tokens, markers included. Text that already fits is returned as is.
+"""
+import math
+import re
+from collections import Counter
+
+from llm_common.tokenizer import Tokenizer, get_tokenizer
+
+STRATEGIES = {}
+DEFAULT_STRATEGY = "dedup"
+
+# Share of the budget head_tail spends on the start of the text; the rest
+# keeps the end, where the question usually is.
+HEAD_SHARE = 0.25
+# Non-adjacent duplicate lines shorter than this are kept (e.g. "Speaker 1: Yes.").
+MIN_DEDUP_CHARS = 32
+# A phrase repeated at least this many times in a row is collapsed to one copy.
+MIN_REPEATS = 3
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+_SENTENCE_GAP = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"\w+")
+
+
+def register_strategy(name: str):
+    def register(fn):
+        STRATEGIES[name] = fn
+        return fn
+    return register
+
+
+def compress(text: str, max_tokens: int, strategy: str = DEFAULT_STRATEGY, tokenizer: Tokenizer = None) -> str:
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown compression strategy: {strategy!r}")
+    tokenizer = tokenizer or get_tokenizer()
+    if tokenizer.count_tokens_upto(text, max_tokens) <= max_tokens:
+        return text
+    return STRATEGIES[strategy](text, max_tokens, tokenizer)
+
+
+def _omitted(chars: int) -> str:
+    return f"\n[... {chars} characters omitted ...]\n"
+
+
+def _decode(tokenizer, tokens) -> str:
+    # A cut can fall inside a multi-byte character; drop the fragment.
+    return tokenizer.enc.decode_bytes(tokens).decode("utf-8", errors="ignore")
+
+
+def _head(text, n, tokenizer) -> str:
+    return _decode(tokenizer, tokenizer.encode_upto(text, n)[:n]) if n > 0 else ""
+
+
+def _tail(text, n, tokenizer) -> str:
+    if n <= 0:
+        return ""
+    chars = 8 * (n + 1)
+    while True:
+        tokens = tokenizer.encode(text[-chars:])
+        if len(tokens) > n or chars >= len(text):
+            return _decode(tokenizer, tokens[-n:])
+        chars *= 4
+
+
+def _fit(build, max_tokens, tokenizer) -> str:
+    """Call build(keep) with a shrinking token allowance until the result fits."""
+    keep = max_tokens
+    while keep > 0:
+        result = build(keep)
+        over = tokenizer.count_tokens(result) - max_tokens
+        if over <= 0:
+            return result
+        keep -= over
+    return ""
+
+
+@register_strategy("head")
+def head(text: str, max_tokens: int, tokenizer: Tokenizer) -> str:
+    """The first tokens only: what token_summary used to do."""
+    marker = " ... [TRUNCATED SUMMARY]"
+    return _fit(lambda keep: _head(text, keep - tokenizer.count_tokens(marker), tokenizer) + marker,
+                max_tokens, tokenizer)
+
+
+@register_strategy("head_tail")
+def head_tail(text: str, max_tokens: int, tokenizer: Tokenizer) -> str:
+    """A quarter of the budget from the start, the rest from the end."""
+    def build(keep):
+        keep -= tokenizer.count_tokens(_omitted(len(text)))
+        first = _head(text, int(keep * HEAD_SHARE), tokenizer)
+        last = _tail(text, keep - int(keep * HEAD_SHARE), tokenizer)
+        return first + _omitted(len(text) - len(first) - len(last)) + last
+    return _fit(build, max_tokens, tokenizer)
+
+
+@register_strategy("middle_elision")
+def middle_elision(text: str, max_tokens: int, tokenizer: Tokenizer) -> str:
+    """Whole lines taken alternately from the end and the start.
+
+    Lines are found and counted only as they are kept, so the cost follows the
+    budget, not the length of the text. When the next line on a side does not
+    fit, that side gets a token-level cut of it: its head_tail share of the
+    room left, or all of it if the other side is already done.
+    """
+    room = max_tokens - tokenizer.count_tokens(_omitted(len(text)))
+    head_end, tail_start = 0, len(text)
+    open_sides = {"tail", "head"}
+    side = "tail"
+    while open_sides and head_end < tail_start:
+        if side not in open_sides:
+            side = "head" if side == "tail" else "tail"
+        if side == "tail":
+            start, end = text.rfind("\n", head_end, tail_start - 1) + 1 or head_end, tail_start
+        else:
+            start, end = head_end, text.find("\n", head_end, tail_start) + 1 or tail_start
+        cost = tokenizer.count_tokens_upto(text[start:end], room)
+        if cost <= room:
+            room -= cost
+            if side == "tail":
+                tail_start = start
+            else:
+                head_end = end
+        else:
+            open_sides.discard(side)
+            n = room if not open_sides else int(room * (HEAD_SHARE if side == "head" else 1 - HEAD_SHARE))
+            # The cuts are a suffix/prefix of the gap, so they just move its edges.
+            if side == "tail":
+                tail_start -= len(_tail(text[head_end:tail_start], n, tokenizer))
+            else:
+                head_end += len(_head(text[head_end:tail_start], n, tokenizer))
+            room -= n
+        side = "head" if side == "tail" else "tail"
+
+    result = text[:head_end] + _omitted(tail_start - head_end) + text[tail_start:]
+    # Joining the pieces can merge or split a token or two.
+    if tokenizer.count_tokens(result) > max_tokens:
+        return head_tail(result, max_tokens, tokenizer)
+    return result
+
+
+def _collapse_repeats(line: str) -> str:
+    """Collapse a phrase repeated at the start of `line`, e.g. "Very long text " * 1000."""
+    out = []
+    while len(line) >= MIN_REPEATS * 2:
+        probe = line[:min(16, len(line) // MIN_REPEATS)]
+        period = line.find(probe, 1)
+        while 0 < period <= len(line) // MIN_REPEATS and line[period:2 * period] != line[:period]:
+            period = line.find(probe, period + 1)
+        if period <= 0 or period > len(line) // MIN_REPEATS:
+            break
+        unit = line[:period]
+        end = period
+        while line.startswith(unit, end):
+            end += period
+        if end // period < MIN_REPEATS:
+            break
+        out.append(f"{unit}[... repeated {end // period} times] ")
+        line = line[end:]
+    out.append(line)
+    return "".join(out)
+
+
+def _dedup_sentences(line: str) -> str:
+    """Collapse runs of the same sentence within a line, and repeated phrases within a sentence."""
+    sentences = []
+    start = 0
+    for match in _SENTENCE_GAP.finditer(line):
+        sentences.append(line[start:match.end()])
+        start = match.end()
+    if start < len(line):
+        sentences.append(line[start:])
+
+    out = []
+    last = None
+    repeats = 0
+    for sentence in sentences:
+        if sentence.strip() == last:
+            repeats += 1
+            continue
+        if repeats:
+            out.append(f"[previous sentence repeated {repeats} more times] ")
+            repeats = 0
+        last = sentence.strip()
+        out.append(_collapse_repeats(sentence))
+    if repeats:
+        out.append(f"[previous sentence repeated {repeats} more times]" + line[len(line.rstrip()):])
+    return "".join(out)
+
+
+@register_strategy("dedup")
+def dedup(text: str, max_tokens: int, tokenizer: Tokenizer) -> str:
+    """Drop repeated lines and collapse repeated phrases, then elide the middle if still too long."""
+    lines = []
+    seen = set()
+    last = None
+    repeats = 0
+    for line in text.splitlines(keepends=True):
+        key = line.strip()
+        if key and key == last:
+            repeats += 1
+            continue
+        if repeats:
+            lines.append(f"[previous line repeated {repeats} more times]\n")
+            repeats = 0
+        last = key
+        if len(key) >= MIN_DEDUP_CHARS:
+            if key in seen:
+                continue
+            seen.add(key)
+        lines.append(_dedup_sentences(line))
+    if repeats:
+        lines.append(f"[previous line repeated {repeats} more times]\n")
+    deduped = "".join(lines)
+    if tokenizer.count_tokens_upto(deduped, max_tokens) <= max_tokens:
+        return deduped
+    return middle_elision(deduped, max_tokens, tokenizer)
+
+
+@register_strategy("tfidf")
+def tfidf(text: str, max_tokens: int, tokenizer: Tokenizer) -> str:
+    """The highest-scoring sentences by TF-IDF, in their original order.
+
+    The last sentence is always kept. A sentence scores the summed TF-IDF of
+    its words over the square root of its length, so neither long nor short
+    sentences win by size alone.
+    """
+    spans = []
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        if text[start:match.start()].strip():
+            spans.append((start, match.start()))
+        start = match.end()
+    if text[start:].strip():
+        spans.append((start, len(text)))
+    words = [_WORD.findall(text[s:e].lower()) for s, e in spans]
+    df = Counter(word for sentence in words for word in set(sentence))
+    idf = {word: math.log(len(spans) / count) for word, count in df.items()}
+    scores = [
+        sum(tf * idf[word] for word, tf in Counter(sentence).items()) / math.sqrt(len(sentence)) if sentence else 0.0
+        for sentence in words
+    ]
+
+    order = [len(spans) - 1] + sorted(range(len(spans) - 1), key=lambda i: -scores[i])
+    chosen, room, seen = [], max_tokens, set()
+    for i in order:
+        sentence = text[spans[i][0]:spans[i][1]].strip()
+        if sentence in seen:
+            continue
+        cost = tokenizer.count_tokens_upto(sentence, room) + 1
+        if cost <= room:
+            chosen.append(i)
+            seen.add(sentence)
+            room -= cost
+        if room <= 1:
+            break
+    if len(chosen) < min(2, len(spans)):
+        # Sentences longer than the budget cannot be picked at all.
+        return head_tail(text, max_tokens, tokenizer)
+
+    # Drop the weakest picks until the joined text fits exactly.
+    while True:
+        result = "\n".join(text[spans[i][0]:spans[i][1]].strip() for i in sorted(chosen))
+        if tokenizer.count_tokens(result) <= max_tokens or len(chosen) == 1:
+            break
+        chosen.pop()
+    return result if tokenizer.count_tokens(result) <= max_tokens else head_tail(result, max_tokens, tokenizer)
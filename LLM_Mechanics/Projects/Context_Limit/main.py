@@ -1,25 +1,28 @@
-from utils import TokenizerWrapper, token_summary
+from utils import PromptBuilder, get_tokenizer, token_summary
 
 MODEL_CONTEXT_LIMIT = 4000
 MAX_COMPLETION_TOKENS = 512
+SUMMARY_TOKENS = 200
+SUMMARY_STRATEGY = "dedup"  # see compress.STRATEGIES
 
-def prepare_prompt_or_fallback(user_prompt: str, instructions: str):
-    tokenizer = TokenizerWrapper()
-    full_prompt = instructions + "\n\nUser:\n" + user_prompt
-    prompt_tokens = tokenizer.count_tokens(full_prompt)
+def prepare_prompt_or_fallback(user_prompt: str, instructions: str, strategy: str = None):
+    tokenizer = get_tokenizer()
+    base = PromptBuilder(MODEL_CONTEXT_LIMIT - MAX_COMPLETION_TOKENS, tokenizer)
+    base.add(instructions)
 
-    if prompt_tokens + MAX_COMPLETION_TOKENS <= MODEL_CONTEXT_LIMIT:
-        return {"mode": "direct", "prompt": full_prompt, "prompt_tokens": prompt_tokens}
+    # Counting stops as soon as the prompt is over budget, so an oversized
+    # input is rejected after a few thousand tokens, not a full encode.
+    direct = base.fork()
+    if direct.add("\n\nUser:\n") and direct.add(user_prompt):
+        return {"mode": "direct", "prompt": direct.text(), "prompt_tokens": direct.tokens}
 
     # Fallback summarization
-    summarized_text = token_summary(user_prompt, tokenizer)
-    fallback_prompt = instructions + "\n\nUser (summarized):\n" + summarized_text
-    fallback_tokens = tokenizer.count_tokens(fallback_prompt)
-
-    if fallback_tokens + MAX_COMPLETION_TOKENS > MODEL_CONTEXT_LIMIT:
+    summarized_text = token_summary(user_prompt, tokenizer, SUMMARY_TOKENS, strategy or SUMMARY_STRATEGY)
+    fallback = base.fork()
+    if not (fallback.add("\n\nUser (summarized):\n") and fallback.add(summarized_text)):
         raise ValueError("Input too large even after summarization fallback.")
 
-    return {"mode": "summarized", "prompt": fallback_prompt, "prompt_tokens": fallback_tokens}
+    return {"mode": "summarized", "prompt": fallback.text(), "prompt_tokens": fallback.tokens}
 
 def main():
     instructions = "You are a helpful assistant that answers concisely."
@@ -0,0 +1,45 @@
+import pytest
+
+from compress import STRATEGIES, compress
+from main import prepare_prompt_or_fallback
+from utils import get_tokenizer
+
+QUESTION = "What did we decide about the launch date?"
+INPUTS = [
+    "Very long text " * 1000 + QUESTION,
+    "".join(f"Speaker {i % 3}: item {i} on the agenda, owner team {i % 7}.\n" for i in range(800)) + QUESTION,
+    "Sorry, you cut out.\n" * 500 + "Intro. " + "Filler sentence number one. " * 300 + QUESTION,
+    "naïve café 東京 " * 600 + QUESTION,
+]
+
+
+@pytest.mark.parametrize("strategy", sorted(STRATEGIES))
+def test_every_strategy_fits_the_budget(strategy):
+    tokenizer = get_tokenizer()
+    for text in INPUTS:
+        for budget in (40, 200):
+            out = compress(text, budget, strategy)
+            assert tokenizer.count_tokens(out) <= budget
+            if strategy != "head":
+                assert QUESTION in out
+    assert compress("short text", 200, strategy) == "short text"
+
+
+def test_dedup_collapses_repeats():
+    out = compress(INPUTS[0], 200, "dedup")
+    assert out == "Very long text [... repeated 1000 times] " + QUESTION
+    out = compress(INPUTS[2], 200, "dedup")
+    assert "Sorry, you cut out.\n[previous line repeated 499 more times]\n" in out
+    assert "[previous sentence repeated 299 more times]" in out
+
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        compress("text", 10, "nope")
+
+
+def test_fallback_keeps_the_question():
+    res = prepare_prompt_or_fallback("Very long text " * 5000 + QUESTION, "Be brief.")
+    assert res["mode"] == "summarized"
+    assert QUESTION in res["prompt"]
+    assert prepare_prompt_or_fallback("Very long text " * 5000, "Be brief.", strategy="head")["prompt"].endswith("[TRUNCATED SUMMARY]")
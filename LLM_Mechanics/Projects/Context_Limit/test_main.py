@@ -1,4 +1,5 @@
 from main import prepare_prompt_or_fallback
+from utils import PromptBuilder, get_tokenizer
 
 def test_prepare_prompt_direct_vs_summarized():
     instructions = "You are a helpful assistant."
@@ -9,3 +10,32 @@ def test_prepare_prompt_direct_vs_summarized():
     long_prompt = "long " * 2000
     res_long = prepare_prompt_or_fallback(long_prompt, instructions)
     assert res_long["mode"] in ("direct", "summarized")
+
+
+def test_prompt_tokens_match_a_full_count():
+    tokenizer = get_tokenizer()
+    instructions = "You are a helpful assistant.\n"
+    for user_prompt in ["Hi", "word\n  indented line\n" * 300, "x" * 5000, "long " * 4000]:
+        res = prepare_prompt_or_fallback(user_prompt, instructions)
+        assert res["prompt_tokens"] == tokenizer.count_tokens(res["prompt"])
+
+
+def test_oversized_prompt_falls_back_without_a_full_encode(monkeypatch):
+    tokenizer = get_tokenizer()
+    encoded = []
+    real_encode = tokenizer.enc.encode_ordinary
+    monkeypatch.setattr(tokenizer.enc, "encode_ordinary", lambda text: encoded.append(len(text)) or real_encode(text), raising=False)
+
+    res = prepare_prompt_or_fallback("Very long text. " * 65536, "Be brief.")
+    assert res["mode"] == "summarized"
+    assert encoded and sum(encoded) < 100_000
+
+
+def test_prompt_builder_stops_at_the_budget():
+    builder = PromptBuilder(10)
+    assert builder.add("one two three")
+    fork = builder.fork()
+    assert not builder.add(" four five six seven eight nine ten eleven")
+    assert builder.overflow and not builder.add("!")
+    assert fork.add(" four") and fork.text() == "one two three four"
+    assert fork.tokens == sum(fork.segment_tokens) == 4
@@ -1,20 +1,76 @@
-import tiktoken
+from llm_common.tokenizer import Tokenizer as TokenizerWrapper, get_tokenizer, last_safe_split
 
-class TokenizerWrapper:
-    def __init__(self, encoding_name="cl100k_base"):
-        self.enc = tiktoken.get_encoding(encoding_name)
+from compress import DEFAULT_STRATEGY, compress
 
-    def count_tokens(self, text: str) -> int:
-        return len(self.enc.encode(text))
 
-    def encode(self, text: str):
-        return self.enc.encode(text)
+class PromptBuilder:
+    """
+    Assemble a prompt segment by segment against a token budget.
 
-    def decode(self, tokens: list[int]):
-        return self.enc.decode(tokens)
+    Text up to the last BPE-safe boundary is counted once and never again;
+    only the short tail after it is re-encoded when the next segment is
+    appended, so the running total always equals encoding the whole prompt.
+    Counting stops as soon as the budget is exceeded.
+    """
 
-def token_summary(text: str, tokenizer: TokenizerWrapper, max_tokens: int = 200) -> str:
-    tokens = tokenizer.encode(text)
-    if len(tokens) <= max_tokens:
-        return text
-    return tokenizer.decode(tokens[:max_tokens]) + " ... [TRUNCATED SUMMARY]"
+    # Short text is simply carried in the tail, which costs less to re-encode
+    # than finding a boundary and encoding twice.
+    MIN_SPLIT_CHARS = 1024
+
+    def __init__(self, budget: int, tokenizer: TokenizerWrapper = None):
+        self.budget = budget
+        self.tokenizer = tokenizer or get_tokenizer()
+        self.segments = []
+        self.segment_tokens = []
+        self.overflow = False
+        self._committed = 0
+        self._tail = ""
+        self._tail_tokens = 0
+
+    @property
+    def tokens(self) -> int:
+        """Exact prompt tokens; meaningless once `overflow` is set."""
+        return self._committed + self._tail_tokens
+
+    @property
+    def remaining(self) -> int:
+        return self.budget - self.tokens
+
+    def add(self, text: str) -> bool:
+        """Append `text` if the prompt still fits the budget; returns whether it does."""
+        if self.overflow:
+            return False
+        pending = self._tail + text
+        cut = last_safe_split(pending) if len(pending) > self.MIN_SPLIT_CHARS else 0
+        room = self.budget - self._committed
+        committed = self.tokenizer.count_tokens_upto(pending[:cut], room) if cut else 0
+        tail = pending[cut:] if cut else pending
+        tail_tokens = self.tokenizer.count_tokens_upto(tail, room - committed) if committed <= room else 0
+        if committed + tail_tokens > room:
+            self.overflow = True
+            return False
+
+        before = self.tokens
+        self._committed += committed
+        self._tail = tail
+        self._tail_tokens = tail_tokens
+        self.segments.append(text)
+        self.segment_tokens.append(self.tokens - before)
+        return True
+
+    def fork(self) -> "PromptBuilder":
+        """An independent copy, e.g. to try an alternative ending."""
+        other = PromptBuilder(self.budget, self.tokenizer)
+        other.segments = list(self.segments)
+        other.segment_tokens = list(self.segment_tokens)
+        other.overflow = self.overflow
+        other._committed, other._tail, other._tail_tokens = self._committed, self._tail, self._tail_tokens
+        return other
+
+    def text(self) -> str:
+        return "".join(self.segments)
+
+
+def token_summary(text: str, tokenizer: TokenizerWrapper, max_tokens: int = 200, strategy: str = DEFAULT_STRATEGY) -> str:
+    """Shrink `text` to at most `max_tokens` tokens with a strategy from compress.STRATEGIES."""
+    return compress(text, max_tokens, strategy, tokenizer)
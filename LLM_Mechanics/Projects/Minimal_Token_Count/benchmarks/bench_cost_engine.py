@@ -0,0 +1,158 @@
+"""Rows/sec of the NumPy cost engine against the scalar functions in a Python loop.
+
+The scalar baseline is the finance job's loop: estimate_model_cost and
+fits_model_context per row, summed into a dict per (user, model, day). Both
+see the same synthetic batches. Reading logs from disk is timed separately,
+since parsing, not pricing, bounds the CLI.
+
+    python benchmarks/bench_cost_engine.py --rows 10000000 --file-rows 1000000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cost_engine import BATCH_ROWS, CostAggregator, aggregate_logs  # noqa: E402
+from pricing import PRICING, estimate_model_cost, fits_model_context  # noqa: E402
+
+START = 1_790_000_000
+
+
+def synthetic_batches(rows: int, batch_rows: int = BATCH_ROWS, users: int = 10_000, days: int = 30):
+    rng = np.random.default_rng(0)
+    models = np.array(sorted(PRICING))
+    for start in range(0, rows, batch_rows):
+        n = min(batch_rows, rows - start)
+        prompt = rng.integers(10, 9_000, n)
+        yield {
+            "user_id": np.char.add("user-", rng.integers(0, users, n).astype(str)),
+            "model": models[rng.integers(0, len(models), n)],
+            "timestamp": START + rng.integers(0, days * 86400, n),
+            "prompt_tokens": prompt,
+            "completion_tokens": rng.integers(0, 1_000, n),
+            "cached_prompt_tokens": prompt * rng.integers(0, 2, n) // 2,
+            "max_completion_tokens": np.full(n, 512),
+        }
+
+
+def scalar(batches) -> tuple:
+    groups = {}
+    rows = 0
+    for columns in batches:
+        day = (columns["timestamp"] // 86400).astype("datetime64[D]").astype(str)
+        for user, model, d, prompt, completion, cached, reserve in zip(
+            columns["user_id"].tolist(), columns["model"].tolist(), day.tolist(),
+            columns["prompt_tokens"].tolist(), columns["completion_tokens"].tolist(),
+            columns["cached_prompt_tokens"].tolist(), columns["max_completion_tokens"].tolist(),
+        ):
+            cost = estimate_model_cost(model, prompt, completion, cached)
+            over = not fits_model_context(model, prompt, reserve)
+            totals = groups.setdefault((user, model, d), [0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += cost
+            totals[2] += over
+            rows += 1
+    return rows, groups
+
+
+def scalar_pricing_only(batches) -> int:
+    rows = 0
+    for columns in batches:
+        for model, prompt, completion, cached, reserve in zip(
+            columns["model"].tolist(), columns["prompt_tokens"].tolist(), columns["completion_tokens"].tolist(),
+            columns["cached_prompt_tokens"].tolist(), columns["max_completion_tokens"].tolist(),
+        ):
+            estimate_model_cost(model, prompt, completion, cached)
+            fits_model_context(model, prompt, reserve)
+            rows += 1
+    return rows
+
+
+def _write_logs(directory: str, rows: int) -> dict:
+    paths = {"csv": os.path.join(directory, "usage.csv"), "jsonl": os.path.join(directory, "usage.jsonl")}
+    names = ("user_id", "model", "timestamp", "prompt_tokens", "completion_tokens", "cached_prompt_tokens")
+    with open(paths["csv"], "w") as csv_file, open(paths["jsonl"], "w") as jsonl_file:
+        csv_file.write(",".join(names) + "\n")
+        for columns in synthetic_batches(rows):
+            for row in zip(*(columns[name].tolist() for name in names)):
+                csv_file.write(",".join(map(str, row)) + "\n")
+                jsonl_file.write(json.dumps(dict(zip(names, row))) + "\n")
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--scalar-rows", type=int, default=None, help="Default: --rows")
+    parser.add_argument("--file-rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    args = parser.parse_args()
+    scalar_rows = args.scalar_rows or args.rows
+
+    # Generation is not part of either measurement.
+    batches = list(synthetic_batches(max(args.rows, scalar_rows), users=args.users))
+
+    aggregator = CostAggregator()
+    start = time.perf_counter()
+    remaining = args.rows
+    for columns in batches:
+        if remaining <= 0:
+            break
+        aggregator.add_batch({k: v[:remaining] for k, v in columns.items()})
+        remaining -= len(columns["prompt_tokens"])
+    vector_s = time.perf_counter() - start
+
+    def limited():
+        remaining = scalar_rows
+        for columns in batches:
+            if remaining <= 0:
+                return
+            yield {k: v[:remaining] for k, v in columns.items()}
+            remaining -= len(columns["prompt_tokens"])
+
+    start = time.perf_counter()
+    rows, groups = scalar(limited())
+    scalar_s = time.perf_counter() - start
+
+    print(f"{'engine':<14}{'rows':>12}{'seconds':>10}{'rows/s':>14}{'groups':>10}{'cost USD':>14}")
+    print(f"{'numpy':<14}{aggregator.rows:>12}{vector_s:>10.2f}{aggregator.rows / vector_s:>14,.0f}"
+          f"{len(aggregator.results()):>10}{aggregator.totals()['cost_usd']:>14.2f}")
+    print(f"{'scalar loop':<14}{rows:>12}{scalar_s:>10.2f}{rows / scalar_s:>14,.0f}"
+          f"{len(groups):>10}{sum(t[1] for t in groups.values()):>14.2f}")
+    print(f"speedup {(aggregator.rows / vector_s) / (rows / scalar_s):.0f}x")
+
+    # Cost and context check alone, without grouping.
+    start = time.perf_counter()
+    for columns in limited():
+        aggregator.price(columns)
+    price_s = time.perf_counter() - start
+    start = time.perf_counter()
+    scalar_pricing_only(limited())
+    scalar_price_s = time.perf_counter() - start
+    print(f"pricing only: numpy {rows / price_s:,.0f} rows/s, scalar {rows / scalar_price_s:,.0f} rows/s, "
+          f"speedup {scalar_price_s / price_s:.0f}x")
+    if rows == aggregator.rows:
+        # estimate_cost rounds every row to 6 decimals, the engine only the totals.
+        drift = abs(sum(t[1] for t in groups.values()) - aggregator.totals()["cost_usd"])
+        assert drift <= rows * 5e-7, drift
+        assert sum(t[2] for t in groups.values()) == aggregator.totals()["over_context"]
+
+    if args.file_rows:
+        with tempfile.TemporaryDirectory() as directory:
+            paths = _write_logs(directory, args.file_rows)
+            for fmt, path in paths.items():
+                start = time.perf_counter()
+                result = aggregate_logs([path])
+                elapsed = time.perf_counter() - start
+                print(f"read+aggregate {fmt:<6}{result.rows:>10} rows {elapsed:>7.2f} s {result.rows / elapsed:>12,.0f} rows/s "
+                      f"({os.path.getsize(path) / 2**20:.0f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""Replay usage logs through the pricing table, a column batch at a time with NumPy.
+
+Each log row is one request: user_id, model, timestamp (ISO-8601 or epoch
+seconds), prompt_tokens, completion_tokens and optionally cached_prompt_tokens
+(part of prompt_tokens, as in API usage) and max_completion_tokens (what the
+context check reserves). A missing key or empty CSV cell takes its column's
+default: "anonymous" for user_id, pricing.DEFAULT_MODEL for model, 0 for token
+counts and the row's completion_tokens for max_completion_tokens. Rows without
+a timestamp are an error when grouping by day.
+
+    python cost_engine.py usage.jsonl --by user_id,model,day --out report.csv
+"""
+import argparse
+import csv
+import json
+import sys
+from itertools import islice
+
+import numpy as np
+
+from pricing import DEFAULT_MODEL, PRICING, load_pricing
+
+BATCH_ROWS = 1 << 20
+GROUP_KEYS = ("user_id", "model", "day")
+METRICS = ("requests", "prompt_tokens", "completion_tokens", "cached_prompt_tokens", "cost_usd", "over_context")
+TOKEN_COLUMNS = ("prompt_tokens", "completion_tokens", "cached_prompt_tokens", "max_completion_tokens")
+TEXT_DEFAULTS = {"user_id": "anonymous", "model": DEFAULT_MODEL}
+# A missing timestamp stays "" and is rejected only when grouping by day.
+JSONL_DEFAULTS = {**TEXT_DEFAULTS, "timestamp": "", **dict.fromkeys(TOKEN_COLUMNS[:3], 0)}
+
+
+def _columns(raw: dict) -> dict:
+    """Turn raw column values into typed arrays. Missing columns and empty cells get the column default."""
+    rows = len(next(iter(raw.values()))) if raw else 0
+    columns = {}
+    for name, default in TEXT_DEFAULTS.items():
+        values = np.asarray(raw[name], dtype=str) if name in raw else np.full(rows, default)
+        columns[name] = np.where(values == "", default, values)
+    if "timestamp" in raw:
+        columns["timestamp"] = np.asarray(raw["timestamp"])
+    for name in TOKEN_COLUMNS:
+        if name in raw:
+            values = np.asarray(raw[name])
+            missing = values == "" if values.dtype.kind == "U" else None
+            if missing is not None and missing.any():
+                values = np.where(missing, "0", values)
+            columns[name] = values.astype(np.int64)
+            if name == "max_completion_tokens" and missing is not None and missing.any():
+                columns[name] = np.where(missing, columns["completion_tokens"], columns[name])
+    for name in TOKEN_COLUMNS[:3]:
+        columns.setdefault(name, np.zeros(rows, dtype=np.int64))
+    columns.setdefault("max_completion_tokens", columns["completion_tokens"])
+    return columns
+
+
+def _load(lines: list, names: list, usecols: list, dtype) -> dict:
+    values = np.loadtxt(lines, dtype=dtype, delimiter=",", quotechar='"', usecols=usecols, ndmin=2)
+    return {names[i]: values[:, j] for j, i in enumerate(usecols)}
+
+
+def _csv_batch(lines: list, names: list) -> dict:
+    # numpy's C parser, one call for the integer columns and one for the text ones.
+    numeric = [i for i, name in enumerate(names) if name in TOKEN_COLUMNS]
+    text = [i for i, name in enumerate(names) if name in ("user_id", "model", "timestamp")]
+    try:
+        raw = _load(lines, names, numeric, np.int64) if numeric else {}
+    except ValueError:
+        # Empty cells: read the batch as text and let _columns fill in defaults.
+        raw = _load(lines, names, numeric, str)
+    if text:
+        raw.update(_load(lines, names, text, str))
+    return _columns(raw)
+
+
+def _jsonl_batch(records: list) -> dict:
+    names = [name for name in dict.fromkeys(name for record in records for name in record) if name in JSONL_DEFAULTS]
+    raw = {}
+    for name in names:
+        default = JSONL_DEFAULTS[name]
+        raw[name] = [default if (value := record.get(name)) is None or value == "" else value for record in records]
+    if any("max_completion_tokens" in record for record in records):
+        completion = raw.get("completion_tokens", [0] * len(records))
+        raw["max_completion_tokens"] = [
+            reserve if (reserve := record.get("max_completion_tokens")) not in (None, "") else default
+            for record, default in zip(records, completion)
+        ]
+    return _columns(raw)
+
+
+def read_batches(path: str, batch_rows: int = BATCH_ROWS, fmt: str = None):
+    """Yield column dicts of at most `batch_rows` rows from a JSONL or CSV log."""
+    fmt = fmt or ("csv" if path.endswith(".csv") else "jsonl")
+    with open(path, encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            names = next(csv.reader([f.readline()]))
+            while lines := list(islice(f, batch_rows)):
+                yield _csv_batch(lines, names)
+        elif fmt == "jsonl":
+            while lines := list(islice(f, batch_rows)):
+                yield _jsonl_batch([json.loads(line) for line in lines if line.strip()])
+        else:
+            raise ValueError(f"Unknown log format: {fmt!r}")
+
+
+def _iso_seconds(timestamps: np.ndarray) -> np.ndarray:
+    """Epoch seconds (UTC) from ISO-8601 strings, honouring Z and ±HH[:MM] offsets."""
+    stamps = np.char.rstrip(timestamps, "Zz")
+    # A sign after the date (which ends at index 9) starts an offset.
+    offset = np.maximum(np.char.rfind(stamps, "+"), np.char.rfind(stamps, "-")) > 9
+    seconds = np.empty(len(stamps), dtype=np.int64)
+    if not offset.all():
+        seconds[~offset] = stamps[~offset].astype("datetime64[s]").astype(np.int64)
+    if offset.any():
+        zoned = stamps[offset]
+        sign = np.where(np.char.find(zoned, "+") >= 0, 1, -1)
+        local, _, tz = np.char.rpartition(np.char.replace(zoned, "+", "-"), "-").T
+        hhmm = np.char.ljust(np.char.replace(tz, ":", ""), 4, "0").astype("U4").astype(np.int64)
+        seconds[offset] = local.astype("datetime64[s]").astype(np.int64) - sign * (hhmm // 100 * 3600 + hhmm % 100 * 60)
+    return seconds
+
+
+def _days(timestamps: np.ndarray) -> np.ndarray:
+    """Days since the epoch (UTC) from epoch seconds or ISO-8601 strings, which may be mixed."""
+    if timestamps.dtype.kind in "iuf":
+        return np.floor_divide(timestamps, 86400).astype(np.int64)
+    # Only ISO dates have a "-" after the first character or a ":".
+    epoch = (np.char.find(timestamps, "-", 1) < 0) & (np.char.find(timestamps, ":") < 0)
+    days = np.empty(len(timestamps), dtype=np.int64)
+    days[epoch] = np.floor_divide(timestamps[epoch].astype(np.float64), 86400).astype(np.int64)
+    if not epoch.all():
+        days[~epoch] = np.floor_divide(_iso_seconds(timestamps[~epoch]), 86400)
+    return days
+
+
+# Group keys are packed into one int64: 23 bits of user, 16 of model, 24 of day.
+USER_SHIFT, MODEL_SHIFT, DAY_BITS = 40, 24, 24
+
+
+class CostAggregator:
+    """Running per-group totals of tokens, cost and requests that would not fit the context.
+
+    Each batch is reduced to one row per group with np.unique and np.bincount.
+    The partial totals stay in arrays and are merged the same way once they
+    add up to a batch, so no per-row or per-group Python work remains except
+    giving each new user id a number.
+    """
+
+    def __init__(self, pricing: dict = None, by=GROUP_KEYS, compact_rows: int = BATCH_ROWS):
+        self.pricing = PRICING if pricing is None else pricing
+        unknown = set(by) - set(GROUP_KEYS)
+        if unknown:
+            raise ValueError(f"Cannot group by {', '.join(sorted(unknown))}; choose from {', '.join(GROUP_KEYS)}")
+        self.by = tuple(by)
+        self.models = np.array(sorted(self.pricing))
+        prices = [self.pricing[m] for m in self.models]
+        self._rates = np.array([(p.prompt, p.completion, p.cached_prompt) for p in prices]) / 1_000_000
+        self._limits = np.array([p.context_limit for p in prices], dtype=np.int64)
+        self._user_codes = {}
+        self._users = []
+        self._pending = []
+        self._pending_rows = 0
+        self.compact_rows = compact_rows
+        self.rows = 0
+
+    def price(self, columns: dict):
+        """Per-row model index, cost and over-context flag for one batch."""
+        models = columns["model"]
+        # A handful of models: a binary search per row beats sorting the strings.
+        idx = np.minimum(np.searchsorted(self.models, models), len(self.models) - 1)
+        unknown = self.models[idx] != models
+        if unknown.any():
+            raise ValueError(f"No price for model(s) {', '.join(sorted(set(models[unknown].tolist())))}")
+        prompt, cached = columns["prompt_tokens"], columns["cached_prompt_tokens"]
+        rates = self._rates[idx]
+        cost = (prompt - cached) * rates[:, 0] + columns["completion_tokens"] * rates[:, 1] + cached * rates[:, 2]
+        over = prompt + columns["max_completion_tokens"] > self._limits[idx]
+        return idx, cost, over
+
+    def _keys(self, columns: dict, model_idx: np.ndarray) -> np.ndarray:
+        key = np.zeros(len(model_idx), dtype=np.int64)
+        if "user_id" in self.by:
+            distinct, inverse = np.unique(columns["user_id"], return_inverse=True)
+            codes = self._user_codes
+            for user in distinct.tolist():
+                if user not in codes:
+                    codes[user] = len(self._users)
+                    self._users.append(user)
+            if len(self._users) > 1 << (63 - USER_SHIFT):
+                raise ValueError("Too many distinct user ids to group by.")
+            key |= np.array([codes[user] for user in distinct.tolist()], dtype=np.int64)[inverse] << USER_SHIFT
+        if "model" in self.by:
+            key |= model_idx.astype(np.int64) << MODEL_SHIFT
+        if "day" in self.by:
+            if "timestamp" not in columns:
+                raise ValueError("Grouping by day needs a timestamp column.")
+            timestamps = columns["timestamp"]
+            if timestamps.dtype.kind == "U" and (missing := int((timestamps == "").sum())):
+                raise ValueError(f"{missing} row(s) have no timestamp; cannot group by day.")
+            key |= _days(columns["timestamp"]) & ((1 << DAY_BITS) - 1)
+        return key
+
+    @staticmethod
+    def _reduce(keys: np.ndarray, sums: np.ndarray):
+        distinct, group = np.unique(keys, return_inverse=True)
+        reduced = np.stack([np.bincount(group, weights=column, minlength=len(distinct)) for column in sums])
+        return distinct, reduced
+
+    def add_batch(self, columns: dict):
+        model_idx, cost, over = self.price(columns)
+        if not len(cost):
+            return
+        self.rows += len(cost)
+        sums = np.stack([
+            np.ones(len(cost)),
+            columns["prompt_tokens"],
+            columns["completion_tokens"],
+            columns["cached_prompt_tokens"],
+            cost,
+            over,
+        ])
+        keys, reduced = self._reduce(self._keys(columns, model_idx), sums)
+        self._pending.append((keys, reduced))
+        self._pending_rows += len(keys)
+        if self._pending_rows >= self.compact_rows and len(self._pending) > 1:
+            self._compact()
+
+    def _compact(self):
+        if len(self._pending) > 1:
+            keys = np.concatenate([k for k, _ in self._pending])
+            sums = np.concatenate([s for _, s in self._pending], axis=1)
+            self._pending = [self._reduce(keys, sums)]
+        self._pending_rows = len(self._pending[0][0]) if self._pending else 0
+
+    def results(self) -> list:
+        self._compact()
+        if not self._pending:
+            return []
+        keys, sums = self._pending[0]
+        labels = {
+            "user_id": lambda k: self._users[k >> USER_SHIFT],
+            "model": lambda k: str(self.models[(k >> MODEL_SHIFT) & 0xFFFF]),
+            "day": lambda k: str(np.datetime64(k & ((1 << DAY_BITS) - 1), "D")),
+        }
+        rows = []
+        for key, values in zip(keys.tolist(), sums.T.tolist()):
+            row = {name: labels[name](key) for name in self.by}
+            row.update({metric: int(value) for metric, value in zip(METRICS, values)})
+            row["cost_usd"] = round(values[4], 6)
+            rows.append(row)
+        return sorted(rows, key=lambda row: [row[name] for name in self.by])
+
+    def totals(self) -> dict:
+        self._compact()
+        sums = self._pending[0][1].sum(axis=1).tolist() if self._pending else [0.0] * len(METRICS)
+        totals = {metric: int(value) for metric, value in zip(METRICS, sums)}
+        totals["cost_usd"] = round(sums[4], 6)
+        return totals
+
+
+def aggregate_logs(paths: list, pricing: dict = None, by=GROUP_KEYS, batch_rows: int = BATCH_ROWS,
+                   fmt: str = None) -> CostAggregator:
+    aggregator = CostAggregator(pricing, by)
+    for path in paths:
+        for columns in read_batches(path, batch_rows, fmt):
+            aggregator.add_batch(columns)
+    return aggregator
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("logs", nargs="+", help="JSONL or CSV usage logs")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default=None, help="Default: by file extension")
+    parser.add_argument("--pricing", default=None, help="JSON pricing table replacing the built-in one")
+    parser.add_argument("--by", default=",".join(GROUP_KEYS), help="Comma-separated subset of " + ",".join(GROUP_KEYS))
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    parser.add_argument("--out", default=None, help="CSV report path (default: stdout)")
+    args = parser.parse_args()
+
+    by = [key for key in args.by.split(",") if key]
+    pricing = load_pricing(args.pricing) if args.pricing else None
+    aggregator = aggregate_logs(args.logs, pricing, by, args.batch_rows, args.format)
+
+    out = open(args.out, "w", newline="", encoding="utf-8") if args.out else sys.stdout
+    try:
+        writer = csv.DictWriter(out, fieldnames=[*by, *METRICS])
+        writer.writeheader()
+        writer.writerows(aggregator.results())
+    finally:
+        if args.out:
+            out.close()
+    print(json.dumps({"rows": aggregator.rows, **aggregator.totals()}), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
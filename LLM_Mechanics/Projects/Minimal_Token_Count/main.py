@@ -1,10 +1,10 @@
-from utils import Tokenizer, fits_context, estimate_cost
+from utils import get_tokenizer, fits_context, estimate_cost
 
 MODEL_CONTEXT_LIMIT = 8000
 MAX_COMPLETION_TOKENS = 512
 
 def example_usage():
-    tokenizer = Tokenizer()
+    tokenizer = get_tokenizer()
     system_prompt = "You are a helpful assistant."
     user_question = "Explain tokenization, context windows, and token-based pricing in simple terms."
     full_prompt = system_prompt + "\n\nUser: " + user_question
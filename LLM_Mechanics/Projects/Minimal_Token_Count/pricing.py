@@ -0,0 +1,66 @@
+"""Per-model prices (USD per million tokens) and context limits.
+
+The rates are the ones this repo already uses for its examples, not a
+provider's price list. Load real prices with `load_pricing`.
+"""
+import json
+from typing import NamedTuple
+
+from utils import estimate_cost, fits_context
+
+
+class ModelPrice(NamedTuple):
+    prompt: float
+    completion: float
+    cached_prompt: float
+    context_limit: int
+
+
+DEFAULT_MODEL = "default"
+
+PRICING = {
+    # The old estimate_cost/fits_context defaults.
+    DEFAULT_MODEL: ModelPrice(prompt=1.5, completion=2.0, cached_prompt=0.375, context_limit=8000),
+    # Prod-real-api-metrics' MODEL_NAME and rates.
+    "openai/gpt-5.2": ModelPrice(prompt=1.0, completion=2.0, cached_prompt=0.25, context_limit=400_000),
+}
+
+
+def load_pricing(path: str) -> dict:
+    """Read `{"model": {"prompt": ..., "completion": ..., "cached_prompt": ..., "context_limit": ...}}`.
+
+    `cached_prompt` defaults to the prompt rate, i.e. no caching discount.
+    """
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    return {
+        model: ModelPrice(
+            prompt=float(p["prompt"]),
+            completion=float(p["completion"]),
+            cached_prompt=float(p.get("cached_prompt", p["prompt"])),
+            context_limit=int(p["context_limit"]),
+        )
+        for model, p in raw.items()
+    }
+
+
+def get_price(model: str, pricing: dict = None) -> ModelPrice:
+    pricing = PRICING if pricing is None else pricing
+    if model not in pricing:
+        raise ValueError(f"No price for model {model!r}; known models: {', '.join(sorted(pricing))}")
+    return pricing[model]
+
+
+def estimate_model_cost(model: str, prompt_tokens: int, completion_tokens: int,
+                        cached_prompt_tokens: int = 0, pricing: dict = None) -> float:
+    """estimate_cost at `model`'s rates. `prompt_tokens` includes the cached ones, as in API usage."""
+    price = get_price(model, pricing)
+    return round(
+        estimate_cost(prompt_tokens - cached_prompt_tokens, completion_tokens, price.prompt, price.completion)
+        + cached_prompt_tokens / 1_000_000 * price.cached_prompt,
+        6,
+    )
+
+
+def fits_model_context(model: str, prompt_tokens: int, max_completion_tokens: int, pricing: dict = None) -> bool:
+    return fits_context(prompt_tokens, max_completion_tokens, get_price(model, pricing).context_limit)
@@ -0,0 +1,142 @@
+import json
+
+import numpy as np
+import pytest
+
+from cost_engine import CostAggregator, _days, aggregate_logs, read_batches
+from pricing import DEFAULT_MODEL, PRICING, ModelPrice, estimate_model_cost, fits_model_context, load_pricing
+
+ROWS = [
+    {"user_id": "alice", "model": "default", "timestamp": "2026-10-17T10:00:00Z", "prompt_tokens": 1000, "completion_tokens": 200},
+    {"user_id": "alice", "model": "openai/gpt-5.2", "timestamp": "2026-10-17T11:00:00Z", "prompt_tokens": 5000,
+     "completion_tokens": 100, "cached_prompt_tokens": 4000},
+    {"user_id": "bob", "model": "default", "timestamp": 1792281600, "prompt_tokens": 7900, "completion_tokens": 300},
+    {"user_id": "alice", "model": "default", "timestamp": "2026-10-17T23:59:59Z", "prompt_tokens": 10, "completion_tokens": 5},
+]
+
+
+def _write(tmp_path, rows, fmt):
+    path = tmp_path / f"usage.{fmt}"
+    if fmt == "jsonl":
+        path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+    else:
+        names = ["user_id", "model", "timestamp", "prompt_tokens", "completion_tokens", "cached_prompt_tokens"]
+        lines = [",".join(names)] + [",".join(str(row.get(n, 0)) for n in names) for row in rows]
+        path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
+def test_model_pricing_matches_estimate_cost():
+    assert estimate_model_cost("default", 1000, 200) == 0.0019
+    # 1000 uncached at 1.0, 4000 cached at 0.25, 100 completion at 2.0 per million.
+    assert estimate_model_cost("openai/gpt-5.2", 5000, 100, cached_prompt_tokens=4000) == 0.0022
+    assert fits_model_context("default", 7488, 512) is True
+    assert fits_model_context("default", 7489, 512) is False
+    with pytest.raises(ValueError):
+        estimate_model_cost("unknown", 1, 1)
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "csv"])
+def test_engine_matches_scalar_functions(tmp_path, fmt):
+    path = _write(tmp_path, ROWS, fmt)
+    results = aggregate_logs([path], batch_rows=3).results()
+
+    expected = {}
+    for row in ROWS:
+        day = row["timestamp"][:10] if isinstance(row["timestamp"], str) else "2026-10-18"
+        totals = expected.setdefault((row["user_id"], row["model"], day), [0, 0.0, 0])
+        totals[0] += 1
+        totals[1] += estimate_model_cost(row["model"], row["prompt_tokens"], row["completion_tokens"],
+                                         row.get("cached_prompt_tokens", 0))
+        totals[2] += not fits_model_context(row["model"], row["prompt_tokens"], row["completion_tokens"])
+    assert {(r["user_id"], r["model"], r["day"]): [r["requests"], r["cost_usd"], r["over_context"]] for r in results} == \
+        {key: [n, round(cost, 6), over] for key, (n, cost, over) in expected.items()}
+
+
+def test_grouping_subsets_and_batches_agree(tmp_path):
+    path = _write(tmp_path, ROWS * 50, "jsonl")
+    by_model = aggregate_logs([path], by=["model"], batch_rows=7).results()
+    assert [(r["model"], r["requests"]) for r in by_model] == [("default", 150), ("openai/gpt-5.2", 50)]
+    one_batch = aggregate_logs([path]).totals()
+    small_batches = CostAggregator(compact_rows=2)
+    for columns in read_batches(path, batch_rows=3):
+        small_batches.add_batch(columns)
+    assert small_batches.totals() == one_batch
+    assert aggregate_logs([path], by=[]).results() == [one_batch]
+
+
+def test_unknown_model_and_custom_pricing(tmp_path):
+    rows = [dict(ROWS[0], model="acme/large")]
+    path = _write(tmp_path, rows, "jsonl")
+    with pytest.raises(ValueError, match="acme/large"):
+        aggregate_logs([path])
+
+    table = tmp_path / "pricing.json"
+    table.write_text(json.dumps({"acme/large": {"prompt": 10, "completion": 20, "context_limit": 1000}}))
+    pricing = load_pricing(str(table))
+    assert pricing["acme/large"] == ModelPrice(10.0, 20.0, 10.0, 1000)
+    totals = aggregate_logs([path], pricing=pricing).totals()
+    assert totals["cost_usd"] == 0.014 and totals["over_context"] == 1
+    assert "default" in PRICING
+
+
+def test_jsonl_missing_keys_take_column_defaults(tmp_path):
+    rows = [
+        {"timestamp": 1792281600, "prompt_tokens": 7900, "completion_tokens": 300},
+        {"user_id": "bob", "model": None, "timestamp": 1792281600, "prompt_tokens": 7900, "completion_tokens": 10,
+         "max_completion_tokens": 512},
+    ]
+    (columns,) = read_batches(_write(tmp_path, rows, "jsonl"))
+
+    assert columns["user_id"].tolist() == ["anonymous", "bob"]
+    assert columns["model"].tolist() == [DEFAULT_MODEL, DEFAULT_MODEL]
+    assert columns["cached_prompt_tokens"].tolist() == [0, 0]
+    # The first row reserves its own completion, the second what it asked for.
+    assert columns["max_completion_tokens"].tolist() == [300, 512]
+    totals = aggregate_logs([_write(tmp_path, rows, "jsonl")]).totals()
+    assert totals["over_context"] == 2
+    assert totals["cost_usd"] == round(estimate_model_cost(DEFAULT_MODEL, 7900, 300) +
+                                       estimate_model_cost(DEFAULT_MODEL, 7900, 10), 6)
+
+
+def test_empty_csv_cells_take_column_defaults(tmp_path):
+    path = tmp_path / "usage.csv"
+    path.write_text(
+        "user_id,model,timestamp,prompt_tokens,completion_tokens,cached_prompt_tokens,max_completion_tokens\n"
+        ",,2026-10-17T10:00:00Z,1000,200,,\n"
+        "bob,default,2026-10-17T11:00:00Z,1000,,500,100\n"
+    )
+    (columns,) = read_batches(str(path))
+
+    assert columns["user_id"].tolist() == ["anonymous", "bob"]
+    assert columns["model"].tolist() == [DEFAULT_MODEL, "default"]
+    assert columns["completion_tokens"].tolist() == [200, 0]
+    assert columns["cached_prompt_tokens"].tolist() == [0, 500]
+    assert columns["max_completion_tokens"].tolist() == [200, 100]
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "csv"])
+def test_rows_without_timestamp_cannot_be_grouped_by_day(tmp_path, fmt):
+    # No timestamp key in JSONL, an empty cell in CSV.
+    untimed = {k: v for k, v in ROWS[2].items() if k != "timestamp"} if fmt == "jsonl" else dict(ROWS[2], timestamp="")
+    rows = [ROWS[0], untimed]
+    path = _write(tmp_path, rows, fmt)
+
+    with pytest.raises(ValueError, match="1 row"):
+        aggregate_logs([path])
+    assert aggregate_logs([path], by=["user_id"]).totals()["requests"] == 2
+
+
+def test_days_parse_float_epochs_and_utc_offsets():
+    day = np.datetime64("2026-10-18", "D").astype(np.int64)
+    timestamps = np.array([
+        "1792281600.5",               # 2026-10-18T00:00:00.5Z
+        "1792281599.5",               # a half second before midnight UTC
+        "2026-10-17T23:30:00-05:00",  # 04:30 UTC the next day
+        "2026-10-18T01:00:00+02:00",  # 23:00 UTC the day before
+        "2026-10-18T00:00:00.250Z",
+        "2026-10-18 12:00:00+0530",
+        "2026-10-18",
+    ])
+    assert _days(timestamps).tolist() == [day, day - 1, day, day - 1, day, day, day]
+    assert _days(np.array([1792281600.5, 1792281599.5])).tolist() == [day, day - 1]
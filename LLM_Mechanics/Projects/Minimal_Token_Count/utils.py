@@ -1,18 +1,4 @@
-import tiktoken
-
-class Tokenizer:
-    def __init__(self, encoding_name="cl100k_base"):
-        self.enc = tiktoken.get_encoding(encoding_name)
-
-    def count_tokens(self, text: str) -> int:
-        return len(self.enc.encode(text))
-
-    def encode(self, text: str):
-        return self.enc.encode(text)
-
-    def decode(self, tokens: list[int]):
-        return self.enc.decode(tokens)
-
+from llm_common.tokenizer import Tokenizer, get_tokenizer
 
 def estimate_cost(prompt_tokens: int, completion_tokens: int, prompt_rate=1.5, completion_rate=2.0) -> float:
     prompt_cost = (prompt_tokens / 1_000_000) * prompt_rate
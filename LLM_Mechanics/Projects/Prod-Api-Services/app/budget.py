@@ -0,0 +1,15 @@
+from llm_common import BudgetLedger, LocalBudgetStore, RedisBudgetStore
+from .config import BUDGET_BACKEND, BUDGET_WINDOW_S, BUDGET_FLUSH_INTERVAL_S, USER_BUDGET_THRESHOLD
+from . import cache
+
+def _store():
+    if BUDGET_BACKEND == "redis":
+        if cache.redis_client is None:
+            raise ValueError("BUDGET_BACKEND=redis requires REDIS_URL")
+        return RedisBudgetStore(cache.redis_client, window_s=BUDGET_WINDOW_S)
+    if BUDGET_BACKEND == "local":
+        return LocalBudgetStore(window_s=BUDGET_WINDOW_S)
+    raise ValueError(f"Unknown BUDGET_BACKEND: {BUDGET_BACKEND!r}")
+
+# Per-user spend, buffered here and flushed to the store in the background.
+ledger = BudgetLedger(_store(), limit=USER_BUDGET_THRESHOLD, flush_interval_s=BUDGET_FLUSH_INTERVAL_S)
@@ -1,11 +1,157 @@
+import hashlib
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+
 import redis
-import json
 
-redis_client = redis.Redis(host="localhost", port=6379, decode_responses=True)
+from .config import REDIS_URL, REDIS_TIMEOUT_S, REDIS_RETRY_S, TOKEN_CACHE_TTL, TOKEN_CACHE_MAX_BYTES
+from .metrics import TOKEN_CACHE_LOOKUPS, TOKEN_CACHE_HIT_RATIO, TOKEN_CACHE_BYTES, REDIS_ERRORS
+
+logger = logging.getLogger(__name__)
+
+# Only the token count is expensive, and it depends on nothing but the
+# encoding and the text, so that is all the key is made of.
+def token_key(encoding_name: str, text: str) -> str:
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"tok:{encoding_name}:{digest}"
+
+
+class LocalLRU:
+    """In-process LRU bounded by approximate bytes rather than entry count.
+
+    `bytes_gauge`, if given, is set whenever the size changes: callback
+    gauges are not exported in multiprocess mode.
+    """
+
+    # Per-entry bookkeeping of the OrderedDict on top of the key and value objects.
+    ENTRY_OVERHEAD = 100
+
+    def __init__(self, max_bytes: int, bytes_gauge=None):
+        self.max_bytes = max_bytes
+        self.bytes_gauge = bytes_gauge
+        self.bytes = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def entry_size(cls, key: str, value: int) -> int:
+        return sys.getsizeof(key) + sys.getsizeof(value) + cls.ENTRY_OVERHEAD
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: int):
+        size = self.entry_size(key, value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= self.entry_size(key, old)
+            self._entries[key] = value
+            self.bytes += size
+            while self.bytes > self.max_bytes and self._entries:
+                old_key, old_value = self._entries.popitem(last=False)
+                self.bytes -= self.entry_size(old_key, old_value)
+                self.evictions += 1
+            if self.bytes_gauge is not None:
+                self.bytes_gauge.set(self.bytes)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+redis_client = (
+    redis.Redis.from_url(
+        REDIS_URL,
+        decode_responses=True,
+        socket_timeout=REDIS_TIMEOUT_S,
+        socket_connect_timeout=REDIS_TIMEOUT_S,
+    )
+    if REDIS_URL
+    else None
+)
+local_cache = LocalLRU(TOKEN_CACHE_MAX_BYTES, bytes_gauge=TOKEN_CACHE_BYTES)
+
+_redis_down_until = 0.0
+_hits = 0
+_lookups = 0
+_stats_lock = threading.Lock()
+
+
+def _redis():
+    """The Redis client, or None while it is disabled or backing off after an error."""
+    if redis_client is None or time.monotonic() < _redis_down_until:
+        return None
+    return redis_client
+
+
+def _redis_failed(e: Exception):
+    global _redis_down_until
+    REDIS_ERRORS.inc()
+    if time.monotonic() >= _redis_down_until:
+        logger.warning(f"Redis unavailable, using local token cache only for {REDIS_RETRY_S}s: {e}")
+    _redis_down_until = time.monotonic() + REDIS_RETRY_S
+
+
+def hit_ratio() -> float:
+    return _hits / _lookups if _lookups else 0.0
+
+
+
+def get_token_counts(keys: list) -> list:
+    """
+    Look keys up in the local LRU, then fetch the rest with one Redis MGET.
+    Misses come back as None. Redis hits are promoted into the local tier.
+    """
+    global _hits, _lookups
+    counts = [local_cache.get(key) for key in keys]
+    remote = [i for i, count in enumerate(counts) if count is None]
+    local_hits = len(keys) - len(remote)
+
+    client = _redis()
+    redis_hits = 0
+    if remote and client is not None:
+        try:
+            values = client.mget([keys[i] for i in remote])
+        except redis.RedisError as e:
+            _redis_failed(e)
+            values = []
+        for i, value in zip(remote, values):
+            if value is not None:
+                counts[i] = int(value)
+                local_cache.set(keys[i], counts[i])
+                redis_hits += 1
+
+    misses = len(keys) - local_hits - redis_hits
+    TOKEN_CACHE_LOOKUPS.labels(result="local_hit").inc(local_hits)
+    TOKEN_CACHE_LOOKUPS.labels(result="redis_hit").inc(redis_hits)
+    TOKEN_CACHE_LOOKUPS.labels(result="miss").inc(misses)
+    with _stats_lock:
+        _hits += local_hits + redis_hits
+        _lookups += len(keys)
+        TOKEN_CACHE_HIT_RATIO.set(hit_ratio())
+    return counts
+
 
-def get_cache(key: str):
-    data = redis_client.get(key)
-    return json.loads(data) if data else None
+def set_token_counts(items: dict):
+    """Store counts locally and write them to Redis in one pipelined round trip."""
+    for key, count in items.items():
+        local_cache.set(key, count)
 
-def set_cache(key: str, value: dict, ttl=300):
-    redis_client.setex(key, ttl, json.dumps(value))
\ No newline at end of file
+    client = _redis()
+    if not items or client is None:
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        for key, count in items.items():
+            pipe.setex(key, TOKEN_CACHE_TTL, count)
+        pipe.execute()
+    except redis.RedisError as e:
+        _redis_failed(e)
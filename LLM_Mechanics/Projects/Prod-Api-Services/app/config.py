@@ -6,4 +6,21 @@ MODEL_CONTEXT_LIMIT = int(os.getenv("MODEL_CONTEXT_LIMIT", 16000))
 PROMPT_RATE_PER_MILLION = float(os.getenv("PROMPT_RATE_PER_MILLION", 1.0))
 COMPLETION_RATE_PER_MILLION = float(os.getenv("COMPLETION_RATE_PER_MILLION", 2.0))
 
-API_KEY = os.getenv("API_KEY", "dev-secret-key")
\ No newline at end of file
+API_KEY = os.getenv("API_KEY", "dev-secret-key")
+
+ENCODE_THREADS = int(os.getenv("ENCODE_THREADS", os.cpu_count() or 1))
+MAX_BATCH_ITEMS = int(os.getenv("MAX_BATCH_ITEMS", 10000))
+
+# Token-count cache. Leave REDIS_URL empty to run with the in-process tier only.
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_TIMEOUT_S = float(os.getenv("REDIS_TIMEOUT_S", 0.05))
+REDIS_RETRY_S = float(os.getenv("REDIS_RETRY_S", 10))
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", 86400))
+TOKEN_CACHE_MAX_BYTES = int(os.getenv("TOKEN_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+# Per-user budget ledger. "redis" shares totals across workers and replicas
+# through REDIS_URL; "local" keeps them in this process.
+BUDGET_BACKEND = os.getenv("BUDGET_BACKEND", "local")
+USER_BUDGET_THRESHOLD = float(os.environ["USER_BUDGET_THRESHOLD"]) if os.getenv("USER_BUDGET_THRESHOLD") else None
+BUDGET_WINDOW_S = int(os.getenv("BUDGET_WINDOW_S", 30 * 86400))
+BUDGET_FLUSH_INTERVAL_S = float(os.getenv("BUDGET_FLUSH_INTERVAL_S", 0.25))
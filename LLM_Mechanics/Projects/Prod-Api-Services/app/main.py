@@ -1,11 +1,17 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import Response, JSONResponse
-from prometheus_client import generate_latest
 import logging
 import time
 
-from .models import EstimateRequest
-from .services import process_estimate
+from llm_common import BudgetExceededError, warm_up
+from llm_common.metrics import render_metrics
+
+from .config import API_KEY, ENCODING_NAME, MAX_BATCH_ITEMS
+from .models import EstimateRequest, BatchEstimateRequest, BatchEstimateResponse
+from .services import process_estimate, process_estimate_batch
+from .budget import ledger
 from .logging_config import setup_logging
 from .middleware import RequestContextMiddleware, APIKeyMiddleware
 from .metrics import REQUEST_COUNT, REQUEST_LATENCY
@@ -14,15 +20,36 @@ from .metrics import REQUEST_COUNT, REQUEST_LATENCY
 setup_logging()
 logger = logging.getLogger(__name__)
 
+async def _warm_up(app: FastAPI):
+    """Load the encoding off the event loop; /readyz reports 503 until it is done."""
+    timings = await asyncio.to_thread(warm_up, ENCODING_NAME)
+    app.state.ready = True
+    logger.info("warm_up_done", extra={"duration_ms": round(timings[ENCODING_NAME] * 1000, 2)})
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    ledger.start()
+    # Warm up in the background so the port opens (and /healthz answers) at once.
+    app.state.ready = False
+    warming = asyncio.create_task(_warm_up(app))
+    yield
+    warming.cancel()
+    # Final flush so buffered spend is not lost on shutdown.
+    ledger.close()
+
+
 app = FastAPI(
     title="Token Estimator Service",
     version="2.0.0",
-    description="Production-grade token estimator with auth, metrics, caching"
+    description="Production-grade token estimator with auth, metrics, caching",
+    lifespan=lifespan,
 )
 
-# Register middleware (order matters)
-app.add_middleware(RequestContextMiddleware)
-app.add_middleware(APIKeyMiddleware)
+# Register middleware (order matters: the last one added runs first, so
+# rejected requests are still counted, timed and given a request ID)
+app.add_middleware(APIKeyMiddleware, api_key=API_KEY, exempt_paths=["/healthz", "/readyz", "/metrics"])
+app.add_middleware(RequestContextMiddleware, request_count=REQUEST_COUNT, request_latency=REQUEST_LATENCY)
 
 
 @app.get("/healthz")
@@ -31,10 +58,25 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/readyz")
+def ready(request: Request):
+    """Readiness check: 503 until the tokenizer is loaded."""
+    if not getattr(request.app.state, "ready", False):
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    return {"status": "ready"}
+
+
 @app.get("/metrics")
 def metrics():
-    """Prometheus metrics endpoint"""
-    return Response(generate_latest(), media_type="text/plain")
+    """Prometheus metrics endpoint, summed over all workers in multiprocess mode"""
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
+
+@app.get("/budget")
+def budget(request: Request):
+    """Spend booked so far for the calling user (x-user-id), and what is left."""
+    return ledger.totals(request.headers.get("x-user-id", "anonymous"))
 
 
 @app.post("/estimate")
@@ -53,19 +95,15 @@ def estimate(req: EstimateRequest, request: Request):
             max_completion_tokens=req.max_completion_tokens,
             user_id=user_id,
         )
+    except BudgetExceededError as e:
+        raise HTTPException(status_code=402, detail=str(e))
     except Exception as e:
         logger.error(f"Estimate processing failed: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+    # REQUEST_COUNT / REQUEST_LATENCY are recorded once, by RequestContextMiddleware.
     duration = time.perf_counter() - start
 
-    # Update Prometheus metrics (safe)
-    try:
-        REQUEST_COUNT.inc()
-        REQUEST_LATENCY.observe(duration)
-    except Exception as e:
-        logger.warning(f"Metrics update failed: {e}")
-
     # Log the request info
     logger.info(
         "estimate_request",
@@ -85,4 +123,38 @@ def estimate(req: EstimateRequest, request: Request):
             "estimated_max_cost_usd": result.get("estimated_max_cost_usd", 0),
             "duration_ms": round(duration * 1000, 2),
         }
-    )
\ No newline at end of file
+    )
+
+
+@app.post("/estimate/batch", response_model=BatchEstimateResponse)
+def estimate_batch(req: BatchEstimateRequest, request: Request):
+    """
+    Estimate many prompts in one call: one round trip, one middleware pass,
+    one MGET and one pipelined SETEX instead of one of each per prompt.
+    """
+
+    if len(req.items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_ITEMS} items per batch")
+
+    user_id = request.headers.get("x-user-id", "anonymous")
+
+    try:
+        result = process_estimate_batch(req.items, user_id=user_id)
+    except BudgetExceededError as e:
+        raise HTTPException(status_code=402, detail=str(e))
+    except Exception as e:
+        logger.error(f"Batch estimate processing failed: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    logger.info(
+        "estimate_batch_request",
+        extra={
+            "user_id": user_id,
+            "items": len(req.items),
+            "cache_hits": result["cache_hits"],
+            "total_prompt_tokens": result["total_prompt_tokens"],
+            "duration_ms": result["duration_ms"],
+        },
+    )
+
+    return result
\ No newline at end of file
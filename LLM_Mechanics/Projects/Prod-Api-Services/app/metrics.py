@@ -1,4 +1,8 @@
-from prometheus_client import Counter, Histogram
+from prometheus_client import Counter, Gauge, Histogram
+
+# The only place metrics are created. Gauges say how to combine workers when
+# PROMETHEUS_MULTIPROC_DIR is set (see llm_common.metrics); otherwise the
+# mode is ignored.
 
 REQUEST_COUNT = Counter(
     "token_estimator_requests_total",
@@ -8,4 +12,27 @@ REQUEST_COUNT = Counter(
 REQUEST_LATENCY = Histogram(
     "token_estimator_request_latency_seconds",
     "Request latency in seconds"
-)
\ No newline at end of file
+)
+
+TOKEN_CACHE_LOOKUPS = Counter(
+    "token_estimator_token_cache_lookups_total",
+    "Token-count cache lookups by outcome",
+    ["result"],
+)
+
+TOKEN_CACHE_HIT_RATIO = Gauge(
+    "token_estimator_token_cache_hit_ratio",
+    "Fraction of token-count lookups served from either cache tier",
+    multiprocess_mode="liveall",
+)
+
+TOKEN_CACHE_BYTES = Gauge(
+    "token_estimator_token_cache_local_bytes",
+    "Approximate memory held by the in-process token-count cache",
+    multiprocess_mode="livesum",
+)
+
+REDIS_ERRORS = Counter(
+    "token_estimator_redis_errors_total",
+    "Redis operations that failed and fell back to the local cache"
+)
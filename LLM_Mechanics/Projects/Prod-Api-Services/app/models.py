@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from typing import List
+from pydantic import BaseModel, Field
 
 class EstimateRequest(BaseModel):
     prompt: str
@@ -8,4 +9,24 @@ class EstimateResponse(BaseModel):
     prompt_tokens: int
     fits_context: bool
     estimated_max_cost_usd: float
+    duration_ms: float
+
+class BatchEstimateItem(BaseModel):
+    prompt: str
+    max_completion_tokens: int = 512
+
+class BatchEstimateRequest(BaseModel):
+    items: List[BatchEstimateItem] = Field(..., min_length=1)
+
+class BatchEstimateResult(BaseModel):
+    prompt_tokens: int
+    fits_context: bool
+    estimated_max_cost_usd: float
+    cached: bool
+
+class BatchEstimateResponse(BaseModel):
+    results: List[BatchEstimateResult]
+    total_prompt_tokens: int
+    total_estimated_max_cost_usd: float
+    cache_hits: int
     duration_ms: float
\ No newline at end of file
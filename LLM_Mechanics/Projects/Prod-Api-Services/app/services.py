@@ -1,26 +1,32 @@
 import time
-import tiktoken
-from functools import lru_cache
+from llm_common import get_encoding as load_encoding, get_tokenizer
 from .config import (
+    ENCODE_THREADS,
     ENCODING_NAME,
     MODEL_CONTEXT_LIMIT,
     PROMPT_RATE_PER_MILLION,
     COMPLETION_RATE_PER_MILLION,
 )
-from .cache import get_cache, set_cache
+from .cache import token_key, get_token_counts, set_token_counts
+from .budget import ledger
 
-# In-memory per-user cost tracking (for demo; replace with Redis/db in prod)
-USER_BUDGET = {}
-
-@lru_cache(maxsize=1)
 def get_encoding():
-    """Get tokenizer encoding, cached for performance."""
-    return tiktoken.get_encoding(ENCODING_NAME)
+    """The configured encoding, shared with llm_common (and warmed by the lifespan)."""
+    return load_encoding(ENCODING_NAME)
 
 def count_tokens(text: str) -> int:
-    """Count tokens in a string using the configured encoding."""
+    """Count tokens in a string using the configured encoding.
+
+    Multi-megabyte prompts are split at BPE-safe boundaries and counted on
+    ENCODE_THREADS threads; the result is identical to a single pass.
+    """
+    # encode_ordinary, like the batch path, so both agree on what they put in the shared cache.
+    return get_tokenizer(ENCODING_NAME).count_tokens_parallel(text, workers=ENCODE_THREADS)
+
+def count_tokens_batch(texts: list) -> list:
+    """Count tokens for many strings at once, encoding on ENCODE_THREADS threads."""
     enc = get_encoding()
-    return len(enc.encode(text))
+    return [len(tokens) for tokens in enc.encode_ordinary_batch(texts, num_threads=ENCODE_THREADS)]
 
 def estimate_cost(prompt_tokens: int, max_completion_tokens: int) -> float:
     """Compute worst-case estimated cost in USD."""
@@ -28,37 +34,73 @@ def estimate_cost(prompt_tokens: int, max_completion_tokens: int) -> float:
     completion_cost = (max_completion_tokens / 1_000_000) * COMPLETION_RATE_PER_MILLION
     return round(prompt_cost + completion_cost, 6)
 
+def count_tokens_cached(texts: list) -> tuple:
+    """
+    Token counts for `texts` via the two-tier cache; only misses are encoded,
+    each distinct text once. Returns (counts, per-text cache-hit flags).
+    """
+    keys = [token_key(ENCODING_NAME, text) for text in texts]
+    counts = get_token_counts(keys)
+
+    missing = {}
+    for key, text, count in zip(keys, texts, counts):
+        if count is None:
+            missing.setdefault(key, text)
+    cached = [count is not None for count in counts]
+
+    if missing:
+        texts_to_encode = list(missing.values())
+        if len(texts_to_encode) == 1:
+            fresh = dict(zip(missing, [count_tokens(texts_to_encode[0])]))
+        else:
+            fresh = dict(zip(missing, count_tokens_batch(texts_to_encode)))
+        set_token_counts(fresh)
+        counts = [fresh[key] if count is None else count for key, count in zip(keys, counts)]
+    return counts, cached
+
+def _estimate(prompt_tokens: int, max_completion_tokens: int) -> dict:
+    return {
+        "prompt_tokens": prompt_tokens,
+        "fits_context": (prompt_tokens + max_completion_tokens) <= MODEL_CONTEXT_LIMIT,
+        "estimated_max_cost_usd": estimate_cost(prompt_tokens, max_completion_tokens),
+    }
+
 def process_estimate(prompt: str, max_completion_tokens: int, user_id: str = "anonymous") -> dict:
     """
     Compute token count, context fit, and cost for a given prompt.
-    Uses caching to speed up repeated requests.
-    Tracks per-user budget in memory.
+    The token count is cached by (encoding, prompt hash); fit and cost are
+    cheap and derived on every call.
+    Charges the cost to the user's budget; raises BudgetExceededError if
+    that would take them over USER_BUDGET_THRESHOLD.
     """
     start = time.perf_counter()
-    cache_key = f"{user_id}:{prompt}:{max_completion_tokens}"
-
-    # Check cache first
-    cached = get_cache(cache_key)
-    if cached:
-        return cached
+    (prompt_tokens,), _ = count_tokens_cached([prompt])
+    result = _estimate(prompt_tokens, max_completion_tokens)
+    ledger.charge(user_id, result["estimated_max_cost_usd"])
+    result["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return result
 
-    # Core computation
-    prompt_tokens = count_tokens(prompt)
-    fits = (prompt_tokens + max_completion_tokens) <= MODEL_CONTEXT_LIMIT
-    total_cost = estimate_cost(prompt_tokens, max_completion_tokens)
-
-    # Track user budget
-    USER_BUDGET[user_id] = USER_BUDGET.get(user_id, 0) + total_cost
+def process_estimate_batch(items: list, user_id: str = "anonymous") -> dict:
+    """
+    Batch version of process_estimate.
+    One local pass plus at most one MGET for all cache lookups, one batched
+    encode for the misses, and one pipelined SETEX round trip to store them.
+    The whole batch is charged, or rejected, as one amount.
+    """
+    start = time.perf_counter()
+    counts, cached = count_tokens_cached([item.prompt for item in items])
 
-    duration_ms = (time.perf_counter() - start) * 1000
+    results = [
+        dict(_estimate(prompt_tokens, item.max_completion_tokens), cached=hit)
+        for item, prompt_tokens, hit in zip(items, counts, cached)
+    ]
+    total_cost = round(sum(r["estimated_max_cost_usd"] for r in results), 6)
+    ledger.charge(user_id, total_cost)
 
-    result = {
-        "prompt_tokens": prompt_tokens,
-        "fits_context": fits,
-        "estimated_max_cost_usd": total_cost,
-        "duration_ms": round(duration_ms, 2),
+    return {
+        "results": results,
+        "total_prompt_tokens": sum(r["prompt_tokens"] for r in results),
+        "total_estimated_max_cost_usd": total_cost,
+        "cache_hits": sum(cached),
+        "duration_ms": round((time.perf_counter() - start) * 1000, 2),
     }
-
-    # Store in cache
-    set_cache(cache_key, result)
-    return result
\ No newline at end of file
@@ -0,0 +1,92 @@
+"""Compare N single /estimate-style calls against one batched call.
+
+Redis is replaced by an in-process dict that sleeps `--rtt-ms` per round
+trip, so the numbers isolate what batching saves: per-item round trips and
+single-threaded BPE. Pass --redis to run against a real local Redis instead.
+
+    python benchmarks/bench_estimate_batch.py --items 10000 --rtt-ms 0.2
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import cache, services  # noqa: E402
+from app.models import BatchEstimateItem  # noqa: E402
+
+
+class LatencyRedis:
+    def __init__(self, rtt_s):
+        self.rtt_s = rtt_s
+        self.data = {}
+
+    def _trip(self):
+        time.sleep(self.rtt_s)
+
+    def get(self, key):
+        self._trip()
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self._trip()
+        self.data[key] = value
+
+    def mget(self, keys):
+        self._trip()
+        return [self.data.get(k) for k in keys]
+
+    def pipeline(self, transaction=True):
+        return _Pipeline(self)
+
+
+class _Pipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def setex(self, key, ttl, value):
+        self.ops.append((key, value))
+
+    def execute(self):
+        self.redis._trip()
+        self.redis.data.update(self.ops)
+
+
+def make_items(n, run):
+    # A ~200-token prompt with a per-item suffix so every item is a cache miss.
+    body = "Summarise the quarterly revenue figures and flag any anomalies. " * 18
+    return [BatchEstimateItem(prompt=f"{body} [{run}-{i}]", max_completion_tokens=256) for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--rtt-ms", type=float, default=0.2)
+    parser.add_argument("--redis", action="store_true", help="use the real Redis in app.cache")
+    args = parser.parse_args()
+
+    if not args.redis:
+        cache.redis_client = LatencyRedis(args.rtt_ms / 1000)
+
+    services.count_tokens("warm up")
+
+    items = make_items(args.items, "single")
+    start = time.perf_counter()
+    for item in items:
+        services.process_estimate(item.prompt, item.max_completion_tokens, user_id="bench")
+    single_s = time.perf_counter() - start
+
+    items = make_items(args.items, "batch")
+    start = time.perf_counter()
+    services.process_estimate_batch(items, user_id="bench")
+    batch_s = time.perf_counter() - start
+
+    print(f"items={args.items} encode_threads={services.ENCODE_THREADS}")
+    print(f"single: {single_s:.2f}s ({args.items / single_s:,.0f} items/s)")
+    print(f"batch:  {batch_s:.2f}s ({args.items / batch_s:,.0f} items/s)  speedup x{single_s / batch_s:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""/estimate throughput with 1..N gunicorn workers, and whether /metrics still adds up.
+
+Each run starts the service with `gunicorn -c python:llm_common.gunicorn_conf`
+and PROMETHEUS_MULTIPROC_DIR set, waits for /readyz, then drives it from
+`--clients` load-generator processes for `--seconds`. Prompts are unique, so
+every request is tokenized rather than served from the token-count cache.
+Redis is disabled (REDIS_URL empty).
+
+    python benchmarks/bench_workers.py --max-workers 4 --clients 16 --seconds 10
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+SERVICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+HEADERS = {"x-api-key": "dev-secret-key"}
+
+
+def start_service(port, workers, multiproc_dir):
+    env = {
+        **os.environ,
+        "BIND": f"127.0.0.1:{port}",
+        "WEB_CONCURRENCY": str(workers),
+        "PROMETHEUS_MULTIPROC_DIR": multiproc_dir,
+        "REDIS_URL": "",
+        "ENCODE_THREADS": "1",
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "python:llm_common.gunicorn_conf", "app.main:app"],
+        cwd=SERVICE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    # /readyz lands on one worker at a time; wait until a run of answers are all ready.
+    ready_in_a_row = 0
+    deadline = time.time() + 60
+    while ready_in_a_row < 4 * workers:
+        if time.time() > deadline:
+            proc.kill()
+            raise RuntimeError("service did not become ready")
+        try:
+            ok = httpx.get(f"http://127.0.0.1:{port}/readyz", timeout=1).status_code == 200
+        except httpx.TransportError:
+            ok = False
+        ready_in_a_row = ready_in_a_row + 1 if ok else 0
+        time.sleep(0.01 if ok else 0.1)
+    return proc
+
+
+def drive(args):
+    port, seconds, prompt_chars, seed = args
+    rng = random.Random(seed)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9))) for _ in range(5000)]
+    sent = 0
+    with httpx.Client(base_url=f"http://127.0.0.1:{port}", headers=HEADERS, timeout=30) as client:
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            prompt = f"{seed}-{sent} " + " ".join(rng.choices(words, k=prompt_chars // 6))
+            client.post("/estimate", json={"prompt": prompt, "max_completion_tokens": 256}).raise_for_status()
+            sent += 1
+    return sent
+
+
+def requests_in_metrics(port):
+    body = httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=5).text
+    for line in body.splitlines():
+        if line.startswith("token_estimator_requests_total "):
+            return int(float(line.split()[1]))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--prompt-chars", type=int, default=4000)
+    parser.add_argument("--port", type=int, default=8021)
+    args = parser.parse_args()
+
+    print(f"{'workers':>8}{'requests':>10}{'rps':>9}{'speedup':>9}{'/metrics count':>16}")
+    base = None
+    with multiprocessing.Pool(args.clients) as pool:
+        for workers in range(1, args.max_workers + 1):
+            with tempfile.TemporaryDirectory() as multiproc_dir:
+                proc = start_service(args.port, workers, multiproc_dir)
+                try:
+                    before = requests_in_metrics(args.port)
+                    jobs = [(args.port, args.seconds, args.prompt_chars, workers * 1000 + i) for i in range(args.clients)]
+                    start = time.perf_counter()
+                    sent = sum(pool.map(drive, jobs))
+                    elapsed = time.perf_counter() - start
+                    # Every request counted once, whichever worker served it or the
+                    # scrape; the first scrape counts itself, hence the 1.
+                    counted = requests_in_metrics(args.port) - before - 1
+                finally:
+                    proc.terminate()
+                    proc.wait()
+            rps = sent / elapsed
+            base = base or rps
+            print(f"{workers:>8}{sent:>10}{rps:>9.0f}{rps / base:>8.2f}x{counted:>16}")
+
+
+if __name__ == "__main__":
+    main()
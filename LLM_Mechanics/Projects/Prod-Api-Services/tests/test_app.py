@@ -1,12 +1,27 @@
+import os
+import subprocess
+import sys
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+import redis
 from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
 from app.main import app
+from app.cache import LocalLRU, token_key
+from llm_common import BudgetLedger, LocalBudgetStore
+from app.config import API_KEY, ENCODING_NAME
+from app.services import count_tokens
 
 client = TestClient(app)
+HEADERS = {"x-api-key": API_KEY}
 
 def test_estimate_basic():
     resp = client.post(
         "/estimate",
         json={"prompt": "Hello world", "max_completion_tokens": 256},
+        headers=HEADERS,
     )
     assert resp.status_code == 200
     data = resp.json()
@@ -16,4 +31,174 @@ def test_estimate_basic():
 def test_health():
     resp = client.get("/healthz")
     assert resp.status_code == 200
-    assert resp.json()["status"] == "ok"
\ No newline at end of file
+    assert resp.json()["status"] == "ok"
+
+def test_ready_after_warm_up():
+    # The module-level client never runs the lifespan, so nothing is warmed.
+    assert client.get("/readyz").status_code == 503
+    with TestClient(app) as warm_client:
+        for _ in range(200):
+            resp = warm_client.get("/readyz")
+            if resp.status_code == 200:
+                break
+            time.sleep(0.01)
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "ready"
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.round_trips = 0
+
+    def get(self, key):
+        self.round_trips += 1
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.round_trips += 1
+        self.data[key] = value
+
+    def mget(self, keys):
+        self.round_trips += 1
+        return [self.data.get(k) for k in keys]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def setex(self, key, ttl, value):
+        self.ops.append((key, value))
+
+    def execute(self):
+        self.redis.round_trips += 1
+        self.redis.data.update(self.ops)
+
+
+@pytest.fixture
+def fake_redis():
+    fake = FakeRedis()
+    with patch("app.cache.redis_client", fake), patch("app.cache.local_cache", LocalLRU(1 << 20)), \
+            patch("app.cache._redis_down_until", 0.0):
+        yield fake
+
+
+def test_estimate_batch_uses_two_round_trips(fake_redis):
+    items = [{"prompt": f"prompt number {i}", "max_completion_tokens": 256} for i in range(50)]
+    resp = client.post("/estimate/batch", json={"items": items}, headers=HEADERS)
+
+    assert resp.status_code == 200
+    data = resp.json()
+    assert len(data["results"]) == 50
+    assert data["results"][0]["prompt_tokens"] == count_tokens("prompt number 0")
+    assert data["total_prompt_tokens"] == sum(r["prompt_tokens"] for r in data["results"])
+    assert data["cache_hits"] == 0
+    # One MGET for the lookups and one pipelined SETEX for the misses.
+    assert fake_redis.round_trips == 2
+
+    again = client.post("/estimate/batch", json={"items": items[:10]}, headers=HEADERS)
+    assert again.json()["cache_hits"] == 10
+    # Served from the in-process tier without touching Redis.
+    assert fake_redis.round_trips == 2
+
+
+def test_token_cache_is_shared_across_users_and_completion_sizes(fake_redis):
+    prompt = "The same prompt " * 200
+    first = client.post("/estimate", json={"prompt": prompt, "max_completion_tokens": 16},
+                        headers={**HEADERS, "x-user-id": "alice"}).json()
+    second = client.post("/estimate", json={"prompt": prompt, "max_completion_tokens": 4096},
+                         headers={**HEADERS, "x-user-id": "bob"}).json()
+
+    assert first["prompt_tokens"] == second["prompt_tokens"]
+    assert second["estimated_max_cost_usd"] > first["estimated_max_cost_usd"]
+    assert len(fake_redis.data) == 1
+    (key,) = fake_redis.data
+    assert key.startswith(f"tok:{ENCODING_NAME}:") and len(key) < 100
+
+
+def test_estimate_degrades_to_local_cache_when_redis_is_down():
+    down = MagicMock()
+    down.mget.side_effect = redis.ConnectionError("connection refused")
+    down.pipeline.side_effect = redis.ConnectionError("connection refused")
+
+    with patch("app.cache.redis_client", down), patch("app.cache.local_cache", LocalLRU(1 << 20)), \
+            patch("app.cache._redis_down_until", 0.0):
+        first = client.post("/estimate", json={"prompt": "Hello world"}, headers=HEADERS)
+        second = client.post("/estimate", json={"prompt": "Hello world"}, headers=HEADERS)
+        # Backing off: the second request does not try Redis again.
+        assert down.mget.call_count == 1
+
+    assert first.status_code == 200 and second.status_code == 200
+    assert first.json()["prompt_tokens"] == second.json()["prompt_tokens"]
+
+
+def test_local_lru_evicts_by_size():
+    entry = LocalLRU.entry_size(token_key(ENCODING_NAME, "x"), 1)
+    lru = LocalLRU(max_bytes=entry * 3)
+    keys = [token_key(ENCODING_NAME, str(i)) for i in range(5)]
+    for i, key in enumerate(keys[:3]):
+        lru.set(key, i)
+    lru.get(keys[0])
+    lru.set(keys[3], 3)
+
+    assert lru.get(keys[1]) is None
+    assert lru.get(keys[0]) == 0
+    assert lru.bytes <= lru.max_bytes
+    assert lru.evictions == 1
+
+
+def test_request_metrics_recorded_once_per_request():
+    before = REGISTRY.get_sample_value("token_estimator_requests_total") or 0
+    client.post("/estimate", json={"prompt": "Hello world"}, headers=HEADERS)
+    unauthorized = client.post("/estimate", json={"prompt": "Hello world"}, headers={"x-api-key": "wrong"})
+
+    assert unauthorized.status_code == 401
+    assert unauthorized.headers["x-request-id"]
+    assert REGISTRY.get_sample_value("token_estimator_requests_total") == before + 2
+
+
+def test_budget_is_enforced_and_queryable():
+    headers = {**HEADERS, "x-user-id": "budget-test"}
+    ledger = BudgetLedger(LocalBudgetStore(), limit=0.001)
+
+    with patch("app.services.ledger", ledger), patch("app.main.ledger", ledger):
+        ok = client.post("/estimate", json={"prompt": "Hello", "max_completion_tokens": 256}, headers=headers)
+        over = client.post("/estimate", json={"prompt": "Hello", "max_completion_tokens": 1000}, headers=headers)
+        batch = client.post("/estimate/batch", json={"items": [{"prompt": "Hello"}] * 3}, headers=headers)
+        totals = client.get("/budget", headers=headers).json()
+
+    assert ok.status_code == 200
+    assert over.status_code == 402
+    assert batch.status_code == 402
+    assert totals["spent_usd"] == ok.json()["estimated_max_cost_usd"]
+    assert totals["remaining_usd"] == round(0.001 - totals["spent_usd"], 6)
+
+
+MULTIPROC_WORKER = """
+from fastapi.testclient import TestClient
+from app.main import app
+client = TestClient(app)
+for _ in range(2):
+    client.post("/estimate", json={"prompt": "Hello world"}, headers={"x-api-key": %r})
+print(client.get("/metrics").text)
+""" % API_KEY
+
+
+def test_cache_gauges_exported_in_multiprocess_mode(tmp_path):
+    service_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path), "REDIS_URL": ""}
+    out = subprocess.run([sys.executable, "-c", MULTIPROC_WORKER], cwd=service_dir, env=env,
+                         check=True, capture_output=True, text=True).stdout
+
+    samples = {}
+    for line in out.splitlines():
+        if line.startswith("token_estimator_token_cache_"):
+            name, value = line.rsplit(" ", 1)
+            samples[name.split("{")[0]] = float(value)
+    # One miss, then one hit.
+    assert samples["token_estimator_token_cache_hit_ratio"] == 0.5
+    assert samples["token_estimator_token_cache_local_bytes"] > 0
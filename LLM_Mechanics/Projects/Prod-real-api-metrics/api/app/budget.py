@@ -0,0 +1,22 @@
+# Filename: budget.py
+from llm_common import BudgetLedger, LocalBudgetStore, RedisBudgetStore
+from .config import (
+    BUDGET_BACKEND,
+    BUDGET_WINDOW_S,
+    BUDGET_FLUSH_INTERVAL_S,
+    REDIS_HOST,
+    REDIS_PORT,
+    USER_BUDGET_THRESHOLD,
+)
+
+def _store():
+    if BUDGET_BACKEND == "redis":
+        import redis
+        client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+        return RedisBudgetStore(client, window_s=BUDGET_WINDOW_S)
+    if BUDGET_BACKEND == "local":
+        return LocalBudgetStore(window_s=BUDGET_WINDOW_S)
+    raise ValueError(f"Unknown BUDGET_BACKEND: {BUDGET_BACKEND!r}")
+
+# Per-user spend, buffered here and flushed to the store in the background.
+ledger = BudgetLedger(_store(), limit=USER_BUDGET_THRESHOLD, flush_interval_s=BUDGET_FLUSH_INTERVAL_S)
@@ -1,7 +1,82 @@
-_cache = {}
+# Filename: cache.py
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from .config import CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_TTL_S
+from .metrics import CACHE_HITS, CACHE_MISSES, CACHE_EVICTIONS, CACHE_BYTES, CACHE_ENTRIES
+
+
+def _sizeof(key, value) -> int:
+    """Rough resident size of one entry: key, dict and its (flat) values."""
+    size = sys.getsizeof(key) + sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    return size
+
+
+class LRUCache:
+    """Thread-safe LRU with TTL, bounded by entry count and approximate bytes.
+
+    Get and set are O(1) amortised: an OrderedDict keeps recency order and
+    eviction pops from the cold end until both bounds hold. The size gauges
+    are set under the lock on every change; callback gauges are not exported
+    in multiprocess mode.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_s: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.bytes = 0
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                CACHE_HITS.inc()
+                return entry[0]
+            if entry is not None:
+                self._remove(key)
+                self._publish()
+        CACHE_MISSES.inc()
+        return None
+
+    def set(self, key, value):
+        size = _sizeof(key, value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + self.ttl_s, size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                CACHE_EVICTIONS.inc()
+            self._publish()
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self.bytes -= size
+
+    def _publish(self):
+        CACHE_BYTES.set(self.bytes)
+        CACHE_ENTRIES.set(len(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
+
+response_cache = LRUCache(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_TTL_S)
+
 
 def get_cache(key):
-    return _cache.get(key)
+    return response_cache.get(key)
 
 def set_cache(key, value):
-    _cache[key] = value
\ No newline at end of file
+    response_cache.set(key, value)
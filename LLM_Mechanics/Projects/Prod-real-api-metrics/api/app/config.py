@@ -2,6 +2,16 @@
 import os
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY", "your-api-key")
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+MODEL_NAME = os.getenv("MODEL_NAME", "openai/gpt-5.2")
+
+# Upstream calls: at most UPSTREAM_CONCURRENCY in flight per worker, each
+# bounded by UPSTREAM_TIMEOUT_S (retries included in UPSTREAM_MAX_RETRIES).
+UPSTREAM_CONCURRENCY = int(os.getenv("UPSTREAM_CONCURRENCY", 64))
+UPSTREAM_TIMEOUT_S = float(os.getenv("UPSTREAM_TIMEOUT_S", 60))
+UPSTREAM_CONNECT_TIMEOUT_S = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT_S", 5))
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", 2))
+UPSTREAM_POOLS = int(os.getenv("UPSTREAM_POOLS", 8))
 API_KEY = os.getenv("API_KEY", "dev-secret-key")
 
 ENCODING_NAME = "cl100k_base"
@@ -12,4 +22,19 @@ COMPLETION_RATE_PER_MILLION = 2.0
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 
-USER_BUDGET_THRESHOLD = 5.0  # USD per user
\ No newline at end of file
+# Response cache: bounded by entries and approximate bytes; entries expire after CACHE_TTL_S.
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 10000))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 64 * 1024 * 1024))
+CACHE_TTL_S = float(os.getenv("CACHE_TTL_S", 600))
+
+USER_BUDGET_THRESHOLD = float(os.getenv("USER_BUDGET_THRESHOLD", 5.0))  # USD per user
+
+# "redis" shares budget totals across workers and replicas; "local" keeps them in-process.
+BUDGET_BACKEND = os.getenv("BUDGET_BACKEND", "local")
+BUDGET_WINDOW_S = int(os.getenv("BUDGET_WINDOW_S", 30 * 86400))
+BUDGET_FLUSH_INTERVAL_S = float(os.getenv("BUDGET_FLUSH_INTERVAL_S", 0.25))
+# Conversation memory. "redis" shares history across workers; "local" caps it at
+# MEMORY_MAX_BYTES per process, evicting the least recently active users first.
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "local")
+MEMORY_MAX_BYTES = int(os.getenv("MEMORY_MAX_BYTES", 64 * 1024 * 1024))
+MEMORY_TTL_S = int(os.getenv("MEMORY_TTL_S", 86400))  # Redis: idle conversations expire
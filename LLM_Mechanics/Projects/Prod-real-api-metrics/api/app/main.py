@@ -1,11 +1,19 @@
 # File: api/app/main.py
 
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.responses import Response, FileResponse, JSONResponse
-from prometheus_client import generate_latest, Counter, Histogram
 import logging
 import os
-from .services import process_estimate
+import time
+from llm_common import BudgetExceededError, warm_up
+from llm_common.metrics import render_metrics
+from .budget import ledger
+from .config import API_KEY, ENCODING_NAME, MODEL_CONTEXT_LIMIT
+from .memory import memory
+from .services import ModelCallError, close_clients, count_tokens, get_clients, process_estimate
+from .metrics import REQUEST_COUNT, REQUEST_LATENCY
 from .middleware import APIKeyMiddleware, RequestContextMiddleware
 from .logging_config import setup_logging
 from fastapi.staticfiles import StaticFiles
@@ -13,60 +21,90 @@ from fastapi.staticfiles import StaticFiles
 setup_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Token Estimator Service", version="2.0.0")
-
-# Middleware
-app.add_middleware(RequestContextMiddleware)
-app.add_middleware(APIKeyMiddleware, exempt_paths=["/static", "/metrics"])
+async def _warm_up(app: FastAPI):
+    # Tokenizer and openai client off the event loop; /readyz is 503 until both are loaded.
+    start = time.perf_counter()
+    await asyncio.to_thread(warm_up, ENCODING_NAME)
+    await asyncio.to_thread(get_clients)
+    app.state.ready = True
+    logger.info({"event": "warm_up_done", "duration_ms": round((time.perf_counter() - start) * 1000, 2)})
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    ledger.start()
+    # In the background, so the port opens and /healthz answers straight away.
+    app.state.ready = False
+    warming = asyncio.create_task(_warm_up(app))
+    yield
+    warming.cancel()
+    await close_clients()
+    ledger.close()
+
+app = FastAPI(title="Token Estimator Service", version="2.0.0", lifespan=lifespan)
+
+# Middleware (the last one added runs first, so 401s are counted and timed too)
+app.add_middleware(
+    APIKeyMiddleware,
+    api_key=API_KEY,
+    exempt_paths=["/healthz", "/readyz"],
+    exempt_prefixes=["/static", "/metrics"],
+    detail="Invalid API key",
+)
+app.add_middleware(RequestContextMiddleware, request_count=REQUEST_COUNT, request_latency=REQUEST_LATENCY)
 
 # Static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# Prometheus metrics
-REQUEST_COUNT = Counter("request_count", "Total requests")
-REQUEST_LATENCY = Histogram("request_latency_seconds", "Request latency in seconds")
+@app.exception_handler(BudgetExceededError)
+async def budget_exceeded(request: Request, exc: BudgetExceededError):
+    return JSONResponse({"detail": str(exc)}, status_code=402)
 
-# In-memory conversation memory per user
-USER_MEMORY = {}
+@app.exception_handler(ModelCallError)
+async def model_call_failed(request: Request, exc: ModelCallError):
+    logger.error(f"Model call failed: {exc}")
+    return JSONResponse({"detail": "The model is unavailable, please try again."}, status_code=502)
 
 @app.get("/healthz")
 def health():
     return {"status": "ok"}
 
+@app.get("/readyz")
+def ready(request: Request):
+    if not getattr(request.app.state, "ready", False):
+        return JSONResponse({"status": "warming_up"}, status_code=503)
+    return {"status": "ready"}
+
 @app.get("/metrics")
 def metrics():
-    return Response(generate_latest(), media_type="text/plain")
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
 
 @app.get("/static/index.html")
 def get_html():
     return FileResponse(os.path.join(os.path.dirname(__file__), "../static/index.html"))
 
+def _with_history(user_id: str, prompt: str, max_completion: int) -> tuple:
+    """The prompt behind as much recent conversation as fits next to it and the
+    completion budget, and its tokens; history turns carry their counts already."""
+    prompt_tokens = count_tokens(prompt)
+    history, history_tokens = memory.window(user_id, MODEL_CONTEXT_LIMIT - max_completion - prompt_tokens)
+    return history + prompt, history_tokens + prompt_tokens
+
 @app.post("/estimate")
-def estimate(req: dict, request: Request):
+async def estimate(req: dict, request: Request):
     user_id = request.headers.get("x-user-id", "anonymous")
     prompt = req.get("prompt", "")
     max_completion = req.get("max_completion_tokens", 256)
 
-    # Append previous conversation memory
-    memory_prompt = ""
-    if user_id in USER_MEMORY:
-        memory_prompt = "\n".join(USER_MEMORY[user_id]) + "\n"
-
-    full_prompt = memory_prompt + prompt
-
-    import time
     start = time.perf_counter()
-    result = process_estimate(full_prompt, max_completion, user_id)
-    duration = time.perf_counter() - start
 
-    REQUEST_COUNT.inc()
-    REQUEST_LATENCY.observe(duration)
+    # Tokenizing and the memory store (Redis, possibly) block, so both run off the loop.
+    full_prompt, prompt_tokens = await asyncio.to_thread(_with_history, user_id, prompt, max_completion)
+    result = await process_estimate(full_prompt, max_completion, user_id, prompt_tokens=prompt_tokens)
+    duration = time.perf_counter() - start
 
     # Save new conversation in memory
-    if user_id not in USER_MEMORY:
-        USER_MEMORY[user_id] = []
-    USER_MEMORY[user_id].append(f"User: {prompt}")
-    USER_MEMORY[user_id].append(f"Bot: {result['model_response']}")
+    await asyncio.to_thread(memory.append, user_id, f"User: {prompt}", f"Bot: {result['model_response']}")
 
     logger.info({
         "user_id": user_id,
@@ -82,8 +120,14 @@ def estimate(req: dict, request: Request):
     return {"response": result["model_response"].replace("\n", " ")}
 
 
+@app.get("/budget")
+def budget(request: Request):
+    user_id = request.headers.get("x-user-id", "anonymous")
+    return ledger.totals(user_id)
+
+
 @app.post("/clear")
 def clear_memory(request: Request):
     user_id = request.headers.get("x-user-id", "anonymous")
-    USER_MEMORY[user_id] = []
+    memory.clear(user_id)
     return JSONResponse({"status": "memory_cleared"})
\ No newline at end of file
@@ -0,0 +1,182 @@
+# Filename: memory.py
+"""Per-user conversation history with the token count of every turn stored next to it.
+
+Turns are kept as (tokens, line) where `line` ends with a newline. Each line
+is encoded once when it is added, so the size of any suffix of the history
+is a sum, not a re-encode.
+"""
+import threading
+from collections import OrderedDict, deque
+
+from .config import MEMORY_BACKEND, MEMORY_MAX_BYTES, MEMORY_TTL_S, MODEL_CONTEXT_LIMIT, REDIS_HOST, REDIS_PORT
+from .services import count_tokens
+
+# Approximate per-turn overhead of the tuple, int and deque slot.
+TURN_OVERHEAD = 120
+
+
+class LocalMemoryStore:
+    """In-process store capped at `max_bytes`; the least recently active users go first."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._users = OrderedDict()  # user_id -> [deque of turns, tokens, bytes]
+        self._lock = threading.Lock()
+
+    def load(self, user_id: str) -> list:
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return []
+            self._users.move_to_end(user_id)
+            return list(entry[0])
+
+    def append(self, user_id: str, turns: list, max_tokens: int):
+        with self._lock:
+            entry = self._users.setdefault(user_id, [deque(), 0, 0])
+            self._users.move_to_end(user_id)
+            for tokens, line in turns:
+                entry[0].append((tokens, line))
+                entry[1] += tokens
+                entry[2] += len(line) + TURN_OVERHEAD
+                self.bytes += len(line) + TURN_OVERHEAD
+            # Older turns can never fit in a prompt again.
+            while entry[1] > max_tokens and entry[0]:
+                tokens, line = entry[0].popleft()
+                entry[1] -= tokens
+                entry[2] -= len(line) + TURN_OVERHEAD
+                self.bytes -= len(line) + TURN_OVERHEAD
+            while self.bytes > self.max_bytes and len(self._users) > 1:
+                _, (_, _, size) = self._users.popitem(last=False)
+                self.bytes -= size
+                self.evictions += 1
+
+    def clear(self, user_id: str):
+        with self._lock:
+            entry = self._users.pop(user_id, None)
+            if entry is not None:
+                self.bytes -= entry[2]
+
+
+class RedisMemoryStore:
+    """One Redis list per user of "tokens:line" entries, shared by all workers.
+
+    The list's token total is kept next to it, so an append reads only the
+    few oldest entries it has to drop. Appends are WATCH/MULTI transactions
+    and retry when another worker appended to the same user first. Idle
+    users expire after `ttl_s`; a global cap is left to Redis' maxmemory
+    with an LRU eviction policy.
+    """
+
+    # Oldest entries read per round trip while looking for turns to drop.
+    TRIM_CHUNK = 8
+
+    def __init__(self, client, prefix: str = "memory:", ttl_s: int = 86400):
+        self.client = client
+        self.prefix = prefix
+        self.ttl_s = ttl_s
+
+    def _keys(self, user_id: str) -> tuple:
+        key = self.prefix + user_id
+        return key, key + ":tokens"
+
+    @staticmethod
+    def _tokens(entry: str) -> int:
+        return int(entry.split(":", 1)[0])
+
+    def load(self, user_id: str) -> list:
+        turns = []
+        for entry in self.client.lrange(self._keys(user_id)[0], 0, -1):
+            tokens, line = entry.split(":", 1)
+            turns.append((int(tokens), line))
+        return turns
+
+    def append(self, user_id: str, turns: list, max_tokens: int):
+        from redis import WatchError
+
+        key, total_key = self._keys(user_id)
+        entries = [f"{tokens}:{line}" for tokens, line in turns]
+        with self.client.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    pipe.watch(key, total_key)
+                    length = pipe.llen(key)
+                    total = pipe.get(total_key) if length else 0
+                    if total is None:
+                        # Written before totals were kept, or the total was evicted.
+                        total = sum(self._tokens(entry) for entry in pipe.lrange(key, 0, -1))
+                    total = int(total) + sum(tokens for tokens, _ in turns)
+                    drop, total = self._drop(pipe, key, length, entries, total, max_tokens)
+                    pipe.multi()
+                    pipe.rpush(key, *entries)
+                    if drop:
+                        pipe.ltrim(key, drop, -1)
+                    pipe.set(total_key, total, ex=self.ttl_s)
+                    pipe.expire(key, self.ttl_s)
+                    pipe.execute()
+                    return
+                except WatchError:
+                    continue
+
+    def _drop(self, pipe, key: str, length: int, entries: list, total: int, max_tokens: int) -> tuple:
+        """How many of the oldest turns can never fit again, and the total without them."""
+        drop = 0
+        while total > max_tokens and drop < length:
+            chunk = pipe.lrange(key, drop, drop + self.TRIM_CHUNK - 1)
+            if not chunk:
+                break
+            for entry in chunk:
+                if total <= max_tokens:
+                    break
+                total -= self._tokens(entry)
+                drop += 1
+        # The new turns themselves, if they alone exceed the limit.
+        for entry in entries:
+            if total <= max_tokens:
+                break
+            total -= self._tokens(entry)
+            drop += 1
+        return drop, total
+
+    def clear(self, user_id: str):
+        self.client.delete(*self._keys(user_id))
+
+
+class ConversationMemory:
+    def __init__(self, store, count_tokens, max_tokens: int):
+        self.store = store
+        self.count_tokens = count_tokens
+        self.max_tokens = max_tokens
+
+    def window(self, user_id: str, budget: int) -> tuple:
+        """The newest turns whose tokens fit in `budget`, as (history text, tokens)."""
+        lines = []
+        total = 0
+        for tokens, line in reversed(self.store.load(user_id)):
+            if total + tokens > budget:
+                break
+            lines.append(line)
+            total += tokens
+        return "".join(reversed(lines)), total
+
+    def append(self, user_id: str, *lines: str):
+        turns = [(self.count_tokens(line + "\n"), line + "\n") for line in lines]
+        self.store.append(user_id, turns, self.max_tokens)
+
+    def clear(self, user_id: str):
+        self.store.clear(user_id)
+
+
+def _store():
+    if MEMORY_BACKEND == "redis":
+        import redis
+        client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+        return RedisMemoryStore(client, ttl_s=MEMORY_TTL_S)
+    if MEMORY_BACKEND == "local":
+        return LocalMemoryStore(MEMORY_MAX_BYTES)
+    raise ValueError(f"Unknown MEMORY_BACKEND: {MEMORY_BACKEND!r}")
+
+
+memory = ConversationMemory(_store(), count_tokens, MODEL_CONTEXT_LIMIT)
@@ -1,5 +1,13 @@
 # Filename: metrics.py
-from prometheus_client import Counter, Histogram
+# Every metric of the service is created here, once. Gauges are summed over
+# live workers when PROMETHEUS_MULTIPROC_DIR is set (see llm_common.metrics).
+from prometheus_client import Counter, Gauge, Histogram
 
 REQUEST_COUNT = Counter("request_count", "Number of requests")
-REQUEST_LATENCY = Histogram("request_latency_seconds", "Request latency in seconds")
\ No newline at end of file
+REQUEST_LATENCY = Histogram("request_latency_seconds", "Request latency in seconds")
+
+CACHE_HITS = Counter("response_cache_hits", "Response cache hits")
+CACHE_MISSES = Counter("response_cache_misses", "Response cache misses (including expired entries)")
+CACHE_EVICTIONS = Counter("response_cache_evictions", "Entries evicted to stay within the size bounds")
+CACHE_BYTES = Gauge("response_cache_bytes", "Approximate memory held by the response cache", multiprocess_mode="livesum")
+CACHE_ENTRIES = Gauge("response_cache_entries", "Entries in the response cache", multiprocess_mode="livesum")
@@ -1,23 +1,27 @@
-from functools import lru_cache
+import asyncio
+import hashlib
+import itertools
+import threading
+from llm_common import get_tokenizer
 from .config import (
     ENCODING_NAME,
     MODEL_CONTEXT_LIMIT,
     PROMPT_RATE_PER_MILLION,
     COMPLETION_RATE_PER_MILLION,
-    OPENROUTER_API_KEY
+    OPENROUTER_API_KEY,
+    OPENROUTER_BASE_URL,
+    MODEL_NAME,
+    UPSTREAM_CONCURRENCY,
+    UPSTREAM_TIMEOUT_S,
+    UPSTREAM_CONNECT_TIMEOUT_S,
+    UPSTREAM_MAX_RETRIES,
+    UPSTREAM_POOLS,
 )
 from .cache import get_cache, set_cache
-from openai import OpenAI
-import tiktoken
-
-USER_BUDGET = {}
-
-@lru_cache(maxsize=1)
-def get_encoding():
-    return tiktoken.get_encoding(ENCODING_NAME)
+from .budget import ledger
 
 def count_tokens(text: str) -> int:
-    return len(get_encoding().encode(text))
+    return get_tokenizer(ENCODING_NAME).count_tokens(text)
 
 def estimate_cost(prompt_tokens: int, completion_tokens: int) -> float:
     return round(
@@ -26,34 +30,104 @@ def estimate_cost(prompt_tokens: int, completion_tokens: int) -> float:
         6
     )
 
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=OPENROUTER_API_KEY
-)
+# httpx scans every connection in a pool on each request, so per-request CPU
+# grows with concurrency; spreading calls over a few smaller pools keeps it flat.
+_clients = []
+_next_client = None
+_clients_lock = threading.Lock()
+
+def get_clients() -> list:
+    """The upstream clients, created on first use.
+
+    The openai import alone takes about half a second, so it is kept off the
+    import path; the lifespan warm-up calls this before /readyz reports ready.
+    """
+    global _next_client
+    with _clients_lock:
+        if not _clients:
+            from openai import AsyncOpenAI, Timeout
+
+            _clients.extend([
+                AsyncOpenAI(
+                    base_url=OPENROUTER_BASE_URL,
+                    api_key=OPENROUTER_API_KEY,
+                    timeout=Timeout(UPSTREAM_TIMEOUT_S, connect=UPSTREAM_CONNECT_TIMEOUT_S),
+                    max_retries=UPSTREAM_MAX_RETRIES,
+                )
+                for _ in range(UPSTREAM_POOLS)
+            ])
+            _next_client = itertools.cycle(_clients)
+    return _clients
+
+async def close_clients():
+    global _next_client
+    for client in _clients:
+        await client.close()
+    _clients.clear()
+    _next_client = None
 
-def get_model_response(prompt: str, max_tokens: int) -> str:
+# Caps in-flight upstream calls per worker; excess requests wait here rather
+# than piling onto the provider.
+_upstream_slots = asyncio.Semaphore(UPSTREAM_CONCURRENCY)
+
+class ModelCallError(Exception):
+    """The upstream model call failed; never cached or stored as a reply."""
+
+async def get_model_response(prompt: str, max_tokens: int) -> tuple:
+    """Return (text, usage); usage is None when the provider did not report it.
+    Raises ModelCallError if the call fails."""
     try:
-        completion = client.chat.completions.create(
-            model="openai/gpt-5.2",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=max_tokens
-        )
-        return completion.choices[0].message.content
+        async with _upstream_slots:
+            if _next_client is None:
+                get_clients()
+            completion = await next(_next_client).chat.completions.create(
+                model=MODEL_NAME,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens
+            )
+        return completion.choices[0].message.content, completion.usage
     except Exception as e:
-        return f"[ERROR CALLING MODEL]: {str(e)}"
+        raise ModelCallError(str(e)) from e
 
-def process_estimate(prompt: str, max_completion_tokens: int, user_id: str):
-    cache_key = f"{user_id}:{prompt}:{max_completion_tokens}"
+async def process_estimate(prompt: str, max_completion_tokens: int, user_id: str, prompt_tokens: int = None):
+    """
+    Call the model and account for it. Token counts come from the provider's
+    `usage`; tiktoken is only used for the preflight estimate that reserves
+    budget (skipped when the caller passes `prompt_tokens`) and as a fallback
+    when usage is missing.
+    """
+    cache_key = hashlib.sha256(f"{user_id}\0{max_completion_tokens}\0{prompt}".encode("utf-8")).hexdigest()
     cached = get_cache(cache_key)
     if cached:
         return cached
 
-    model_response = get_model_response(prompt, max_completion_tokens)
-    prompt_tokens = count_tokens(prompt)
-    completion_tokens = count_tokens(model_response)
+    if prompt_tokens is not None:
+        preflight_tokens = prompt_tokens
+    else:
+        preflight_tokens = await asyncio.to_thread(count_tokens, prompt)
+    # Reserve the worst case before calling the model (raises BudgetExceededError),
+    # then settle to the actual cost once the completion is known. The first
+    # charge for a user reads the budget store, so it runs off the loop too.
+    reserved = estimate_cost(preflight_tokens, max_completion_tokens)
+    charge = asyncio.ensure_future(asyncio.to_thread(ledger.charge, user_id, reserved))
+    try:
+        await asyncio.shield(charge)
+        model_response, usage = await get_model_response(prompt, max_completion_tokens)
+    except BaseException:
+        # Refund once the charge has gone through, even if this request was cancelled first.
+        charge.add_done_callback(
+            lambda f: f.cancelled() or f.exception() is not None or ledger.adjust(user_id, -reserved)
+        )
+        raise
+
+    if usage is not None:
+        prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+    else:
+        prompt_tokens = preflight_tokens
+        completion_tokens = await asyncio.to_thread(count_tokens, model_response)
     fits_context = (prompt_tokens + completion_tokens) <= MODEL_CONTEXT_LIMIT
     total_cost = estimate_cost(prompt_tokens, completion_tokens)
-    USER_BUDGET[user_id] = USER_BUDGET.get(user_id, 0) + total_cost
+    ledger.adjust(user_id, total_cost - reserved)
 
     result = {
         "prompt_tokens": prompt_tokens,
@@ -64,4 +138,4 @@ def process_estimate(prompt: str, max_completion_tokens: int, user_id: str):
     }
 
     set_cache(cache_key, result)
-    return result
\ No newline at end of file
+    return result
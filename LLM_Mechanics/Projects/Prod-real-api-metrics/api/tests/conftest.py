@@ -0,0 +1,57 @@
+import os
+import sys
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "benchmarks"))
+# In-process stores, whatever the image defaults to; set before app.config is imported.
+os.environ["BUDGET_BACKEND"] = "local"
+os.environ["MEMORY_BACKEND"] = "local"
+
+from stub_openai import make_server
+
+
+@contextmanager
+def _serving(**kwargs):
+    server = make_server(delay_s=0, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+
+
+@pytest.fixture(scope="session")
+def stub_openai():
+    """URL of a local chat completions stub that answers "stub response" with a usage block."""
+    with _serving() as url:
+        yield url
+
+
+@pytest.fixture(scope="session")
+def stub_openai_without_usage():
+    with _serving(usage=False) as url:
+        yield url
+
+
+def _upstream(monkeypatch, url):
+    # Fresh clients per test: each test runs its own event loop.
+    from app import services
+
+    monkeypatch.setattr(services, "OPENROUTER_BASE_URL", url)
+    monkeypatch.setattr(services, "_clients", [])
+    monkeypatch.setattr(services, "_next_client", None)
+    return services
+
+
+@pytest.fixture
+def services(stub_openai, monkeypatch):
+    """app.services calling the stub."""
+    return _upstream(monkeypatch, stub_openai)
+
+
+@pytest.fixture
+def services_without_usage(stub_openai_without_usage, monkeypatch):
+    return _upstream(monkeypatch, stub_openai_without_usage)
@@ -0,0 +1,42 @@
+import time
+
+from app.cache import LRUCache, _sizeof
+
+
+def test_entry_bound_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2, max_bytes=1 << 20, ttl_s=60)
+    cache.set("a", {"n": 1})
+    cache.set("b", {"n": 2})
+    assert cache.get("a") == {"n": 1}
+    cache.set("c", {"n": 3})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"n": 1} and cache.get("c") == {"n": 3}
+    assert len(cache) == 2
+
+
+def test_byte_bound_evicts_and_tracks_size():
+    value = {"model_response": "x" * 1000}
+    size = _sizeof("k0", value)
+    cache = LRUCache(max_entries=100, max_bytes=3 * size, ttl_s=60)
+    for i in range(4):
+        cache.set(f"k{i}", value)
+
+    assert cache.get("k0") is None
+    assert len(cache) == 3 and cache.bytes == 3 * size
+
+    # Replacing an entry does not count it twice; one bigger than the cache is not stored.
+    cache.set("k3", value)
+    assert cache.bytes == 3 * size
+    cache.set("huge", {"model_response": "x" * (4 * size)})
+    assert cache.get("huge") is None and len(cache) == 3
+
+
+def test_entries_expire_after_ttl():
+    cache = LRUCache(max_entries=10, max_bytes=1 << 20, ttl_s=0.05)
+    cache.set("a", {"n": 1})
+    assert cache.get("a") == {"n": 1}
+    time.sleep(0.06)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0 and cache.bytes == 0
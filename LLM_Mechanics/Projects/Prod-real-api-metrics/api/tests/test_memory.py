@@ -0,0 +1,115 @@
+from llm_common.testing import FakeRedis
+
+from app.memory import TURN_OVERHEAD, ConversationMemory, LocalMemoryStore, RedisMemoryStore
+
+
+def words(text: str) -> int:
+    return len(text.split())
+
+
+def test_window_takes_the_newest_turns_that_fit():
+    memory = ConversationMemory(LocalMemoryStore(1 << 20), words, max_tokens=100)
+    memory.append("alice", "User: one two", "Bot: three four five")
+    memory.append("alice", "User: six")
+
+    assert memory.window("alice", 100) == ("User: one two\nBot: three four five\nUser: six\n", 9)
+    # The newest turn plus the one before it: 6 tokens; the oldest does not fit too.
+    assert memory.window("alice", 8) == ("Bot: three four five\nUser: six\n", 6)
+    assert memory.window("alice", 1) == ("", 0)
+    assert memory.window("nobody", 100) == ("", 0)
+
+
+def test_local_store_trims_turns_that_can_never_fit():
+    store = LocalMemoryStore(1 << 20)
+    memory = ConversationMemory(store, words, max_tokens=5)
+    memory.append("alice", "User: a b", "Bot: c d")
+    memory.append("alice", "User: e")
+
+    assert [line for _, line in store.load("alice")] == ["Bot: c d\n", "User: e\n"]
+    assert store.bytes == len("Bot: c d\n") + len("User: e\n") + 2 * TURN_OVERHEAD
+
+
+def test_local_store_evicts_least_recently_active_users_by_bytes():
+    line = "x" * 100 + "\n"
+    size = len(line) + TURN_OVERHEAD
+    store = LocalMemoryStore(max_bytes=3 * size)
+    for user in ("alice", "bob", "carol"):
+        store.append(user, [(1, line)], max_tokens=100)
+    store.load("alice")
+    store.append("dave", [(1, line)], max_tokens=100)
+
+    assert store.load("bob") == []
+    assert store.load("alice") == [(1, line)]
+    assert store.bytes == 3 * size and store.evictions == 1
+    store.clear("alice")
+    assert store.bytes == 2 * size
+
+
+def test_redis_store_keeps_history_within_the_token_limit():
+    redis = FakeRedis()
+    store = RedisMemoryStore(redis, ttl_s=60)
+    memory = ConversationMemory(store, words, max_tokens=5)
+    memory.append("alice", "User: a b", "Bot: c d")
+    memory.append("alice", "User: e")
+
+    assert store.load("alice") == [(3, "Bot: c d\n"), (2, "User: e\n")]
+    assert redis.get("memory:alice:tokens") == "5"
+    assert "memory:alice" in redis.expires and "memory:alice:tokens" in redis.expires
+
+    # Turns too big on their own are dropped as well.
+    memory.append("alice", "User: " + "word " * 10)
+    assert store.load("alice") == [] and redis.get("memory:alice:tokens") == "0"
+
+    memory.append("alice", "User: f")
+    memory.clear("alice")
+    assert store.load("alice") == [] and redis.get("memory:alice:tokens") is None
+
+
+def test_redis_append_reads_only_the_turns_it_drops():
+    redis = FakeRedis()
+    store = RedisMemoryStore(redis)
+    for i in range(500):
+        store.append("alice", [(1, f"turn {i}\n")], max_tokens=1000)
+    reads = []
+    lrange = redis.lrange
+    redis.lrange = lambda key, start, end: reads.append((start, end)) or lrange(key, start, end)
+
+    store.append("alice", [(1, "one more\n")], max_tokens=1000)
+    assert reads == []
+    store.append("alice", [(2, "two more\n")], max_tokens=500)
+
+    assert reads == [(0, 7)]
+    assert len(store.load("alice")) == 499
+    assert store.load("alice")[0] == (1, "turn 3\n")
+
+
+def test_redis_store_recovers_totals_for_lists_written_without_them():
+    redis = FakeRedis()
+    redis.rpush("memory:alice", "2:User: a\n", "2:Bot: b\n")
+    store = RedisMemoryStore(redis)
+
+    store.append("alice", [(2, "User: c\n")], max_tokens=4)
+    assert store.load("alice") == [(2, "Bot: b\n"), (2, "User: c\n")]
+    assert redis.get("memory:alice:tokens") == "4"
+
+
+def test_concurrent_redis_appends_do_not_lose_turns():
+    redis = FakeRedis()
+    store = RedisMemoryStore(redis)
+    other_worker = RedisMemoryStore(redis)
+    llen = redis.llen
+    raced = []
+
+    def racing_llen(key):
+        # Another worker appends between this worker's WATCH and MULTI, once.
+        if not raced:
+            raced.append(key)
+            other_worker.append("alice", [(1, "User: from the other worker\n")], max_tokens=100)
+        return llen(key)
+
+    redis.llen = racing_llen
+    store.append("alice", [(1, "User: from this worker\n")], max_tokens=100)
+
+    assert raced == ["memory:alice"]
+    assert store.load("alice") == [(1, "User: from the other worker\n"), (1, "User: from this worker\n")]
+    assert redis.get("memory:alice:tokens") == "2"
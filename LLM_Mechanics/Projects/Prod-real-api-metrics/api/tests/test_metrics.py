@@ -0,0 +1,28 @@
+import os
+import subprocess
+import sys
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+WORKER = """
+from fastapi.testclient import TestClient
+from app.main import app
+with TestClient(app) as client:
+    client.post("/estimate", json={"prompt": "Hello"}, headers={"x-api-key": "dev-secret-key"})
+    print(client.get("/metrics").text)
+"""
+
+
+def test_cache_gauges_exported_in_multiprocess_mode(tmp_path, stub_openai):
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path), "OPENROUTER_BASE_URL": stub_openai,
+           "API_KEY": "dev-secret-key", "BUDGET_BACKEND": "local", "MEMORY_BACKEND": "local"}
+    out = subprocess.run([sys.executable, "-c", WORKER], cwd=API_DIR, env=env,
+                         check=True, capture_output=True, text=True).stdout
+
+    samples = {}
+    for line in out.splitlines():
+        if line.startswith("response_cache_"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    assert samples["response_cache_entries"] == 1
+    assert samples["response_cache_bytes"] > 0
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from llm_common import BudgetLedger, LocalBudgetStore
+
+
+def _estimate(services, prompt, user_id="alice", **kwargs):
+    async def run():
+        try:
+            return await services.process_estimate(prompt, 64, user_id, **kwargs)
+        finally:
+            await services.close_clients()
+
+    return asyncio.run(run())
+
+
+def test_token_counts_come_from_provider_usage(services, monkeypatch):
+    ledger = BudgetLedger(LocalBudgetStore(), limit=1.0)
+    monkeypatch.setattr(services, "ledger", ledger)
+
+    result = _estimate(services, "Count these tokens with the tokenizer, please.")
+
+    # The stub reports 12 prompt and 2 completion tokens, whatever the text.
+    assert result["model_response"] == "stub response"
+    assert (result["prompt_tokens"], result["completion_tokens"]) == (12, 2)
+    assert result["estimated_max_cost_usd"] == services.estimate_cost(12, 2)
+    assert ledger.totals("alice")["spent_usd"] == services.estimate_cost(12, 2)
+
+
+def test_tokenizer_is_the_fallback_without_usage(services_without_usage, monkeypatch):
+    services = services_without_usage
+    monkeypatch.setattr(services, "ledger", BudgetLedger(LocalBudgetStore(), limit=1.0))
+    prompt = "Count these tokens with the tokenizer, please."
+
+    result = _estimate(services, prompt, user_id="bob")
+    assert result["prompt_tokens"] == services.count_tokens(prompt)
+    assert result["completion_tokens"] == services.count_tokens("stub response")
+
+    # A preflight count from the caller (prompt plus history) is used as is.
+    result = _estimate(services, prompt, user_id="carol", prompt_tokens=1000)
+    assert result["prompt_tokens"] == 1000
+
+
+def test_estimate_endpoint_keeps_conversation(services):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.memory import memory
+
+    headers = {"x-api-key": "dev-secret-key", "x-user-id": "dave"}
+    with TestClient(app) as client:
+        first = client.post("/estimate", json={"prompt": "My name is Dave"}, headers=headers)
+        second = client.post("/estimate", json={"prompt": "What is my name?"}, headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert second.json()["response"] == "stub response"
+    history, tokens = memory.window("dave", 10_000)
+    assert history.startswith("User: My name is Dave\nBot: stub response\nUser: What is my name?\n")
+    assert tokens > 0
+    memory.clear("dave")
+
+
+def test_failed_model_call_is_refunded_and_not_cached(services, monkeypatch):
+    ledger = BudgetLedger(LocalBudgetStore(), limit=1.0)
+    monkeypatch.setattr(services, "ledger", ledger)
+    get_model_response = services.get_model_response
+    calls = []
+
+    async def flaky(prompt, max_tokens):
+        calls.append(prompt)
+        if len(calls) == 1:
+            raise services.ModelCallError("upstream 503")
+        return await get_model_response(prompt, max_tokens)
+
+    monkeypatch.setattr(services, "get_model_response", flaky)
+    with pytest.raises(services.ModelCallError):
+        _estimate(services, "Retry me", user_id="erin")
+    assert ledger.totals("erin")["spent_usd"] == 0
+
+    # The same request goes to the model again rather than to a cached failure.
+    result = _estimate(services, "Retry me", user_id="erin")
+    assert len(calls) == 2
+    assert result["model_response"] == "stub response"
+    assert ledger.totals("erin")["spent_usd"] == services.estimate_cost(12, 2)
+
+
+def test_failed_model_call_returns_502_and_leaves_memory_alone(services, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.memory import memory
+
+    async def down(prompt, max_tokens):
+        raise services.ModelCallError("upstream 503")
+
+    monkeypatch.setattr(services, "get_model_response", down)
+    with TestClient(app) as client:
+        resp = client.post("/estimate", json={"prompt": "Hello"}, headers={"x-api-key": "dev-secret-key", "x-user-id": "frank"})
+
+    assert resp.status_code == 502
+    assert memory.window("frank", 10_000) == ("", 0)
@@ -0,0 +1,93 @@
+"""Time cold starts of the FastAPI services: process spawn to first /healthz, /readyz and real request.
+
+Starts the stub chat completions API in-process, then each service under
+uvicorn `--runs` times, polling every few milliseconds. Endpoints a service
+does not have (404) count as passed, so older revisions can be compared.
+
+    TIKTOKEN_CACHE_DIR=/opt/tiktoken_cache python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+
+from load_test import HEADERS
+from stub_openai import make_server
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+POLL_S = 0.005
+
+# name: (working directory, app, extra PYTHONPATH, first real request)
+SERVICES = {
+    "prod-real-api-metrics": (
+        os.path.join(HERE, "..", "api"), "app.main:app", None,
+        ("/estimate", {}, {"prompt": "Hello", "max_completion_tokens": 16}),
+    ),
+    "prod-api-services": (
+        os.path.join(HERE, "..", "..", "Prod-Api-Services"), "app.main:app", None,
+        ("/estimate", {}, {"prompt": "Hello", "max_completion_tokens": 16}),
+    ),
+    "gen-controls": (
+        os.path.join(HERE, "..", "..", "..", "..", "Generation_Controls"), "api.app:app", "src",
+        ("/generate", {"prompt": "Hello"}, {"temperature": 0.1}),
+    ),
+}
+
+
+def _wait_for(client, path, ok=(200,)):
+    while True:
+        try:
+            if client.get(path, headers=HEADERS).status_code in ok:
+                return time.perf_counter()
+        except httpx.TransportError:
+            pass
+        time.sleep(POLL_S)
+
+
+def cold_start(service, port, stub_url):
+    cwd, app, pythonpath, (path, params, payload) = SERVICES[service]
+    env = {**os.environ, "OPENROUTER_BASE_URL": stub_url, "OPENROUTER_API_KEY": "stub", "USER_BUDGET_THRESHOLD": "1e9"}
+    if pythonpath:
+        env["PYTHONPATH"] = os.path.join(cwd, pythonpath)
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+        cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+            live = _wait_for(client, "/healthz", ok=(200, 404))
+            ready = _wait_for(client, "/readyz", ok=(200, 404))
+            client.post(path, params=params, json=payload, headers=HEADERS).raise_for_status()
+            first = time.perf_counter()
+    finally:
+        proc.terminate()
+        proc.wait()
+    return live - start, ready - start, first - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--services", default=",".join(SERVICES), help="Comma-separated subset of " + ",".join(SERVICES))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8011)
+    args = parser.parse_args()
+
+    stub = make_server(delay_s=0)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    stub_url = f"http://127.0.0.1:{stub.server_address[1]}"
+
+    print(f"{'median of ' + str(args.runs) + ' runs, s':<26}{'live':>8}{'ready':>8}{'first':>8}")
+    for service in args.services.split(","):
+        runs = [cold_start(service, args.port, stub_url) for _ in range(args.runs)]
+        print(f"{service:<26}" + "".join(f"{statistics.median(values):>8.3f}" for values in zip(*runs)))
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
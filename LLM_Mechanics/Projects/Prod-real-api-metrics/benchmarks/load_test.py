@@ -0,0 +1,147 @@
+"""Load-test /estimate against the stub chat completions API.
+
+Starts the stub in-process and the service under uvicorn, then keeps
+`--concurrency` requests in flight until `--requests` have completed.
+
+    python benchmarks/load_test.py --requests 2000 --concurrency 200 --delay-s 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+
+from stub_openai import make_server
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api")
+HEADERS = {"x-api-key": "dev-secret-key"}
+
+
+def start_service(port, stub_url, env_overrides):
+    env = {
+        **os.environ,
+        "OPENROUTER_BASE_URL": stub_url,
+        "OPENROUTER_API_KEY": "stub",
+        "USER_BUDGET_THRESHOLD": "1e9",
+        **env_overrides,
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=API_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=1)
+            return proc
+        except httpx.TransportError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("service did not start")
+
+
+class _Connection:
+    """One keep-alive HTTP/1.1 connection. httpx's pool costs more CPU per
+    request than the service under test at high concurrency, so the load
+    generator speaks the protocol directly."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def post_json(self, path, payload, headers):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode()
+        head = "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+        self.writer.write(
+            f"POST {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n{head}\r\n".encode() + body
+        )
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed")
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        await self.reader.readexactly(length)
+        return int(status_line.split()[1])
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+async def run(port, total, concurrency):
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        conn = _Connection("127.0.0.1", port)
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                status = await conn.post_json(
+                    "/estimate", {"prompt": f"load test {i}", "max_completion_tokens": 32},
+                    {**HEADERS, "x-user-id": f"load-{i}"},
+                )
+            except (OSError, asyncio.IncompleteReadError):
+                conn.close()
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            errors += status != 200
+        conn.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "rps": round(total / wall, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--delay-s", type=float, default=0.2, help="stub model latency")
+    parser.add_argument("--upstream-concurrency", type=int, default=256)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    stub = make_server(delay_s=args.delay_s)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    stub_url = f"http://127.0.0.1:{stub.server_address[1]}"
+
+    proc = start_service(args.port, stub_url, {"UPSTREAM_CONCURRENCY": str(args.upstream_concurrency)})
+    try:
+        result = asyncio.run(run(args.port, args.requests, args.concurrency))
+    finally:
+        proc.terminate()
+        proc.wait()
+        stub.shutdown()
+    print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Local stand-in for an OpenAI-compatible chat completions endpoint.
+
+Answers every POST after `delay_s` with a fixed completion and a `usage`
+block (left out with `usage=False`, as some providers do), so load tests
+measure the service rather than a model.
+
+    python benchmarks/stub_openai.py --port 8900 --delay-s 0.2
+"""
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def completion(model, usage=True):
+    body = {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": "stub response"},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 12, "completion_tokens": 2, "total_tokens": 14},
+    }
+    if not usage:
+        del body["usage"]
+    return body
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        time.sleep(self.server.delay_s)
+        body = json.dumps(completion(payload.get("model", "stub"), self.server.usage)).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _Server(ThreadingHTTPServer):
+    # The default backlog of 5 resets connections under a burst of clients.
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+def make_server(port=0, delay_s=0.2, usage=True):
+    server = _Server(("127.0.0.1", port), _Handler)
+    server.delay_s = delay_s
+    server.usage = usage
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--delay-s", type=float, default=0.2)
+    args = parser.parse_args()
+    make_server(args.port, args.delay_s).serve_forever()
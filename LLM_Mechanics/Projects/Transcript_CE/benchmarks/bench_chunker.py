@@ -0,0 +1,71 @@
+"""Peak memory of chunking a transcript file: whole-file vs streaming.
+
+Each run happens in a fresh child process that reports its peak RSS, so the
+numbers include tiktoken's native buffers as well as Python objects.
+
+    python benchmarks/bench_chunker.py --sizes-mb 1 16 128
+"""
+import argparse
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+SPEAKERS = ["Alice", "Bob", "Chen", "Dana"]
+WORDS = "we should ship the roadmap review before friday and check the budget numbers for the new api".split()
+CHUNK_TOKENS = 2744
+
+
+def write_transcript(path: str, size_bytes: int):
+    rng = random.Random(0)
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while written < size_bytes:
+            line = f"{rng.choice(SPEAKERS)}: " + " ".join(rng.choices(WORDS, k=rng.randint(5, 40))) + ".\n"
+            f.write(line)
+            written += len(line)
+
+
+def child(mode: str, path: str):
+    from utils import get_tokenizer, iter_transcript_chunks, load_transcript
+
+    tokenizer = get_tokenizer()
+    start = time.perf_counter()
+    if mode == "whole":
+        # The previous approach: full text, full token list, every slice decoded.
+        tokens = tokenizer.encode(load_transcript(path))
+        chunks = [tokenizer.decode(tokens[i:i + CHUNK_TOKENS]) for i in range(0, len(tokens), CHUNK_TOKENS)]
+        count = len(chunks)
+    else:
+        count = sum(1 for _ in iter_transcript_chunks(path, CHUNK_TOKENS, prefer="turn", use_mmap=mode == "mmap"))
+    elapsed = time.perf_counter() - start
+    print(count, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 16, 128])
+    parser.add_argument("--modes", nargs="+", default=["whole", "stream", "mmap"])
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(*args.child)
+
+    print(f"{'size':>8} {'mode':<8}{'chunks':>8}{'time s':>9}{'peak RSS MB':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_mb in args.sizes_mb:
+            path = os.path.join(tmp, f"transcript_{size_mb}.txt")
+            write_transcript(path, int(size_mb * 1024 * 1024))
+            for mode in args.modes:
+                out = subprocess.run([sys.executable, __file__, "--child", mode, path],
+                                     capture_output=True, text=True, check=True).stdout.split()
+                print(f"{size_mb:>6}MB {mode:<8}{out[0]:>8}{float(out[1]):>9.2f}{out[2]:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Wall time of map-reduce summarization at different concurrency caps.
+
+Runs summarize_transcript against the local stub (fixed latency per call), so
+the difference is how many calls are in flight, not the model.
+
+    PYTHONPATH=../../../Generation_Controls/src python benchmarks/bench_summarize.py --minutes 60 --latency-s 2
+"""
+import argparse
+import asyncio
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from gen_controls import service
+from gen_controls.client import AsyncOpenRouterClient
+from gen_controls.observability import setup_logging
+
+from stub_server import StubServer
+from summarize import summarize_transcript
+
+SPEAKERS = ["Alice", "Bob", "Chen", "Dana"]
+
+
+def make_transcript(minutes: int) -> str:
+    # About 150 spoken words per minute, 17 words per turn.
+    return "".join(
+        f"{SPEAKERS[i % 4]}: point {i} on the roadmap, the budget and the owners for the next sprint was agreed.\n"
+        for i in range(minutes * 9)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--minutes", type=int, default=60)
+    parser.add_argument("--latency-s", type=float, default=2.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    setup_logging(stream=open(os.devnull, "w"))
+    transcript = make_transcript(args.minutes)
+    print(f"{'concurrency':>11}{'chunks':>8}{'calls':>7}{'levels':>8}{'wall s':>9}{'actual $':>10}{'estimate $':>12}")
+    for concurrency in args.concurrency:
+        with StubServer(latency_s=args.latency_s, summary_words=250) as server:
+            with patch.object(service, "async_client", AsyncOpenRouterClient(base_url=server.url)):
+                report = asyncio.run(summarize_transcript(transcript, concurrency=concurrency))
+        print(f"{concurrency:>11}{report['num_chunks']:>8}{report['map_calls'] + report['reduce_calls']:>7}"
+              f"{report['levels']:>8}{report['wall_s']:>9.2f}{report['actual_cost_usd']:>10.4f}"
+              f"{report['estimated_total_cost_usd']:>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Local stand-in for an OpenAI-compatible chat completions endpoint.
+
+Replies with a fixed-length "summary" that names a digest of the prompt (so
+different prompts never collapse into the same reply) and a `usage` block
+derived from the prompt, tracks peak concurrency, and can start failing after a number of
+successful calls to simulate a crashed run. Used by the tests and by
+bench_summarize.py.
+"""
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        status, body = self.server.handle(payload)
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, latency_s=0.0, summary_words=40, fail_after=None, port=0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency_s = latency_s
+        self.summary_words = summary_words
+        self.fail_after = fail_after
+        self.requests = 0
+        self.succeeded = 0
+        self.inflight = 0
+        self.max_inflight = 0
+        self._lock = threading.Lock()
+
+    def handle(self, payload):
+        with self._lock:
+            self.requests += 1
+            if self.fail_after is not None and self.succeeded >= self.fail_after:
+                return 400, {"error": {"code": 400, "message": "injected failure"}}
+            self.inflight += 1
+            self.max_inflight = max(self.max_inflight, self.inflight)
+        try:
+            time.sleep(self.latency_s)
+        finally:
+            with self._lock:
+                self.inflight -= 1
+                self.succeeded += 1
+        prompt = payload["messages"][0]["content"]
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        text = " ".join([f"summary-{digest}"] + ["summary"] * (self.summary_words - 1))
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": self.summary_words}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        return 200, {"choices": [{"message": {"content": text}, "finish_reason": "stop"}], "usage": usage}
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,159 @@
+"""Estimate summarization cost for every transcript under a directory.
+
+Files are hashed and tokenized on a process pool. Results are cached in
+SQLite by content hash plus the estimate settings, so a nightly run only
+re-tokenizes new or changed files. The report is streamed as JSONL: one line
+per file, then a final {"totals": ...} line.
+
+    python bulk_estimate.py transcripts/ --cache .estimates.sqlite > report.jsonl
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from main import (
+    COMPLETION_RATE_PER_MILLION,
+    INSTRUCTIONS,
+    MAX_COMPLETION_TOKENS,
+    MODEL_CONTEXT_LIMIT,
+    PROMPT_RATE_PER_MILLION,
+    SAFETY_MARGIN,
+    estimate_from_token_count,
+)
+from utils import count_file_tokens, get_tokenizer
+
+DEFAULT_SETTINGS = {
+    "instructions": INSTRUCTIONS,
+    "context_limit": MODEL_CONTEXT_LIMIT,
+    "safety_margin": SAFETY_MARGIN,
+    "prompt_rate": PROMPT_RATE_PER_MILLION,
+    "completion_rate": COMPLETION_RATE_PER_MILLION,
+}
+HASH_BLOCK = 1 << 20
+TOTAL_FIELDS = ("transcript_tokens", "num_chunks", "total_prompt_tokens", "total_completion_tokens")
+
+
+class ResultCache:
+    """Per-file estimates in SQLite, keyed by content hash and settings."""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS estimates (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+    def get(self, key):
+        row = self._conn.execute("SELECT value FROM estimates WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO estimates VALUES (?, ?)", (key, json.dumps(value)))
+
+    def commit(self):
+        self._conn.commit()
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+
+
+def settings_key(settings: dict) -> str:
+    # The encoding and completion allowance change every number, so they are part of the key too.
+    canonical = {**settings, "encoding": get_tokenizer().encoding_name, "max_completion_tokens": MAX_COMPLETION_TOKENS}
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(HASH_BLOCK):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _estimate_file(path, settings):
+    try:
+        tokens = count_file_tokens(path)
+        return estimate_from_token_count(tokens, **settings)
+    except (OSError, UnicodeDecodeError, ValueError) as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+
+def estimate_directory(root, pattern="**/*.txt", settings=None, workers=None, cache_path=None):
+    """Yield one result per file (with "path", "sha256", "cached"), then {"totals": ...}."""
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    key_suffix = settings_key(settings)
+    paths = sorted(str(p) for p in Path(root).glob(pattern) if p.is_file())
+    cache = ResultCache(cache_path) if cache_path else None
+    totals = {"files": 0, "cached": 0, "errors": 0, **{field: 0 for field in TOTAL_FIELDS}, "estimated_total_cost_usd": 0.0}
+    start = time.time()
+
+    def account(record):
+        totals["files"] += 1
+        if "error" in record:
+            totals["errors"] += 1
+            return record
+        totals["cached"] += record["cached"]
+        for field in TOTAL_FIELDS:
+            totals[field] += record[field]
+        totals["estimated_total_cost_usd"] += record["estimated_total_cost_usd"]
+        return record
+
+    try:
+        with ProcessPoolExecutor(workers or os.cpu_count()) as pool:
+            misses = []
+            for path, digest in zip(paths, pool.map(_hash_file, paths, chunksize=16)):
+                record = cache.get(f"{digest}:{key_suffix}") if cache else None
+                if record is None:
+                    misses.append((path, digest))
+                else:
+                    yield account({"path": path, "sha256": digest, "cached": True, **record})
+
+            futures = {pool.submit(_estimate_file, path, settings): (path, digest) for path, digest in misses}
+            for future in as_completed(futures):
+                path, digest = futures[future]
+                record = future.result()
+                if cache is not None and "error" not in record:
+                    cache.set(f"{digest}:{key_suffix}", record)
+                yield account({"path": path, "sha256": digest, "cached": False, **record})
+            if cache is not None:
+                cache.commit()
+    finally:
+        if cache is not None:
+            cache.close()
+
+    totals["estimated_total_cost_usd"] = round(totals["estimated_total_cost_usd"], 6)
+    totals["wall_s"] = round(time.time() - start, 2)
+    yield {"totals": totals}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("root")
+    parser.add_argument("--pattern", default="**/*.txt")
+    parser.add_argument("--cache", default=None, help="SQLite file for per-file results")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--context-limit", type=int, default=MODEL_CONTEXT_LIMIT)
+    parser.add_argument("--safety-margin", type=float, default=SAFETY_MARGIN)
+    parser.add_argument("--prompt-rate", type=float, default=PROMPT_RATE_PER_MILLION)
+    parser.add_argument("--completion-rate", type=float, default=COMPLETION_RATE_PER_MILLION)
+    args = parser.parse_args()
+
+    settings = {
+        "context_limit": args.context_limit,
+        "safety_margin": args.safety_margin,
+        "prompt_rate": args.prompt_rate,
+        "completion_rate": args.completion_rate,
+    }
+    for record in estimate_directory(args.root, args.pattern, settings, args.workers, args.cache):
+        sys.stdout.write(json.dumps(record) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The local completions stub lives with the benchmarks; tests reuse it.
+sys.path.insert(0, str(Path(__file__).parent / "benchmarks"))
@@ -1,4 +1,6 @@
-from utils import TokenizerWrapper, load_transcript, split_into_token_chunks
+import math
+
+from utils import get_tokenizer, load_transcript
 
 MODEL_CONTEXT_LIMIT = 4000
 MAX_COMPLETION_TOKENS = 512
@@ -6,21 +8,32 @@ PROMPT_RATE_PER_MILLION = 1.0
 COMPLETION_RATE_PER_MILLION = 1.5
 SAFETY_MARGIN = 0.8
 
-def estimate_summarization_cost(transcript: str, instructions="You are a meeting summarization assistant."):
-    tokenizer = TokenizerWrapper()
-    overhead_tokens = tokenizer.count_tokens(instructions) + 50
-    available_tokens = int((MODEL_CONTEXT_LIMIT - overhead_tokens - MAX_COMPLETION_TOKENS) * SAFETY_MARGIN)
+INSTRUCTIONS = "You are a meeting summarization assistant."
+
+def chunk_budget(instructions=INSTRUCTIONS, context_limit=MODEL_CONTEXT_LIMIT,
+                 max_completion_tokens=MAX_COMPLETION_TOKENS, safety_margin=SAFETY_MARGIN):
+    """(overhead_tokens, transcript tokens per chunk) for one summarization call."""
+    overhead_tokens = get_tokenizer().count_tokens(instructions) + 50
+    available_tokens = int((context_limit - overhead_tokens - max_completion_tokens) * safety_margin)
     if available_tokens <= 0:
         raise ValueError("Context window too small for any transcript tokens.")
+    return overhead_tokens, available_tokens
 
-    chunks = split_into_token_chunks(transcript, available_tokens, tokenizer)
-    num_chunks = len(chunks)
-    total_prompt_tokens = (available_tokens + overhead_tokens) * num_chunks
+def estimate_from_token_count(transcript_tokens: int, instructions=INSTRUCTIONS, context_limit=MODEL_CONTEXT_LIMIT,
+                              safety_margin=SAFETY_MARGIN, prompt_rate=PROMPT_RATE_PER_MILLION,
+                              completion_rate=COMPLETION_RATE_PER_MILLION):
+    overhead_tokens, available_tokens = chunk_budget(instructions, context_limit, MAX_COMPLETION_TOKENS, safety_margin)
+
+    num_chunks = math.ceil(transcript_tokens / available_tokens)
+    # Chunks partition the transcript, so prompts add up to the transcript itself
+    # plus the overhead once per chunk; only the last chunk is short.
+    total_prompt_tokens = transcript_tokens + overhead_tokens * num_chunks
     total_completion_tokens = MAX_COMPLETION_TOKENS * num_chunks
-    total_cost = (total_prompt_tokens / 1_000_000) * PROMPT_RATE_PER_MILLION + \
-                 (total_completion_tokens / 1_000_000) * COMPLETION_RATE_PER_MILLION
+    total_cost = (total_prompt_tokens / 1_000_000) * prompt_rate + \
+                 (total_completion_tokens / 1_000_000) * completion_rate
 
     return {
+        "transcript_tokens": transcript_tokens,
         "num_chunks": num_chunks,
         "chunk_size_tokens": available_tokens,
         "total_prompt_tokens": total_prompt_tokens,
@@ -28,6 +41,12 @@ def estimate_summarization_cost(transcript: str, instructions="You are a meeting
         "estimated_total_cost_usd": round(total_cost, 6)
     }
 
+def estimate_summarization_cost(transcript: str, instructions=INSTRUCTIONS, context_limit=MODEL_CONTEXT_LIMIT):
+    # Only the number of chunks matters here, so count (on all cores for long
+    # transcripts) instead of materialising the chunks.
+    transcript_tokens = get_tokenizer().count_tokens_parallel(transcript)
+    return estimate_from_token_count(transcript_tokens, instructions, context_limit)
+
 def main():
     transcript = load_transcript("sample_transcript.txt")
     stats = estimate_summarization_cost(transcript)
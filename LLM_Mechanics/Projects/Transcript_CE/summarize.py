@@ -0,0 +1,255 @@
+"""Run the chunked summarization that main.py estimates, as a parallel map-reduce.
+
+Chunk summaries go out concurrently through gen_controls (retries, hedging
+and the circuit breaker come from the preset). Each call is capped by a
+concurrency limit and a tokens-per-minute budget. Partial summaries are then
+reduced level by level until they fit one call. Every finished call is
+appended to a JSONL checkpoint, so a crashed run resumes without paying for
+the same calls again.
+
+    python summarize.py sample_transcript.txt --concurrency 8 --tpm 200000 --checkpoint run.jsonl
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from gen_controls import client as client_module
+from gen_controls.cache import cache_key
+from gen_controls.presets import PRESETS
+from gen_controls.service import agenerate_text
+from gen_controls.transport import aclose_transport
+
+from main import (
+    COMPLETION_RATE_PER_MILLION,
+    INSTRUCTIONS,
+    MODEL_CONTEXT_LIMIT,
+    PROMPT_RATE_PER_MILLION,
+    SAFETY_MARGIN,
+    chunk_budget,
+    estimate_summarization_cost,
+)
+from utils import get_tokenizer, iter_chunks, load_transcript
+
+MAP_TASK = "Summarize this part of a meeting transcript. Keep decisions, owners, numbers and open questions."
+REDUCE_TASK = "Combine these partial summaries of one meeting into a single summary. Keep decisions, owners, numbers and open questions."
+SEPARATOR = "\n\n---\n\n"
+
+
+class TokenRateLimiter:
+    """Async token bucket holding at most one minute of `tokens_per_minute`.
+
+    A request bigger than the bucket waits for a full bucket instead of forever.
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60.0
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: int):
+        tokens = min(tokens, self.capacity)
+        # Waiters queue on the lock, so a large request is not starved by small ones.
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+    def refund(self, tokens: int):
+        """Return what a call reserved but did not use."""
+        if tokens > 0:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + tokens)
+
+
+class Checkpoint:
+    """Append-only JSONL of finished calls, keyed like the gen_controls response cache."""
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.records = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # a line cut short by a crash
+                    self.records[record["key"]] = record
+        self._file = open(path, "a", encoding="utf-8") if path else None
+
+    def get(self, key: str):
+        return self.records.get(key)
+
+    def add(self, record: dict):
+        self.records[record["key"]] = record
+        if self._file is not None:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def _cost(prompt_tokens: int, completion_tokens: int) -> float:
+    return (prompt_tokens / 1_000_000) * PROMPT_RATE_PER_MILLION + \
+           (completion_tokens / 1_000_000) * COMPLETION_RATE_PER_MILLION
+
+
+def _group(summaries: list, counts: list, budget: int) -> list:
+    """Greedily pack consecutive summaries into groups of at most `budget` tokens."""
+    separator_tokens = get_tokenizer().count_tokens(SEPARATOR)
+    groups, current, used = [], [], 0
+    for summary, count in zip(summaries, counts):
+        if current and used + separator_tokens + count > budget:
+            groups.append(current)
+            current, used = [], 0
+        current.append(summary)
+        used += count + (separator_tokens if len(current) > 1 else 0)
+    groups.append(current)
+    return groups
+
+
+async def _gather(coros) -> list:
+    """asyncio.gather that cancels and waits for the remaining calls when one fails."""
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+class _Run:
+    def __init__(self, cfg, concurrency, tokens_per_minute, checkpoint):
+        self.cfg = cfg
+        self.slots = asyncio.Semaphore(concurrency)
+        self.limiter = TokenRateLimiter(tokens_per_minute) if tokens_per_minute else None
+        self.checkpoint = checkpoint
+        self.tokenizer = get_tokenizer()
+        self.calls = {"map": 0, "reduce": 0, "resumed": 0}
+        self.usage = {"prompt_tokens": 0, "completion_tokens": 0}
+
+    async def call(self, stage: str, prompt: str) -> str:
+        self.calls[stage] += 1
+        key = cache_key(client_module.settings().model, [{"role": "user", "content": prompt}], self.cfg)
+        record = self.checkpoint.get(key)
+        if record is not None:
+            self.calls["resumed"] += 1
+        else:
+            prompt_tokens = self.tokenizer.count_tokens(prompt)
+            async with self.slots:
+                reserved = prompt_tokens + self.cfg.max_tokens
+                if self.limiter is not None:
+                    await self.limiter.acquire(reserved)
+                result = await agenerate_text(prompt, self.cfg)
+            usage = result.get("usage") or {}
+            record = {
+                "key": key,
+                "stage": stage,
+                "text": result["text"],
+                "prompt_tokens": usage.get("prompt_tokens") or prompt_tokens,
+                "completion_tokens": usage.get("completion_tokens") or self.tokenizer.count_tokens(result["text"]),
+            }
+            if self.limiter is not None:
+                self.limiter.refund(reserved - record["prompt_tokens"] - record["completion_tokens"])
+            self.checkpoint.add(record)
+        self.usage["prompt_tokens"] += record["prompt_tokens"]
+        self.usage["completion_tokens"] += record["completion_tokens"]
+        return record["text"]
+
+
+async def summarize_transcript(
+    transcript: str,
+    cfg=PRESETS["rag_qa"],
+    concurrency: int = 8,
+    tokens_per_minute: int = None,
+    checkpoint_path: str = None,
+    context_limit: int = MODEL_CONTEXT_LIMIT,
+    instructions: str = INSTRUCTIONS,
+) -> dict:
+    """Summarize `transcript` and report what it actually cost next to the estimate."""
+    start = time.time()
+    overhead_tokens, chunk_tokens = chunk_budget(instructions, context_limit)
+    reduce_budget = int((context_limit - overhead_tokens - cfg.max_tokens) * SAFETY_MARGIN)
+    if reduce_budget < 2 * cfg.max_tokens:
+        raise ValueError("Context window too small to combine two partial summaries.")
+
+    checkpoint = Checkpoint(checkpoint_path)
+    run = _Run(cfg, concurrency, tokens_per_minute, checkpoint)
+    try:
+        chunks = [chunk.text for chunk in iter_chunks([transcript], chunk_tokens, prefer="turn")]
+        summaries = await _gather(
+            (run.call("map", f"{instructions}\n\n{MAP_TASK}\n\n{text}") for text in chunks)
+        )
+        levels = 1
+        while len(summaries) > 1:
+            counts = [run.tokenizer.count_tokens(summary) for summary in summaries]
+            groups = _group(summaries, counts, reduce_budget)
+            if len(groups) == len(summaries) and len(groups) > 1:
+                raise ValueError("Partial summaries are too long to combine within the context limit.")
+            summaries = await _gather(
+                (run.call("reduce", f"{instructions}\n\n{REDUCE_TASK}\n\n{SEPARATOR.join(group)}") for group in groups)
+            )
+            levels += 1
+    finally:
+        checkpoint.close()
+
+    estimate = estimate_summarization_cost(transcript, instructions, context_limit)
+    return {
+        "summary": summaries[0] if summaries else "",
+        "num_chunks": len(chunks),
+        "levels": levels,
+        "map_calls": run.calls["map"],
+        "reduce_calls": run.calls["reduce"],
+        "resumed_calls": run.calls["resumed"],
+        "actual_prompt_tokens": run.usage["prompt_tokens"],
+        "actual_completion_tokens": run.usage["completion_tokens"],
+        "actual_cost_usd": round(_cost(run.usage["prompt_tokens"], run.usage["completion_tokens"]), 6),
+        "estimated_total_cost_usd": estimate["estimated_total_cost_usd"],
+        "wall_s": round(time.time() - start, 2),
+    }
+
+
+async def _run(args) -> dict:
+    try:
+        return await summarize_transcript(
+            load_transcript(args.transcript),
+            cfg=PRESETS[args.preset],
+            concurrency=args.concurrency,
+            tokens_per_minute=args.tpm,
+            checkpoint_path=args.checkpoint,
+        )
+    finally:
+        # The transport is process-wide; only the CLI, which owns the process, closes it.
+        await aclose_transport()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("transcript", nargs="?", default="sample_transcript.txt")
+    parser.add_argument("--preset", default="rag_qa", choices=sorted(PRESETS))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--tpm", type=int, default=None, help="Tokens-per-minute limit")
+    parser.add_argument("--checkpoint", default=None, help="JSONL file to resume from and append to")
+    args = parser.parse_args()
+
+    report = asyncio.run(_run(args))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+from bulk_estimate import estimate_directory
+from main import chunk_budget, estimate_summarization_cost
+from utils import count_file_tokens, get_tokenizer, load_transcript
+
+
+def make_dir(tmp_path, n=4):
+    root = tmp_path / "transcripts"
+    (root / "nested").mkdir(parents=True)
+    for i in range(n):
+        folder = root / "nested" if i % 2 else root
+        (folder / f"meeting_{i}.txt").write_text(f"Speaker {i}: line about item {i}.\r\n" * (300 * (i + 1)), encoding="utf-8")
+    return root
+
+
+def run(root, cache, **kwargs):
+    records = list(estimate_directory(root, workers=2, cache_path=str(cache), **kwargs))
+    return {r["path"]: r for r in records[:-1]}, records[-1]["totals"]
+
+
+def test_estimate_is_exact_per_chunk():
+    text = "This is a short meeting.\n" * 1000
+    stats = estimate_summarization_cost(text)
+    overhead_tokens, _ = chunk_budget()
+    assert stats["transcript_tokens"] == get_tokenizer().count_tokens(text)
+    assert stats["total_prompt_tokens"] == stats["transcript_tokens"] + overhead_tokens * stats["num_chunks"]
+
+
+def test_bulk_estimate_matches_single_file_and_totals(tmp_path):
+    root = make_dir(tmp_path)
+    results, totals = run(root, tmp_path / "cache.sqlite")
+
+    assert totals["files"] == 4 and totals["cached"] == 0 and totals["errors"] == 0
+    for path, record in results.items():
+        expected = estimate_summarization_cost(load_transcript(path))
+        assert {key: record[key] for key in expected} == expected
+        assert count_file_tokens(path, read_size=64) == expected["transcript_tokens"]
+    assert totals["total_prompt_tokens"] == sum(r["total_prompt_tokens"] for r in results.values())
+
+
+def test_bulk_estimate_only_recomputes_changed_files(tmp_path):
+    root = make_dir(tmp_path)
+    cache = tmp_path / "cache.sqlite"
+    first, _ = run(root, cache)
+
+    changed = root / "meeting_0.txt"
+    changed.write_text(changed.read_text() + "Speaker 9: one more thing.\n")
+    second, totals = run(root, cache)
+    assert totals["cached"] == 3
+    assert not second[str(changed)]["cached"]
+    assert second[str(changed)]["transcript_tokens"] > first[str(changed)]["transcript_tokens"]
+
+    # Different settings are a different cache entry.
+    _, totals = run(root, cache, settings={"prompt_rate": 3.0})
+    assert totals["cached"] == 0
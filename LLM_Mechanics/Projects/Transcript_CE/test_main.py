@@ -1,7 +1,45 @@
 from main import estimate_summarization_cost
+from utils import get_tokenizer, iter_transcript_chunks
 
 def test_estimate_summarization_cost_basic():
     text = "This is a short meeting.\n" * 100
     stats = estimate_summarization_cost(text)
     assert stats["num_chunks"] >= 1
     assert stats["estimated_total_cost_usd"] >= 0.0
+
+
+def write(tmp_path, text):
+    path = tmp_path / "transcript.txt"
+    path.write_bytes(text.encode("utf-8"))
+    return path
+
+
+def test_streaming_chunks_cover_the_file_exactly(tmp_path):
+    text = "".join(f"Speaker {i % 3}: café notes 👍 number {i}. Next point?\n" for i in range(400))
+    path = write(tmp_path, text)
+    data = path.read_bytes()
+    tokenizer = get_tokenizer()
+
+    # A tiny read size forces many encoding windows.
+    chunks = list(iter_transcript_chunks(path, 50, read_size=101))
+    assert "".join(chunk.text for chunk in chunks) == text
+    assert sum(chunk.token_count for chunk in chunks) == tokenizer.count_tokens(text)
+    assert all(chunk.token_count <= 50 for chunk in chunks)
+    assert all(data[chunk.start_byte:chunk.end_byte].decode("utf-8") == chunk.text for chunk in chunks)
+    assert [chunk.text for chunk in iter_transcript_chunks(path, 50, use_mmap=True, read_size=101)] == \
+        [chunk.text for chunk in chunks]
+
+
+def test_streaming_chunks_prefer_turns_and_overlap(tmp_path):
+    text = "".join(f"Speaker {i % 3}: we agreed on item {i} and moved on\n" for i in range(200))
+    path = write(tmp_path, text)
+    data = path.read_bytes()
+
+    chunks = list(iter_transcript_chunks(path, 60, prefer="turn"))
+    assert all(chunk.text.endswith("\n") for chunk in chunks)
+
+    overlapping = list(iter_transcript_chunks(path, 60, overlap_tokens=10))
+    for previous, chunk in zip(overlapping, overlapping[1:]):
+        shared = data[chunk.start_byte:previous.end_byte].decode("utf-8")
+        assert shared and previous.text.endswith(shared) and chunk.text.startswith(shared)
+    assert overlapping[-1].end_byte == len(data)
@@ -0,0 +1,74 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+
+pytest.importorskip("gen_controls")
+
+from gen_controls import service, transport
+from gen_controls.client import AsyncOpenRouterClient, UpstreamError
+
+from stub_server import StubServer
+from summarize import TokenRateLimiter, summarize_transcript
+
+TRANSCRIPT = "".join(f"Speaker {i % 4}: item {i} was discussed and assigned to team {i % 7}.\n" for i in range(2000))
+
+
+def run(server, **kwargs):
+    client = AsyncOpenRouterClient(base_url=server.url)
+    with patch.object(service, "async_client", client):
+        return asyncio.run(summarize_transcript(TRANSCRIPT, **kwargs))
+
+
+def test_map_reduce_runs_concurrently_and_reports_cost():
+    with StubServer(latency_s=0.05, summary_words=150) as server:
+        report = run(server, concurrency=4, context_limit=1500)
+
+    assert report["num_chunks"] == report["map_calls"] > 1
+    assert report["levels"] >= 3  # summaries did not fit one reduce call
+    assert server.requests == report["map_calls"] + report["reduce_calls"]
+    assert server.max_inflight <= 4
+    assert report["summary"].startswith("summary")
+    assert report["actual_cost_usd"] > 0
+    assert report["estimated_total_cost_usd"] > 0
+
+
+def test_crashed_run_resumes_from_checkpoint(tmp_path):
+    checkpoint = tmp_path / "run.jsonl"
+    with StubServer(fail_after=5) as server:
+        with pytest.raises(UpstreamError):
+            run(server, concurrency=1, context_limit=1500, checkpoint_path=str(checkpoint))
+    assert len(checkpoint.read_text().splitlines()) == 5
+
+    with StubServer() as server:
+        report = run(server, concurrency=4, context_limit=1500, checkpoint_path=str(checkpoint))
+    assert report["resumed_calls"] == 5
+    assert server.requests == report["map_calls"] + report["reduce_calls"] - 5
+
+
+def test_token_rate_limiter_spaces_out_requests():
+    async def go():
+        limiter = TokenRateLimiter(tokens_per_minute=6000)  # 100 tokens/s
+        await limiter.acquire(6000)
+        start = time.monotonic()
+        await limiter.acquire(50)
+        limiter.refund(50)
+        await limiter.acquire(50)
+        return time.monotonic() - start
+
+    assert 0.4 < asyncio.run(go()) < 1.0
+
+
+def test_summarize_leaves_the_shared_transport_open():
+    shared = transport.get_transport()
+
+    async def go(server):
+        # An application that owns the transport and summarizes along the way.
+        with patch.object(service, "async_client", AsyncOpenRouterClient(base_url=server.url)):
+            await summarize_transcript(TRANSCRIPT[:2000])
+        assert transport.get_transport() is shared
+        await transport.aclose_transport()
+
+    with StubServer() as server:
+        asyncio.run(go(server))
@@ -1,25 +1,167 @@
+import codecs
+import mmap
 from pathlib import Path
-import tiktoken
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from llm_common.tokenizer import Tokenizer as TokenizerWrapper, get_tokenizer, last_safe_split
+
+READ_SIZE = 1 << 20
+# Cut a window even without a safe boundary once this much text is pending,
+# so input with no newlines or spaces cannot grow the buffer without limit.
+MAX_PENDING_CHARS = 16 * READ_SIZE
+# How far back from a full chunk to look for a preferred boundary.
+BOUNDARY_LOOKBACK = 0.25
+
+
+class Chunk(NamedTuple):
+    text: str
+    token_count: int
+    start_byte: int
+    end_byte: int
+
 
 def load_transcript(path: str) -> str:
     return Path(path).read_text(encoding="utf-8")
 
-class TokenizerWrapper:
-    def __init__(self, encoding_name="cl100k_base"):
-        self.enc = tiktoken.get_encoding(encoding_name)
 
-    def count_tokens(self, text: str) -> int:
-        return len(self.enc.encode(text))
+def count_file_tokens(path: str, tokenizer: TokenizerWrapper = None, read_size: int = READ_SIZE) -> int:
+    """Token count of `load_transcript(path)`, read block by block with flat memory."""
+    tokenizer = tokenizer or get_tokenizer()
+    total = 0
+    pending = ""
+    with open(path, encoding="utf-8") as f:
+        while block := f.read(read_size):
+            pending += block
+            cut = last_safe_split(pending)
+            if not cut and len(pending) > MAX_PENDING_CHARS:
+                cut = len(pending)
+            if cut:
+                total += tokenizer.count_tokens(pending[:cut])
+                pending = pending[cut:]
+    return total + tokenizer.count_tokens(pending)
+
+
+def _is_boundary(tokenizer, tokens, k, prefer):
+    """Whether a chunk may end after tokens[k - 1] under the `prefer` policy."""
+    last = tokenizer.enc.decode_single_token_bytes(tokens[k - 1])
+    if last.endswith(b"\n"):
+        return True
+    if prefer != "sentence" or not last.rstrip(b"\"')").endswith((b".", b"?", b"!")):
+        return False
+    return k == len(tokens) or tokenizer.enc.decode_single_token_bytes(tokens[k])[:1] in (b" ", b"\n", b"\r")
+
+
+def _starts_mid_char(tokenizer, tokens, k):
+    # UTF-8 continuation bytes look like 0b10xxxxxx.
+    return k < len(tokens) and tokenizer.enc.decode_single_token_bytes(tokens[k])[0] & 0xC0 == 0x80
+
+
+def _chunk_end(tokenizer, tokens, chunk_tokens, prefer):
+    end = min(chunk_tokens, len(tokens))
+    if prefer and end < len(tokens):
+        for k in range(end, max(0, end - int(chunk_tokens * BOUNDARY_LOOKBACK)), -1):
+            if _is_boundary(tokenizer, tokens, k, prefer):
+                return k
+    # Never end a chunk in the middle of a multi-byte character, unless the
+    # chunk is too small to hold one.
+    k = end
+    while k > 1 and _starts_mid_char(tokenizer, tokens, k):
+        k -= 1
+    return end if _starts_mid_char(tokenizer, tokens, k) else k
+
+
+def iter_chunks(
+    blocks: Iterable[str],
+    chunk_tokens: int,
+    tokenizer: TokenizerWrapper = None,
+    overlap_tokens: int = 0,
+    prefer: Optional[str] = None,
+) -> Iterator[Chunk]:
+    """
+    Chunk a stream of text blocks into pieces of at most `chunk_tokens` tokens.
+
+    Text is encoded window by window, cut only at BPE-safe boundaries, so only
+    about one chunk plus one window of tokens is held at a time. `prefer` is
+    None (cut at exactly `chunk_tokens`), "turn" (end chunks on a line break,
+    i.e. between speaker turns) or "sentence" (line break or sentence end),
+    looking back up to a quarter of a chunk for one. Consecutive chunks share
+    `overlap_tokens` tokens. Byte offsets are into the UTF-8 encoded stream.
+    """
+    if prefer not in (None, "turn", "sentence"):
+        raise ValueError(f"Unknown boundary preference: {prefer!r}")
+    if not 0 <= overlap_tokens < chunk_tokens:
+        raise ValueError("overlap_tokens must be >= 0 and smaller than chunk_tokens.")
+    tokenizer = tokenizer or get_tokenizer()
+    enc = tokenizer.enc
+
+    tokens = []
+    pending = ""
+    start_byte = 0
+    blocks = iter(blocks)
+    exhausted = False
+
+    while True:
+        # Keep one token past a full chunk so the cut can check what follows it.
+        while not exhausted and len(tokens) <= chunk_tokens:
+            block = next(blocks, None)
+            if block is None:
+                exhausted = True
+                tokens.extend(enc.encode_ordinary(pending))
+                pending = ""
+                break
+            pending += block
+            cut = last_safe_split(pending)
+            if not cut and len(pending) > MAX_PENDING_CHARS:
+                cut = len(pending)
+            if cut:
+                tokens.extend(enc.encode_ordinary(pending[:cut]))
+                pending = pending[cut:]
+
+        if not tokens:
+            return
+
+        end = _chunk_end(tokenizer, tokens, chunk_tokens, prefer)
+        data = enc.decode_bytes(tokens[:end])
+        end_byte = start_byte + len(data)
+        yield Chunk(data.decode("utf-8", errors="replace"), end, start_byte, end_byte)
+
+        if exhausted and end == len(tokens):
+            return
+        next_start = end - overlap_tokens
+        while overlap_tokens and next_start < end and _starts_mid_char(tokenizer, tokens, next_start):
+            next_start += 1
+        if next_start <= 0:
+            next_start = end
+        start_byte = end_byte - len(enc.decode_bytes(tokens[next_start:end]))
+        del tokens[:next_start]
+
+
+def _read_blocks(path, read_size, use_mmap):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    with open(path, "rb") as f:
+        if use_mmap and Path(path).stat().st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for pos in range(0, len(mm), read_size):
+                    yield decoder.decode(mm[pos:pos + read_size])
+        else:
+            while block := f.read(read_size):
+                yield decoder.decode(block)
+    yield decoder.decode(b"", final=True)
+
 
-    def encode(self, text: str):
-        return self.enc.encode(text)
+def iter_transcript_chunks(
+    path: str,
+    chunk_tokens: int,
+    tokenizer: TokenizerWrapper = None,
+    overlap_tokens: int = 0,
+    prefer: Optional[str] = None,
+    use_mmap: bool = False,
+    read_size: int = READ_SIZE,
+) -> Iterator[Chunk]:
+    """Stream chunks straight from a transcript file; memory stays flat with file size."""
+    return iter_chunks(_read_blocks(path, read_size, use_mmap), chunk_tokens, tokenizer, overlap_tokens, prefer)
 
-    def decode(self, tokens: list[int]):
-        return self.enc.decode(tokens)
 
 def split_into_token_chunks(text: str, chunk_prompt_tokens: int, tokenizer: TokenizerWrapper):
-    tokens = tokenizer.encode(text)
-    chunks = []
-    for i in range(0, len(tokens), chunk_prompt_tokens):
-        chunks.append(tokenizer.decode(tokens[i:i+chunk_prompt_tokens]))
-    return chunks
+    blocks = (text[i:i + READ_SIZE] for i in range(0, len(text), READ_SIZE))
+    return [chunk.text for chunk in iter_chunks(blocks, chunk_prompt_tokens, tokenizer)]
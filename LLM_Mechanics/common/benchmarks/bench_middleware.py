@@ -0,0 +1,108 @@
+"""Per-request overhead of the BaseHTTPMiddleware stack vs llm_common's pure ASGI one.
+
+Both stacks wrap the same trivial Starlette endpoint and are driven directly
+through the ASGI interface, so the difference is the middleware alone.
+
+    python benchmarks/bench_middleware.py --requests 20000
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from prometheus_client import CollectorRegistry, Counter, Histogram
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+from llm_common import APIKeyMiddleware, RequestContextMiddleware
+
+API_KEY = "dev-secret-key"
+
+
+def _metrics():
+    registry = CollectorRegistry()
+    return Counter("requests", "", registry=registry), Histogram("latency", "", registry=registry)
+
+
+# The middleware as it was in Prod-Api-Services before moving to llm_common.
+class OldAPIKeyMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        if request.url.path not in ["/healthz", "/metrics"]:
+            if request.headers.get("x-api-key") != API_KEY:
+                return JSONResponse(status_code=401, content={"detail": "Unauthorized"})
+        return await call_next(request)
+
+
+class OldRequestContextMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, count, latency):
+        super().__init__(app)
+        self.count = count
+        self.latency = latency
+
+    async def dispatch(self, request: Request, call_next):
+        request_id = str(uuid.uuid4())
+        start = time.perf_counter()
+        response = await call_next(request)
+        self.count.inc()
+        self.latency.observe(time.perf_counter() - start)
+        response.headers["X-Request-ID"] = request_id
+        return response
+
+
+async def endpoint(request):
+    return PlainTextResponse("ok")
+
+
+def build(old):
+    app = Starlette(routes=[Route("/estimate", endpoint)])
+    count, latency = _metrics()
+    if old:
+        return OldRequestContextMiddleware(OldAPIKeyMiddleware(app), count, latency)
+    return RequestContextMiddleware(
+        APIKeyMiddleware(app, api_key=API_KEY, exempt_paths=["/healthz", "/metrics"]),
+        request_count=count, request_latency=latency,
+    )
+
+
+async def drive(app, n):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/estimate", "raw_path": b"/estimate", "root_path": "",
+        "query_string": b"", "headers": [(b"host", b"bench"), (b"x-api-key", API_KEY.encode())],
+        "client": ("127.0.0.1", 1234), "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(n):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    bare = Starlette(routes=[Route("/estimate", endpoint)])
+    results = {}
+    for name, app in [("endpoint only", bare), ("BaseHTTPMiddleware", build(old=True)),
+                      ("pure ASGI", build(old=False))]:
+        asyncio.run(drive(app, 500))  # warm-up
+        results[name] = asyncio.run(drive(app, args.requests))
+
+    base = results["endpoint only"]
+    for name, us in results.items():
+        print(f"{name:20s} {us:8.1f} us/request   overhead {us - base:7.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Scaling of Tokenizer.count_tokens_parallel with worker threads on a large text.
+
+Builds a synthetic meeting transcript of --mb megabytes, counts it once in a
+single pass and then with 1..--max-workers threads, checking every parallel
+count against the single pass.
+
+    python benchmarks/bench_parallel_count.py --mb 50 --max-workers 8
+"""
+import argparse
+import os
+import random
+import time
+
+from llm_common import get_tokenizer
+
+SPEAKERS = ["Alice", "Bob", "Chen", "Dana"]
+WORDS = ("we should ship the roadmap review before friday and check the budget numbers "
+         "for q3 2025 customers asked about latency, pricing and the new api endpoints").split()
+
+
+def make_transcript(size_bytes: int) -> str:
+    rng = random.Random(0)
+    lines = []
+    total = 0
+    while total < size_bytes:
+        line = f"{rng.choice(SPEAKERS)}: " + " ".join(rng.choices(WORDS, k=rng.randint(5, 40))) + ".\n"
+        lines.append(line)
+        total += len(line)
+    return "".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=float, default=50)
+    parser.add_argument("--max-workers", type=int, default=8)
+    parser.add_argument("--encoding", default="cl100k_base")
+    args = parser.parse_args()
+
+    tokenizer = get_tokenizer(args.encoding)
+    text = make_transcript(int(args.mb * 1024 * 1024))
+    print(f"{len(text) / 1e6:.1f} MB, {os.cpu_count()} CPU(s)")
+
+    start = time.perf_counter()
+    expected = tokenizer.count_tokens(text)
+    single = time.perf_counter() - start
+    print(f"{'single pass':<12}{single:>8.2f} s  {expected} tokens")
+
+    workers = 1
+    while workers <= args.max_workers:
+        start = time.perf_counter()
+        count = tokenizer.count_tokens_parallel(text, workers=workers) if workers > 1 else tokenizer.count_tokens(text)
+        elapsed = time.perf_counter() - start
+        assert count == expected, (workers, count, expected)
+        print(f"{workers:>2} workers  {elapsed:>8.2f} s  x{single / elapsed:.2f}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
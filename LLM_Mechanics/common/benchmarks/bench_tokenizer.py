@@ -0,0 +1,56 @@
+"""Per-call cost of counting tokens with the old per-project wrappers vs llm_common.
+
+The old pattern (Context_Limit, Transcript_CE, Minimal_Token_Count) built a
+wrapper on every call and counted with `encode`, which also scans the text
+for special tokens. The shared tokenizer is built once and counts with
+`encode_ordinary`; the memo variant additionally remembers long texts.
+
+    python benchmarks/bench_tokenizer.py --calls 20000
+"""
+import argparse
+import time
+
+import tiktoken
+
+from llm_common import Tokenizer, get_tokenizer
+
+
+# The wrapper as it was duplicated across the three projects.
+class OldTokenizerWrapper:
+    def __init__(self, encoding_name="cl100k_base"):
+        self.enc = tiktoken.get_encoding(encoding_name)
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.enc.encode(text))
+
+
+def _per_call_us(fn, texts, calls):
+    fn(texts[0])
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(texts[i % len(texts)])
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    memo = Tokenizer(memo_size=1024)
+    cases = {
+        "short (12 chars)": ["Hello there!", "How are you?", "Fine, thanks"],
+        "prompt (~2 KB)": [f"Instruction {i}: summarise the notes below.\n" + "notes " * 330 for i in range(8)],
+        "document (~40 KB)": [f"Chapter {i}\n" + "The meeting covered roadmap items. " * 1150 for i in range(4)],
+    }
+    print(f"{'text':<20}{'old wrapper':>14}{'shared':>10}{'shared+memo':>14}   (us/call)")
+    for name, texts in cases.items():
+        calls = max(50, args.calls // max(1, len(texts[0]) // 100))
+        old = _per_call_us(lambda t: OldTokenizerWrapper().count_tokens(t), texts, calls)
+        shared = _per_call_us(lambda t: get_tokenizer().count_tokens(t), texts, calls)
+        memoised = _per_call_us(memo.count_tokens, texts, calls)
+        print(f"{name:<20}{old:>14.1f}{shared:>10.1f}{memoised:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+from .budget import BudgetExceededError, BudgetLedger, LocalBudgetStore, RedisBudgetStore
+from .middleware import APIKeyMiddleware, RequestContextMiddleware
+from .tokenizer import Tokenizer, count_tokens, get_encoding, get_tokenizer, last_safe_split, split_text, warm_up
+
+__all__ = [
+    "APIKeyMiddleware",
+    "RequestContextMiddleware",
+    "BudgetExceededError",
+    "BudgetLedger",
+    "LocalBudgetStore",
+    "RedisBudgetStore",
+    "Tokenizer",
+    "count_tokens",
+    "get_encoding",
+    "get_tokenizer",
+    "last_safe_split",
+    "split_text",
+    "warm_up",
+]
@@ -0,0 +1,234 @@
+"""Per-user spend ledger shared by every worker and replica behind one store.
+
+Increments are buffered in process and written by a background flusher, so
+the request path only takes a lock. Admission checks read the user's settled
+total, as last read from the store, plus everything this process has
+buffered. Every flush re-reads the totals of users seen in the last
+`active_s` seconds in one MGET, so spend booked by other workers shows up
+here within two flush intervals: theirs and ours. Across workers a user can
+therefore overshoot the limit by what the other workers admit in about two
+flush intervals. Users idle for longer are read again on their next request.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class BudgetExceededError(Exception):
+    def __init__(self, user_id: str, spent: float, cost: float, limit: float):
+        super().__init__(f"Budget exceeded for {user_id}: {spent:.6f} + {cost:.6f} > {limit:.6f} USD")
+        self.user_id = user_id
+        self.spent = spent
+        self.cost = cost
+        self.limit = limit
+
+
+class LocalBudgetStore:
+    """In-process store for single-worker deployments and tests."""
+
+    def __init__(self, window_s: float = None):
+        self.window_s = window_s
+        self._totals = {}  # user_id -> (total, expires_at)
+        self._lock = threading.Lock()
+
+    def _live(self, user_id, now):
+        entry = self._totals.get(user_id)
+        if entry is None or (entry[1] is not None and entry[1] <= now):
+            return None
+        return entry
+
+    def add_many(self, amounts: dict) -> dict:
+        now = time.time()
+        totals = {}
+        with self._lock:
+            for user_id, amount in amounts.items():
+                entry = self._live(user_id, now)
+                if entry is None:
+                    entry = (0.0, now + self.window_s if self.window_s else None)
+                self._totals[user_id] = (entry[0] + amount, entry[1])
+                totals[user_id] = entry[0] + amount
+            if self.window_s:
+                for user_id in [u for u, (_, exp) in self._totals.items() if exp <= now]:
+                    del self._totals[user_id]
+        return totals
+
+    def get_many(self, user_ids) -> dict:
+        now = time.time()
+        with self._lock:
+            return {u: (self._live(u, now) or (0.0, None))[0] for u in user_ids}
+
+
+class RedisBudgetStore:
+    """Totals in Redis, applied with INCRBYFLOAT inside one MULTI/EXEC round trip.
+
+    With `window_s` set, a user's key expires that long after their first
+    spend in the window, which also keeps the keyspace bounded.
+    """
+
+    def __init__(self, client, prefix: str = "budget:", window_s: int = None):
+        self.client = client
+        self.prefix = prefix
+        self.window_s = window_s
+
+    def add_many(self, amounts: dict) -> dict:
+        pipe = self.client.pipeline(transaction=True)
+        for user_id, amount in amounts.items():
+            pipe.incrbyfloat(self.prefix + user_id, amount)
+            if self.window_s:
+                pipe.expire(self.prefix + user_id, self.window_s, nx=True)
+        replies = pipe.execute()
+        step = 2 if self.window_s else 1
+        return {user_id: float(total) for user_id, total in zip(amounts, replies[::step])}
+
+    def get_many(self, user_ids) -> dict:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        values = self.client.mget([self.prefix + u for u in user_ids])
+        return {u: float(v) if v is not None else 0.0 for u, v in zip(user_ids, values)}
+
+
+class BudgetLedger:
+    """Buffered, enforceable view of per-user spend over a budget store.
+
+    `charge` checks the limit and books the amount in one step, so concurrent
+    requests from the same user in this process cannot both slip under it.
+    `adjust` books a correction (e.g. actual minus reserved cost) unchecked.
+    """
+
+    def __init__(self, store, limit: float = None, flush_interval_s: float = 0.25,
+                 max_users: int = 100_000, active_s: float = 60.0):
+        self.store = store
+        self.limit = limit
+        self.flush_interval_s = flush_interval_s
+        self.max_users = max_users
+        self.active_s = active_s
+        self._settled = OrderedDict()  # last total read back from the store
+        self._pending = {}             # booked here, not yet flushed
+        self._inflight = {}            # being written by the current flush
+        self._recent = OrderedDict()   # user -> last seen; refreshed on every flush
+        self._stale = set()            # settled at 0.0 because the store could not be read
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _seen_locked(self, user_id):
+        self._recent[user_id] = time.monotonic()
+        self._recent.move_to_end(user_id)
+
+    def _ensure_settled(self, user_id):
+        with self._lock:
+            if user_id in self._settled and user_id in self._recent:
+                self._settled.move_to_end(user_id)
+                self._seen_locked(user_id)
+                return
+        # First sight of this user in this process: one read, outside the lock.
+        # Also after the user dropped out of the refresh set, as the total may be stale.
+        try:
+            total = self.store.get_many([user_id]).get(user_id, 0.0)
+        except Exception as e:
+            # Admit against what this process has booked rather than fail the
+            # request; the next flush re-reads the total, as for any recent user.
+            logger.warning(f"Budget read failed for {user_id}, counting from 0 until the next flush: {e}")
+            with self._lock:
+                self._remember(user_id, 0.0)
+                self._stale.add(user_id)
+                self._seen_locked(user_id)
+            return
+        with self._lock:
+            self._remember(user_id, total)
+            self._seen_locked(user_id)
+
+    def _remember(self, user_id, total):
+        self._settled[user_id] = total
+        self._settled.move_to_end(user_id)
+        self._stale.discard(user_id)
+        while len(self._settled) > self.max_users:
+            evicted, _ = self._settled.popitem(last=False)
+            self._recent.pop(evicted, None)
+            self._stale.discard(evicted)
+
+    def _spent_locked(self, user_id):
+        return (
+            self._settled.get(user_id, 0.0)
+            + self._inflight.get(user_id, 0.0)
+            + self._pending.get(user_id, 0.0)
+        )
+
+    def spent(self, user_id: str) -> float:
+        self._ensure_settled(user_id)
+        with self._lock:
+            return self._spent_locked(user_id)
+
+    def charge(self, user_id: str, amount: float) -> float:
+        """Book `amount` unless it would take the user over the limit; return the new total."""
+        self._ensure_settled(user_id)
+        with self._lock:
+            spent = self._spent_locked(user_id)
+            if self.limit is not None and spent + amount > self.limit:
+                raise BudgetExceededError(user_id, spent, amount, self.limit)
+            self._pending[user_id] = self._pending.get(user_id, 0.0) + amount
+            return spent + amount
+
+    def adjust(self, user_id: str, delta: float):
+        if delta:
+            with self._lock:
+                self._pending[user_id] = self._pending.get(user_id, 0.0) + delta
+                self._seen_locked(user_id)
+
+    def totals(self, user_id: str) -> dict:
+        spent = self.spent(user_id)
+        return {
+            "user_id": user_id,
+            "spent_usd": round(spent, 6),
+            "limit_usd": self.limit,
+            "remaining_usd": round(max(0.0, self.limit - spent), 6) if self.limit is not None else None,
+        }
+
+    def flush(self):
+        """Write buffered amounts to the store and refresh the settled totals of recent users."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+                cutoff = time.monotonic() - self.active_s
+                while self._recent and next(iter(self._recent.values())) < cutoff:
+                    self._recent.popitem(last=False)
+                # Users in the batch get their new totals back from add_many.
+                refresh = [u for u in self._recent.keys() | self._stale if u not in batch]
+            try:
+                totals = self.store.add_many(batch) if batch else {}
+                if refresh:
+                    totals.update(self.store.get_many(refresh))
+            except Exception as e:
+                logger.warning(f"Budget flush failed, keeping {len(batch)} users buffered: {e}")
+                with self._lock:
+                    for user_id, amount in batch.items():
+                        self._pending[user_id] = self._pending.get(user_id, 0.0) + amount
+                    self._inflight = {}
+                return
+            with self._lock:
+                for user_id, total in totals.items():
+                    self._remember(user_id, total)
+                self._inflight = {}
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval_s):
+            self.flush()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="budget-flush", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
@@ -0,0 +1,30 @@
+"""Download tiktoken encodings into a cache directory, e.g. while building an image.
+
+    ENV TIKTOKEN_CACHE_DIR=/opt/tiktoken_cache
+    RUN python -m llm_common.fetch_encodings cl100k_base o200k_base
+
+At runtime tiktoken then reads the files from TIKTOKEN_CACHE_DIR and never
+touches the network.
+"""
+import argparse
+import os
+
+from .tokenizer import DEFAULT_ENCODING, warm_up
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("encodings", nargs="*", default=[DEFAULT_ENCODING])
+    parser.add_argument("--cache-dir", default=os.getenv("TIKTOKEN_CACHE_DIR"))
+    args = parser.parse_args(argv)
+    if not args.cache_dir:
+        parser.error("set TIKTOKEN_CACHE_DIR or pass --cache-dir")
+
+    os.makedirs(args.cache_dir, exist_ok=True)
+    os.environ["TIKTOKEN_CACHE_DIR"] = args.cache_dir
+    for name, seconds in warm_up(*args.encodings).items():
+        print(f"{name}: cached in {args.cache_dir} ({seconds:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
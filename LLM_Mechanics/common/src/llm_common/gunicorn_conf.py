@@ -0,0 +1,31 @@
+"""Gunicorn settings for running a service's FastAPI app on several uvicorn workers.
+
+    gunicorn -c python:llm_common.gunicorn_conf app.main:app
+
+Tokenization is CPU-bound and every worker runs its own event loop, so the
+default is one worker per CPU this process may run on (WEB_CONCURRENCY
+overrides it). Set PROMETHEUS_MULTIPROC_DIR so /metrics adds up all workers.
+"""
+import os
+
+from llm_common.metrics import mark_worker_dead, reset_multiproc_dir
+
+# sched_getaffinity honours cpusets (e.g. docker --cpuset-cpus); cpu_count does not.
+_cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", _cpus))
+worker_class = "uvicorn_worker.UvicornWorker"
+# Long completions and multi-megabyte prompts are normal; 30 s would kill workers mid-request.
+timeout = int(os.getenv("WORKER_TIMEOUT_S", 120))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT_S", 30))
+keepalive = 5
+
+
+def on_starting(server):
+    # Before any worker imports the app and creates its metric files.
+    reset_multiproc_dir()
+
+
+def child_exit(server, worker):
+    mark_worker_dead(worker.pid)
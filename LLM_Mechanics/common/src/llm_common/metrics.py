@@ -0,0 +1,51 @@
+"""Prometheus exposition that stays correct when a service runs several worker processes.
+
+With PROMETHEUS_MULTIPROC_DIR set, every worker writes its samples to files in
+that directory and `render_metrics` merges all of them, so a scrape that lands
+on any worker sees the totals of the whole pod. Without it the process's own
+default registry is rendered, as before.
+
+The directory must be emptied before the workers start and told about each
+worker that exits; `llm_common.gunicorn_conf` does both.
+"""
+import glob
+import os
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+
+MULTIPROC_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+
+def multiproc_dir():
+    return os.environ.get(MULTIPROC_ENV) or None
+
+
+def metrics_registry():
+    """The registry /metrics should render: all workers' samples in multiprocess mode, else this process's."""
+    if multiproc_dir() is None:
+        return REGISTRY
+    # A fresh registry per scrape, as the prometheus_client docs require.
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_metrics() -> tuple:
+    """(body, content type) for a /metrics response."""
+    return generate_latest(metrics_registry()), CONTENT_TYPE_LATEST
+
+
+def reset_multiproc_dir():
+    """Create the multiprocess directory, or delete the samples a previous run left in it."""
+    path = multiproc_dir()
+    if path is None:
+        return
+    os.makedirs(path, exist_ok=True)
+    for name in glob.glob(os.path.join(path, "*.db")):
+        os.remove(name)
+
+
+def mark_worker_dead(pid: int):
+    """Drop a dead worker's live gauges; its counters and histograms keep counting toward the totals."""
+    if multiproc_dir() is not None:
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,107 @@
+"""Pure ASGI middleware shared by the LLM_Mechanics services.
+
+Each class wraps the next ASGI app directly instead of going through
+Starlette's BaseHTTPMiddleware, so there is no extra task per layer, no
+response re-wrapping, and streaming bodies pass through untouched.
+"""
+import hmac
+import json
+import time
+import uuid
+
+
+def _header(scope, name: bytes):
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+    return None
+
+
+class APIKeyMiddleware:
+    """Reject requests whose API key header does not match `api_key`.
+
+    `exempt_paths` match exactly and `exempt_prefixes` by prefix; both are
+    frozen at construction so the per-request check is one set lookup and
+    one `str.startswith`.
+    """
+
+    def __init__(self, app, api_key: str, exempt_paths=(), exempt_prefixes=(),
+                 header: str = "x-api-key", detail: str = "Unauthorized"):
+        self.app = app
+        self._api_key = api_key.encode("utf-8")
+        self._header = header.lower().encode("latin-1")
+        self._exempt_paths = frozenset(exempt_paths)
+        self._exempt_prefixes = tuple(exempt_prefixes)
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        self._unauthorized_start = {
+            "type": "http.response.start",
+            "status": 401,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+            ],
+        }
+        self._unauthorized_body = {"type": "http.response.body", "body": body}
+
+    def is_exempt(self, path: str) -> bool:
+        return path in self._exempt_paths or path.startswith(self._exempt_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket") or self.is_exempt(scope["path"]):
+            return await self.app(scope, receive, send)
+
+        key = _header(scope, self._header)
+        # Constant-time so response timing does not leak how much of the key matched.
+        if key is not None and hmac.compare_digest(key, self._api_key):
+            return await self.app(scope, receive, send)
+
+        if scope["type"] == "websocket":
+            await send({"type": "websocket.close", "code": 1008})
+            return
+        await send(self._unauthorized_start)
+        await send(self._unauthorized_body)
+
+
+class RequestContextMiddleware:
+    """Tag each HTTP request with an X-Request-ID and record its count and latency.
+
+    The ID is also stored on `request.state.request_id`. Latency runs until the
+    last body chunk has been sent, so streamed responses are timed in full.
+    Each request is counted exactly once, whatever its status.
+    """
+
+    def __init__(self, app, request_count=None, request_latency=None):
+        self.app = app
+        self.request_count = request_count
+        self.request_latency = request_latency
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = str(uuid.uuid4())
+        scope.setdefault("state", {})["request_id"] = request_id
+        id_header = (b"x-request-id", request_id.encode("latin-1"))
+        start = time.perf_counter()
+        finished = False
+
+        async def send_wrapper(message):
+            nonlocal finished
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), id_header]
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                finished = True
+                self._observe(start)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if not finished:
+                self._observe(start)
+
+    def _observe(self, start):
+        if self.request_count is not None:
+            self.request_count.inc()
+        if self.request_latency is not None:
+            self.request_latency.observe(time.perf_counter() - start)
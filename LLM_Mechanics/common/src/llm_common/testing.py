@@ -0,0 +1,179 @@
+"""In-memory stand-in for the subset of the redis-py client these services use."""
+import time
+
+
+class FakeRedis:
+    """Dict-backed fake of redis.Redis(decode_responses=True).
+
+    Counts `round_trips` (one per command or pipeline execute) so tests can
+    assert on batching. Set `error` to an exception instance to make every
+    call raise it, e.g. `redis.ConnectionError("down")`. Pipelines support
+    WATCH/MULTI: `execute` raises redis.WatchError if a watched key was
+    written since `watch`.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.versions = {}
+        self.round_trips = 0
+        self.error = None
+
+    def _trip(self):
+        if self.error is not None:
+            raise self.error
+        self.round_trips += 1
+
+    def _expired(self, key):
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= time.time():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+
+    def _get(self, key):
+        self._expired(key)
+        return self.data.get(key)
+
+    def _touch(self, key):
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def _set(self, key, value, ttl=None):
+        self._touch(key)
+        self.data[key] = str(value)
+        if ttl is None:
+            self.expires.pop(key, None)
+        else:
+            self.expires[key] = time.time() + ttl
+        return True
+
+    def _incrbyfloat(self, key, amount):
+        value = float(self._get(key) or 0) + float(amount)
+        self._touch(key)
+        self.data[key] = repr(value)
+        return value
+
+    def _expire(self, key, seconds, nx=False):
+        if self._get(key) is None or (nx and key in self.expires):
+            return False
+        self._touch(key)
+        self.expires[key] = time.time() + seconds
+        return True
+
+    def get(self, key):
+        self._trip()
+        return self._get(key)
+
+    def set(self, key, value, ex=None):
+        self._trip()
+        return self._set(key, value, ex)
+
+    def setex(self, key, ttl, value):
+        self._trip()
+        return self._set(key, value, ttl)
+
+    def mget(self, keys):
+        self._trip()
+        return [self._get(key) for key in keys]
+
+    def incrbyfloat(self, key, amount):
+        self._trip()
+        return self._incrbyfloat(key, amount)
+
+    def expire(self, key, seconds, nx=False):
+        self._trip()
+        return self._expire(key, seconds, nx)
+
+    def _rpush(self, key, *values):
+        self._expired(key)
+        self._touch(key)
+        items = self.data.setdefault(key, [])
+        items.extend(values)
+        return len(items)
+
+    def rpush(self, key, *values):
+        self._trip()
+        return self._rpush(key, *values)
+
+    def lrange(self, key, start, end):
+        self._trip()
+        items = self._get(key) or []
+        return items[start:] if end == -1 else items[start:end + 1]
+
+    def llen(self, key):
+        self._trip()
+        return len(self._get(key) or [])
+
+    def _ltrim(self, key, start, end):
+        items = self._get(key)
+        if items is not None:
+            self._touch(key)
+            self.data[key] = items[start:] if end == -1 else items[start:end + 1]
+        return True
+
+    def ltrim(self, key, start, end):
+        self._trip()
+        return self._ltrim(key, start, end)
+
+    def _delete(self, *keys):
+        for key in keys:
+            self._touch(key)
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def delete(self, *keys):
+        self._trip()
+        return self._delete(*keys)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    QUEUED = ("get", "set", "setex", "incrbyfloat", "expire", "rpush", "ltrim", "delete")
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.reset()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.reset()
+
+    def reset(self):
+        self.ops = []
+        self.watching = None  # key -> version at WATCH, until MULTI
+        self._watched = None
+
+    def watch(self, *keys):
+        self.redis._trip()
+        self.watching = {key: self.redis.versions.get(key, 0) for key in keys}
+
+    def multi(self):
+        self._watched, self.watching = self.watching, None
+
+    def __getattr__(self, name):
+        # After WATCH and before MULTI, commands run immediately, as in redis-py.
+        if self.__dict__.get("watching") is not None:
+            return getattr(self.redis, name)
+        if name not in self.QUEUED:
+            raise AttributeError(name)
+        target = {
+            "setex": lambda key, ttl, value: self.redis._set(key, value, ttl),
+            "set": lambda key, value, ex=None: self.redis._set(key, value, ex),
+        }.get(name, getattr(self.redis, "_" + name, None))
+
+        def queue(*args, **kwargs):
+            self.ops.append((target, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        self.redis._trip()
+        ops, watched = self.ops, self._watched
+        self.reset()
+        if watched and any(self.redis.versions.get(key, 0) != version for key, version in watched.items()):
+            from redis import WatchError
+
+            raise WatchError("Watched variable changed.")
+        return [fn(*args, **kwargs) for fn, args, kwargs in ops]
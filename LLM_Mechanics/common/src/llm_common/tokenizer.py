@@ -0,0 +1,261 @@
+"""One process-wide home for tiktoken encodings.
+
+Thread-safety: `tiktoken.Encoding` objects are immutable once built and safe
+to share between threads, so each encoding is loaded once and handed to every
+caller. The registry and each tokenizer's count memo are guarded by locks;
+everything else is lock-free.
+
+Counting and encoding use `encode_ordinary`: special-token strings such as
+"<|endoftext|>" in user text count as plain text instead of raising, and the
+per-call regex scan for them is skipped.
+
+Very large texts can be encoded on several threads (tiktoken releases the GIL
+while encoding). The text is cut only where the encoding's pre-tokenizer
+always starts a new piece, so no BPE merge can span a cut and the result is
+identical to a single pass:
+
+- after a newline that is followed by a non-space character other than "/"
+  (o200k folds newlines and slashes into a preceding punctuation piece), and
+- before a single space that sits between a non-space character and a letter
+  (the space belongs to the following word).
+
+Both hold for the cl100k/o200k split patterns. The older GPT-2 style
+encodings treat trailing whitespace differently, so they are always encoded
+in one pass.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import tiktoken
+
+DEFAULT_ENCODING = "cl100k_base"
+SPLITTABLE_ENCODINGS = frozenset({"cl100k_base", "o200k_base"})
+SEGMENT_CHARS = 1 << 20
+# Smallest window count_tokens_upto/encode_upto encode at a time.
+UPTO_MIN_WINDOW = 1024
+
+_SAFE_SPLIT = re.compile(r"\n(?=[^\s/])|(?<=\S)(?= [^\W\d_])")
+
+_encodings = {}
+_tokenizers = {}
+_lock = threading.Lock()
+
+
+def get_encoding(name: str = DEFAULT_ENCODING) -> tiktoken.Encoding:
+    """Load `name` (cl100k_base, o200k_base, ...) once per process."""
+    enc = _encodings.get(name)
+    if enc is None:
+        with _lock:
+            enc = _encodings.get(name)
+            if enc is None:
+                enc = _encodings[name] = tiktoken.get_encoding(name)
+    return enc
+
+
+def split_text(text: str, segment_chars: int = SEGMENT_CHARS) -> list:
+    """Cut `text` into pieces of roughly `segment_chars` at BPE-safe boundaries.
+
+    A text with no safe boundary past the target stays in one piece.
+    """
+    segments = []
+    start = 0
+    while len(text) - start > segment_chars:
+        match = _SAFE_SPLIT.search(text, start + segment_chars)
+        if match is None:
+            break
+        segments.append(text[start:match.end()])
+        start = match.end()
+    segments.append(text[start:])
+    return segments
+
+
+def last_safe_split(text: str, start: int = 0) -> int:
+    """Position of the last BPE-safe boundary in `text[start:]`, or 0 if there is none.
+
+    Lets a stream be encoded window by window with the same tokens as a single pass.
+    """
+    span = 256
+    while True:
+        lo = max(start, len(text) - span)
+        last = 0
+        for match in _SAFE_SPLIT.finditer(text, lo):
+            last = match.end()
+        if last or lo == start:
+            return last
+        span *= 16
+
+
+def _window_end(text: str, pos: int, remaining: int) -> int:
+    """End of the next window to encode when `remaining` tokens are left before a limit.
+
+    At ~4 characters per token one window usually settles it; windows end on
+    BPE-safe boundaries so their tokens add up to a single pass.
+    """
+    end = pos + max(UPTO_MIN_WINDOW, 4 * (remaining + 1))
+    if end >= len(text):
+        return len(text)
+    match = _SAFE_SPLIT.search(text, end)
+    return match.end() if match else len(text)
+
+
+class _CountMemo:
+    """Bounded LRU of token counts keyed by a digest of the text."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def get(self, key):
+        with self._lock:
+            count = self._counts.get(key)
+            if count is not None:
+                self._counts.move_to_end(key)
+            return count
+
+    def set(self, key, count):
+        with self._lock:
+            self._counts[key] = count
+            self._counts.move_to_end(key)
+            if len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+
+
+class Tokenizer:
+    """Handle on a shared encoding; constructing one never reloads the BPE ranks.
+
+    With `memo_size` > 0, counts of texts at least `memo_min_chars` long are
+    remembered by hash. Shorter texts are cheaper to encode than to hash.
+    """
+
+    def __init__(self, encoding_name: str = DEFAULT_ENCODING, memo_size: int = 0, memo_min_chars: int = 256):
+        self.encoding_name = encoding_name
+        self.enc = get_encoding(encoding_name)
+        self.memo_min_chars = memo_min_chars
+        self._memo = _CountMemo(memo_size) if memo_size else None
+        self._max_token_bytes = None
+
+    def count_tokens(self, text: str) -> int:
+        if self._memo is None or len(text) < self.memo_min_chars:
+            return len(self.enc.encode_ordinary(text))
+        key = self._memo.key(text)
+        count = self._memo.get(key)
+        if count is None:
+            count = len(self.enc.encode_ordinary(text))
+            self._memo.set(key, count)
+        return count
+
+    def encode(self, text: str) -> list:
+        return self.enc.encode_ordinary(text)
+
+    def decode(self, tokens: list) -> str:
+        return self.enc.decode(tokens)
+
+    @property
+    def max_token_bytes(self) -> int:
+        """Longest token in the vocabulary, in bytes; bounds tokens from below by len(text) / this."""
+        if self._max_token_bytes is None:
+            self._max_token_bytes = max(map(len, self.enc.token_byte_values()))
+        return self._max_token_bytes
+
+    def count_tokens_upto(self, text: str, limit: int) -> int:
+        """`count_tokens(text)` if it is at most `limit`, otherwise some number above `limit`.
+
+        Encodes only as much of the text as it takes to pass `limit`, and nothing
+        at all when the text is too long to fit even in the longest tokens.
+        """
+        if len(text) > limit * self.max_token_bytes:
+            return limit + 1
+        if self.encoding_name not in SPLITTABLE_ENCODINGS:
+            return self.count_tokens(text)
+        total = 0
+        pos = 0
+        while pos < len(text):
+            end = _window_end(text, pos, limit - total)
+            total += len(self.enc.encode_ordinary(text[pos:end]))
+            if total > limit:
+                return total
+            pos = end
+        return total
+
+    def encode_upto(self, text: str, limit: int) -> list:
+        """The first tokens of `encode(text)`: all of them if there are at most `limit`, otherwise `limit + 1`."""
+        if self.encoding_name not in SPLITTABLE_ENCODINGS:
+            return self.encode(text)[:limit + 1]
+        tokens = []
+        pos = 0
+        while pos < len(text):
+            end = _window_end(text, pos, limit - len(tokens))
+            tokens.extend(self.enc.encode_ordinary(text[pos:end]))
+            if len(tokens) > limit:
+                return tokens[:limit + 1]
+            pos = end
+        return tokens
+
+    def _segments(self, text, workers, segment_chars):
+        if workers <= 1 or self.encoding_name not in SPLITTABLE_ENCODINGS or len(text) < 2 * segment_chars:
+            return None
+        segments = split_text(text, segment_chars)
+        return segments if len(segments) > 1 else None
+
+    def count_tokens_parallel(self, text: str, workers: int = None, segment_chars: int = SEGMENT_CHARS) -> int:
+        """Same as `count_tokens`, spread over `workers` threads for large texts.
+
+        Segment counts are summed, so no token list for the whole text is built.
+        """
+        workers = workers or os.cpu_count() or 1
+        segments = self._segments(text, workers, segment_chars)
+        if segments is None:
+            return self.count_tokens(text)
+        with ThreadPoolExecutor(min(workers, len(segments))) as pool:
+            return sum(pool.map(lambda segment: len(self.enc.encode_ordinary(segment)), segments))
+
+    def encode_parallel(self, text: str, workers: int = None, segment_chars: int = SEGMENT_CHARS) -> list:
+        """Same as `encode`, spread over `workers` threads for large texts."""
+        workers = workers or os.cpu_count() or 1
+        segments = self._segments(text, workers, segment_chars)
+        if segments is None:
+            return self.encode(text)
+        tokens = []
+        with ThreadPoolExecutor(min(workers, len(segments))) as pool:
+            for part in pool.map(self.enc.encode_ordinary, segments):
+                tokens.extend(part)
+        return tokens
+
+
+def get_tokenizer(encoding_name: str = DEFAULT_ENCODING) -> Tokenizer:
+    """The shared, memo-less Tokenizer for `encoding_name`."""
+    tokenizer = _tokenizers.get(encoding_name)
+    if tokenizer is None:
+        tokenizer = Tokenizer(encoding_name)
+        with _lock:
+            tokenizer = _tokenizers.setdefault(encoding_name, tokenizer)
+    return tokenizer
+
+
+def count_tokens(text: str, encoding_name: str = DEFAULT_ENCODING) -> int:
+    return get_tokenizer(encoding_name).count_tokens(text)
+
+
+def warm_up(*encoding_names: str) -> dict:
+    """Load each encoding and encode once, so the first request does not pay for it.
+
+    Returns the seconds spent per encoding. Loading reads the BPE file from
+    TIKTOKEN_CACHE_DIR and downloads it only if it is missing there, which
+    fails without egress; images bake it in with `llm_common.fetch_encodings`.
+    """
+    timings = {}
+    for name in encoding_names or (DEFAULT_ENCODING,):
+        start = time.perf_counter()
+        get_tokenizer(name).count_tokens("warm up")
+        timings[name] = time.perf_counter() - start
+    return timings
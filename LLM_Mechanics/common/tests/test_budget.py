@@ -0,0 +1,142 @@
+import threading
+
+import pytest
+
+from llm_common.budget import BudgetExceededError, BudgetLedger, LocalBudgetStore, RedisBudgetStore
+from llm_common.testing import FakeRedis
+
+
+@pytest.fixture(params=["local", "redis"])
+def store(request):
+    if request.param == "local":
+        return LocalBudgetStore()
+    return RedisBudgetStore(FakeRedis(), window_s=3600)
+
+
+def test_charge_is_buffered_until_flush(store):
+    ledger = BudgetLedger(store)
+    ledger.charge("alice", 0.5)
+    ledger.charge("alice", 0.25)
+
+    assert ledger.spent("alice") == pytest.approx(0.75)
+    assert store.get_many(["alice"])["alice"] == 0.0
+
+    ledger.flush()
+    assert store.get_many(["alice"])["alice"] == pytest.approx(0.75)
+    assert ledger.spent("alice") == pytest.approx(0.75)
+
+
+def test_limit_rejects_before_booking(store):
+    ledger = BudgetLedger(store, limit=1.0)
+    ledger.charge("bob", 0.75)
+
+    with pytest.raises(BudgetExceededError):
+        ledger.charge("bob", 0.5)
+    assert ledger.spent("bob") == pytest.approx(0.75)
+    assert ledger.totals("bob")["remaining_usd"] == pytest.approx(0.25)
+
+
+def test_replicas_share_totals_through_the_store():
+    redis = FakeRedis()
+    a = BudgetLedger(RedisBudgetStore(redis), limit=1.0)
+    b = BudgetLedger(RedisBudgetStore(redis), limit=1.0)
+
+    a.charge("carol", 0.75)
+    a.flush()
+    with pytest.raises(BudgetExceededError):
+        b.charge("carol", 0.5)
+
+
+def test_flush_refreshes_totals_booked_by_other_workers():
+    redis = FakeRedis()
+    a = BudgetLedger(RedisBudgetStore(redis), limit=5.0)
+    b = BudgetLedger(RedisBudgetStore(redis), limit=5.0)
+
+    # b has already seen dave, so his total is cached there.
+    b.charge("dave", 0.5)
+    b.flush()
+    a.charge("dave", 3.5)
+    a.flush()
+    assert b.spent("dave") == pytest.approx(0.5)
+
+    b.flush()  # nothing buffered for dave in b; his total is re-read anyway
+    assert b.totals("dave")["spent_usd"] == pytest.approx(4.0)
+    with pytest.raises(BudgetExceededError):
+        b.charge("dave", 4.5)
+    assert float(redis.get("budget:dave")) == pytest.approx(4.0)
+
+
+def test_idle_users_are_read_again_on_next_request():
+    redis = FakeRedis()
+    a = BudgetLedger(RedisBudgetStore(redis), limit=5.0, active_s=0)
+    b = BudgetLedger(RedisBudgetStore(redis), limit=5.0)
+    a.charge("erin", 1.0)
+    a.flush()  # erin is no longer recent in a after this flush
+
+    b.charge("erin", 2.0)
+    b.flush()
+    assert a.spent("erin") == pytest.approx(3.0)
+
+
+def test_flush_batches_all_users_into_one_round_trip():
+    redis = FakeRedis()
+    ledger = BudgetLedger(RedisBudgetStore(redis, window_s=60))
+    for i in range(100):
+        ledger.charge(f"user-{i}", 0.01)
+    before = redis.round_trips
+
+    ledger.flush()
+    assert redis.round_trips == before + 1
+    assert redis.expires["budget:user-0"]
+
+
+def test_failed_flush_keeps_amounts_buffered():
+    redis = FakeRedis()
+    ledger = BudgetLedger(RedisBudgetStore(redis))
+    ledger.charge("dave", 0.5)
+    redis.error = ConnectionError("down")
+
+    ledger.flush()
+    assert ledger.spent("dave") == pytest.approx(0.5)
+
+    redis.error = None
+    ledger.flush()
+    assert float(redis.data["budget:dave"]) == pytest.approx(0.5)
+
+
+def test_unreadable_store_does_not_fail_requests():
+    redis = FakeRedis()
+    redis.data["budget:erin"] = "0.75"
+    ledger = BudgetLedger(RedisBudgetStore(redis), limit=1.0)
+    redis.error = ConnectionError("down")
+
+    assert ledger.charge("erin", 0.5) == pytest.approx(0.5)
+    assert ledger.spent("erin") == pytest.approx(0.5)
+
+    # The next flush books the charge and reads back the real total.
+    redis.error = None
+    ledger.flush()
+    assert ledger.spent("erin") == pytest.approx(1.25)
+    with pytest.raises(BudgetExceededError):
+        ledger.charge("erin", 0.1)
+
+
+def test_concurrent_charges_never_exceed_limit():
+    ledger = BudgetLedger(LocalBudgetStore(), limit=1.0)
+    admitted = []
+
+    def worker():
+        for _ in range(50):
+            try:
+                ledger.charge("erin", 0.125)
+                admitted.append(1)
+            except BudgetExceededError:
+                pass
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(admitted) == 8
@@ -0,0 +1,49 @@
+import subprocess
+import sys
+
+from llm_common.metrics import mark_worker_dead, render_metrics, reset_multiproc_dir
+
+WORKER = """
+import os
+from prometheus_client import Counter, Gauge
+Counter("estimates", "Estimates").inc({n})
+Gauge("cache_bytes", "Cache bytes", multiprocess_mode="livesum").set({n})
+print(os.getpid())
+"""
+
+
+def run_worker(n: int) -> int:
+    # A separate process per "worker": metric files are named after the pid.
+    out = subprocess.run([sys.executable, "-c", WORKER.format(n=n)], check=True, capture_output=True, text=True)
+    return int(out.stdout)
+
+
+def sample(body: bytes, name: str) -> float:
+    for line in body.decode().splitlines():
+        if line.startswith(name + " "):
+            return float(line.split()[1])
+    return None
+
+
+def test_render_metrics_sums_workers(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path / "prom"))
+    reset_multiproc_dir()
+    first = run_worker(2)
+    run_worker(3)
+    # Both "workers" have exited; only the first is reported dead so far.
+    mark_worker_dead(first)
+
+    body, content_type = render_metrics()
+    assert content_type.startswith("text/plain")
+    assert sample(body, "estimates_total") == 5
+    assert sample(body, "cache_bytes") == 3
+
+    reset_multiproc_dir()
+    assert sample(render_metrics()[0], "estimates_total") is None
+
+
+def test_render_metrics_single_process(monkeypatch):
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+    reset_multiproc_dir()  # no-op without the variable
+    body, _ = render_metrics()
+    assert b"python_info" in body
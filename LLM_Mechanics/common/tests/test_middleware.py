@@ -0,0 +1,67 @@
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from prometheus_client import CollectorRegistry, Counter, Histogram
+
+from llm_common import APIKeyMiddleware, RequestContextMiddleware
+
+
+def make_app():
+    registry = CollectorRegistry()
+    count = Counter("requests", "Requests", registry=registry)
+    latency = Histogram("latency_seconds", "Latency", registry=registry)
+
+    app = FastAPI()
+    app.add_middleware(APIKeyMiddleware, api_key="secret", exempt_paths=["/healthz"],
+                       exempt_prefixes=["/static"])
+    app.add_middleware(RequestContextMiddleware, request_count=count, request_latency=latency)
+
+    @app.get("/healthz")
+    def health():
+        return {"status": "ok"}
+
+    @app.get("/static/{name}")
+    def static(name: str):
+        return {"name": name}
+
+    @app.get("/echo-id")
+    def echo_id(request: Request):
+        return {"request_id": request.state.request_id}
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b"a", b"b", b"c"]), media_type="text/plain")
+
+    return TestClient(app), registry
+
+
+def test_api_key_required_except_exempt_paths():
+    client, _ = make_app()
+
+    assert client.get("/echo-id").status_code == 401
+    assert client.get("/echo-id", headers={"x-api-key": "wrong"}).json() == {"detail": "Unauthorized"}
+    assert client.get("/echo-id", headers={"x-api-key": "secret"}).status_code == 200
+    assert client.get("/healthz").status_code == 200
+    assert client.get("/static/index.html").status_code == 200
+    # Exact paths do not leak into prefix matching.
+    assert client.get("/healthz-extra").status_code == 401
+
+
+def test_request_id_header_matches_request_state():
+    client, _ = make_app()
+
+    resp = client.get("/echo-id", headers={"x-api-key": "secret"})
+    assert resp.headers["x-request-id"] == resp.json()["request_id"]
+    assert client.get("/echo-id").headers["x-request-id"]
+
+
+def test_each_request_counted_once_including_rejected_and_streamed():
+    client, registry = make_app()
+
+    client.get("/healthz")
+    client.get("/echo-id")
+    resp = client.get("/stream", headers={"x-api-key": "secret"})
+
+    assert resp.text == "abc"
+    assert registry.get_sample_value("requests_total") == 3
+    assert registry.get_sample_value("latency_seconds_count") == 3
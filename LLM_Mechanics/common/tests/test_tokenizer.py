@@ -0,0 +1,153 @@
+import os
+import random
+import threading
+
+import tiktoken
+
+from llm_common import Tokenizer, count_tokens, get_encoding, get_tokenizer, last_safe_split, split_text, warm_up
+from llm_common import fetch_encodings
+from llm_common import tokenizer as tokenizer_module
+from llm_common.tokenizer import SPLITTABLE_ENCODINGS
+
+
+def test_encodings_and_tokenizers_are_shared():
+    assert get_encoding("cl100k_base") is get_encoding("cl100k_base")
+    assert get_tokenizer() is get_tokenizer("cl100k_base")
+    assert Tokenizer().enc is get_encoding()
+    assert get_tokenizer("o200k_base").enc.name == "o200k_base"
+
+
+def test_counts_match_tiktoken():
+    enc = tiktoken.get_encoding("cl100k_base")
+    for text in ["", "hello world", "Très bien 👍\n\n  indented", "word " * 500]:
+        assert count_tokens(text) == len(enc.encode(text))
+    tokenizer = get_tokenizer()
+    assert tokenizer.decode(tokenizer.encode("round trip")) == "round trip"
+
+
+def test_special_tokens_in_text_are_counted_as_text():
+    text = "ends with <|endoftext|>"
+    assert count_tokens(text) == len(tiktoken.get_encoding("cl100k_base").encode_ordinary(text))
+
+
+def test_memo_is_bounded_and_skips_short_texts():
+    tokenizer = Tokenizer(memo_size=2, memo_min_chars=10)
+    texts = [f"document number {i} " * 20 for i in range(3)]
+    counts = [tokenizer.count_tokens(text) for text in texts]
+    assert len(tokenizer._memo._counts) == 2
+    assert tokenizer.count_tokens(texts[0]) == counts[0]
+    tokenizer.count_tokens("short")
+    assert len(tokenizer._memo._counts) == 2
+
+
+def test_shared_tokenizer_across_threads():
+    tokenizer = Tokenizer(memo_size=16, memo_min_chars=0)
+    texts = [f"thread text {i} " * (i + 1) for i in range(8)]
+    expected = [len(tokenizer.enc.encode_ordinary(text)) for text in texts]
+    errors = []
+
+    def work():
+        for _ in range(50):
+            if [tokenizer.count_tokens(text) for text in texts] != expected:
+                errors.append("mismatch")
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+
+
+# Characters that stress the pre-tokenizer: whitespace runs, CR/LF, digits
+# (grouped in threes), contractions, punctuation runs and non-ASCII letters.
+ALPHABET = ["a", "Z", "é", "ß", "字", " ", "  ", "\t", "\n", "\r\n", "\n\n", "'", "'s", "'LL", "1", "23",
+            ".", "!?", "/", "-", "👍", " ", "​", "\x1c", "\x85", "\u0301", "ǅ", "_", "ab", " the", "\n  x", "\n/"]
+
+
+def random_text(rng, max_parts=200):
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, max_parts)))
+
+
+def test_split_text_rejoins_and_respects_target():
+    text = "first line\nsecond line has words\n" * 50
+    segments = split_text(text, 100)
+    assert "".join(segments) == text
+    assert len(segments) > 1
+    assert all(len(segment) >= 100 for segment in segments[:-1])
+    assert split_text("x" * 1000, 10) == ["x" * 1000]
+
+
+def test_windowed_encoding_matches_single_pass():
+    rng = random.Random(99)
+    tokenizer = get_tokenizer()
+    for _ in range(200):
+        text = random_text(rng, 400)
+        tokens, pending = [], ""
+        for i in range(0, len(text), 7):
+            pending += text[i:i + 7]
+            cut = last_safe_split(pending)
+            tokens.extend(tokenizer.encode(pending[:cut]))
+            pending = pending[cut:]
+        assert tokens + tokenizer.encode(pending) == tokenizer.encode(text), text
+    assert last_safe_split("no boundary") == 2
+    assert last_safe_split("unbroken\n  \n") == 0
+    assert last_safe_split("one\ntwo\nthree", start=5) == len("one\ntwo\n")
+
+
+def test_parallel_encoding_matches_single_pass():
+    # Property: for any text and any segment size, the parallel result equals
+    # one encode_ordinary over the whole text.
+    rng = random.Random(1234)
+    for name in sorted(SPLITTABLE_ENCODINGS):
+        tokenizer = Tokenizer(name)
+        for _ in range(400):
+            text = random_text(rng)
+            segment_chars = rng.randint(1, 40)
+            expected = tokenizer.enc.encode_ordinary(text)
+            assert tokenizer.encode_parallel(text, workers=4, segment_chars=segment_chars) == expected, (name, text)
+            assert tokenizer.count_tokens_parallel(text, workers=4, segment_chars=segment_chars) == len(expected)
+
+
+def test_count_and_encode_upto_stop_at_the_limit(monkeypatch):
+    # Property: below the limit the result is exact; above it, it is past the
+    # limit and encode_upto is a prefix of the full encoding.
+    monkeypatch.setattr(tokenizer_module, "UPTO_MIN_WINDOW", 8)  # many small windows
+    rng = random.Random(7)
+    for name in sorted(SPLITTABLE_ENCODINGS) + ["p50k_base"]:
+        tokenizer = Tokenizer(name)
+        for _ in range(300):
+            text = random_text(rng, 600) * rng.choice([1, 3])
+            limit = rng.randint(0, 300)
+            full = tokenizer.enc.encode_ordinary(text)
+            count = tokenizer.count_tokens_upto(text, limit)
+            assert count == len(full) if len(full) <= limit else count > limit, (name, text, limit)
+            assert tokenizer.encode_upto(text, limit) == full[:limit + 1], (name, text, limit)
+
+
+def test_count_tokens_upto_rejects_huge_text_without_encoding():
+    tokenizer = Tokenizer()
+    tokenizer.enc = None  # any encode call would fail
+    tokenizer._max_token_bytes = 128
+    assert tokenizer.count_tokens_upto("x" * (4000 * 128 + 1), 4000) == 4001
+
+
+def test_parallel_falls_back_to_single_pass():
+    text = "line one\nline two\n" * 100
+    gpt2 = Tokenizer("p50k_base")
+    assert gpt2._segments(text, 4, 10) is None
+    assert gpt2.count_tokens_parallel(text, workers=4, segment_chars=10) == len(gpt2.enc.encode_ordinary(text))
+    assert get_tokenizer()._segments(text, 1, 10) is None
+    assert get_tokenizer()._segments(text, 4, len(text)) is None
+
+
+def test_warm_up_and_fetch_encodings(tmp_path, monkeypatch, capsys):
+    assert set(warm_up("cl100k_base", "o200k_base")) == {"cl100k_base", "o200k_base"}
+    assert list(warm_up()) == ["cl100k_base"]
+
+    # Loading from a populated cache needs no network; the CLI just points tiktoken at it.
+    cache_dir = os.environ.get("TIKTOKEN_CACHE_DIR") or str(tmp_path / "cache")
+    monkeypatch.setenv("TIKTOKEN_CACHE_DIR", str(tmp_path / "elsewhere"))
+    fetch_encodings.main(["--cache-dir", cache_dir, "cl100k_base"])
+    assert os.environ["TIKTOKEN_CACHE_DIR"] == cache_dir
+    assert "cl100k_base: cached in" in capsys.readouterr().out